@@ -1,67 +1,102 @@
+import asyncio
+import inspect
 import os
-import shlex
-import subprocess
-import time
-from typing import Annotated, Any, Dict, Generator, List, Optional, Tuple
-
-import litellm
-import requests
+import threading
+from contextlib import aclosing
+from typing import Annotated, Any, AsyncGenerator, Dict, Generator, List, Optional, Tuple
 
+from .background_loop import iterate_in_background, run_in_background
+from .diff_compaction import approx_token_count
+from .http_pool import get_http_client
+from .routing import RoutingDecision, choose_model
+from .server_manager import READY, ServerManager
+from .server_probe import preload_ollama_model
+from .telemetry import get_telemetry_path, load_records
 from .utils import load_config
 
 THIS_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
+# Parameters of the OpenAI chat completions API, the others are vllm extensions
+OPENAI_CHAT_PARAMS = {"max_tokens", "temperature", "top_p", "n", "stop", "seed", "presence_penalty", "frequency_penalty", "stream", "logprobs", "top_logprobs"}
+# Soft switch of Qwen3 chat templates that turns thinking off for one turn, ollama has no such request parameter
+NO_THINK_SWITCH = " /no_think"
+ANSWER_NOW_PROMPT = "Your reasoning so far, cut off at the reasoning budget:\n'''\n{reasoning}\n'''\nWrite the commit message now, without reasoning any further."
+
+
+def import_litellm() -> Any:
+    """Imports litellm on first use, it is by far the slowest import of commit-bot."""
+    import litellm
 
-def count_down(seconds: int, event: str) -> None:
-    for i in range(seconds, 0, -1):
-        print(f"⌛ {event}..., {i} seconds remaining", end="\r")
-        time.sleep(1)
-    print(" " * 30, end="\r")  # Clear the line after countdown
+    return litellm
+
+
+async def close_litellm_stream(response: Any) -> None:
+    """Closes the HTTP response behind a litellm stream that is abandoned before its end, so that the server stops generating."""
+    completion_stream = getattr(response, "completion_stream", None)
+    # The stream of the OpenAI client (see `astream_choices`) is closed directly
+    for target in (completion_stream, getattr(completion_stream, "streaming_response", None), response if completion_stream is None else None):
+        close = getattr(target, "aclose", None) or getattr(target, "close", None)
+        if close is not None:
+            result = close()
+            if inspect.isawaitable(result):
+                await result
+            return
+
+
+class ThinkTagState:
+    """Tracks whether a stream is currently inside a reasoning block."""
+
+    def __init__(self) -> None:
+        self.is_thinking = False
 
 
 class ChunkWrapper:
-    _is_thinking = False
+    _shared_think_state = ThinkTagState()
 
-    def __init__(self, content: str, reasoning: str, response_metadata: Optional[Dict[str, Any]] = None) -> None:
+    def __init__(self, content: str, reasoning: str, response_metadata: Optional[Dict[str, Any]] = None, think_state: Optional[ThinkTagState] = None) -> None:
         self.content = content
-        self.reasoning = self._wrap_think_tag(reasoning)
+        self.reasoning = self._wrap_think_tag(reasoning, think_state or ChunkWrapper._shared_think_state)
         self.response_metadata = response_metadata
 
-    @classmethod
-    def _wrap_think_tag(cls, reasoning: str) -> str:
+    @staticmethod
+    def _wrap_think_tag(reasoning: str, think_state: ThinkTagState) -> str:
         output = reasoning
-        if reasoning and not cls._is_thinking:
+        if reasoning and not think_state.is_thinking:
             output = "\n<think>\n" + reasoning
-            cls._is_thinking = True
-        if not reasoning and cls._is_thinking:
+            think_state.is_thinking = True
+        if not reasoning and think_state.is_thinking:
             output = "\n</think>\n\n"
-            cls._is_thinking = False
+            think_state.is_thinking = False
         return output
 
 
 class ModelExecutor:
+    _prepare_lock = threading.Lock()
     __prev_model_id: Optional[str] = None
     __prev_server_type: Optional[str] = None
     __prev_api_base: Optional[str] = None
 
-    def __init__(self, model_id: str, gen_conf: Dict[str, Any], api_base_url: str, server_type: str) -> None:
+    def __init__(self, model_id: str, gen_conf: Dict[str, Any], api_base_url: str, server_type: str, thinking: Optional[bool] = None, max_reasoning_tokens: Optional[int] = None) -> None:
         self.model_id = model_id
         self.gen_conf = gen_conf.copy()
         self.gen_conf["api_base"] = api_base_url
         self.server_type = server_type
         self.log_dir = os.path.join(THIS_SCRIPT_DIR, "var/logs")
+        self.thinking = thinking
+        self.max_reasoning_tokens = max_reasoning_tokens
 
     def _set_vllm_settings(self) -> None:
         if self.server_type == "vllm":
             self.model_id = self.model_id.replace("vllm", "openai")
             self.model_name = self.model_id.split("/")[-1]
             self.api_key = "mock_api_key"
-            self.warm_up_sec = load_config("job.conf").get("server_warm_up_seconds", 40)
-            self.idle_min = load_config("job.conf").get("server_idle_timeout_minutes", 3)
-            self.vram_limit = load_config("job.conf").get("vllm_gpu_memory_utilization_limit", 0.8)
-            self.vllm_model_weights_root_dir = load_config("job.conf").get("vllm_model_weights_root_dir", os.path.join(THIS_SCRIPT_DIR, "model_weights"))
+            job_conf = load_config("job.conf")
+            self.vram_limit = load_config("model.conf").get(f'model_configs."vllm-{self.model_name}".gpu_memory_utilization', job_conf.get("vllm_gpu_memory_utilization_limit", 0.8))
+            self.vllm_model_weights_root_dir = job_conf.get("vllm_model_weights_root_dir", os.path.join(THIS_SCRIPT_DIR, "model_weights"))
 
     def _check_model_change_and_stop_previous(self) -> None:
+        # vllm servers are not stopped on a model change, the server manager keeps several of them resident within
+        # the GPU memory budget and evicts the least recently used ones.
         if ModelExecutor.__prev_model_id is None:
             return
         elif self.server_type not in ["ollama", "vllm"]:
@@ -71,78 +106,231 @@ class ModelExecutor:
 
         if ModelExecutor.__prev_model_id != self.model_id:
             prev_model_name = ModelExecutor.__prev_model_id.split("/")[-1]
-            if ModelExecutor.__prev_server_type == "vllm":
-                stop_vllm_path = os.path.join(THIS_SCRIPT_DIR, "bin/stop_vllm.sh")
-                stop_vllm_log_path = os.path.join(self.log_dir, "stop_vllm.log")
-                stop_cmd = f"{stop_vllm_path}"
-                command = shlex.split(stop_cmd)
-                try:
-                    with open(stop_vllm_log_path, "w") as log_file:
-                        subprocess.run(command, stdout=log_file, stderr=subprocess.STDOUT, check=True)
-                    time.sleep(1)  # Cool down a bit after stopping the previous server
-                    print(f"🛑 Stopped the previous vllm server for model: {prev_model_name}.")
-                except subprocess.CalledProcessError as e:
-                    print(f"❌ Failed to stop the previous vllm server. Error: {e}")
-                except Exception as e:
-                    print(f"❌ An unexpected error occurred while stopping the previous vllm server. Details:\n{e}")
-            elif ModelExecutor.__prev_server_type == "ollama":
+            if ModelExecutor.__prev_server_type == "ollama":
+                import httpx
+
                 try:
-                    response = requests.post(f"{ModelExecutor.__prev_api_base}/api/generate", json={"model": prev_model_name, "prompt": "", "keep_alive": 0}, timeout=1)
+                    response = get_http_client(ModelExecutor.__prev_api_base).post("/api/generate", json={"model": prev_model_name, "prompt": "", "keep_alive": 0}, timeout=1)
                     if response.status_code == 200:
                         print(f"🛑 Stopped the previous ollama server for model: {prev_model_name}.")
                     else:
                         print(f"❌ Failed to stop the previous ollama server. Status code: {response.status_code}, Response: {response.text}")
-                except requests.RequestException as e:
+                except httpx.HTTPError as e:
                     print(f"❌ An error occurred while trying to stop the previous ollama server. Details:\n{e}")
 
     def _start_vllm_server(self) -> None:
         if self.server_type == "vllm":
-            exec_vllm_path = os.path.join(THIS_SCRIPT_DIR, "bin/exec_vllm.sh")
-            exec_vllm_log_path = os.path.join(self.log_dir, "exec_vllm.log")
+            manager = ServerManager.from_config()
+            record = manager.get_record(self.model_name)
+            if record and record.state == READY:
+                manager.touch(self.model_name)
+                self.gen_conf["api_base"] = record.api_base_url
+                return
+            unmanaged_api_base_url = manager.find_unmanaged_server(self.model_name)
+            if unmanaged_api_base_url is not None:
+                self.gen_conf["api_base"] = unmanaged_api_base_url
+                return
             vllm_model_weights_path = os.path.join(self.vllm_model_weights_root_dir, self.model_name)
-            vllm_server_log_path = os.path.join(self.log_dir, "vllm_server.log")
-            start_cmd = f"{exec_vllm_path} --model-path {vllm_model_weights_path} --model-name {self.model_name} --warm-up-sec {self.warm_up_sec} --idle-timeout-min {self.idle_min} --server-log-path {vllm_server_log_path} --gpu-memory-utilization {self.vram_limit}"
-            command = shlex.split(start_cmd)
-
             try:
-                with open(exec_vllm_log_path, "w") as log_file:
-                    # If vllm server is already running, `exec_vllm.sh` will automatically stop. If not, it will start the server.
-                    proc = subprocess.Popen(command, stdout=log_file, stderr=subprocess.STDOUT)
-                time.sleep(1)  # Give it a moment to stop proc, when vllm server is already running
-                if proc.poll() is None:
-                    print(
-                        f"🗄️ First time starting vllm server for model {self.model_name}, you don't need to start it again for next {self.idle_min} minutes.(Everytime you send a request, the idle timer will reset.)"
-                    )
-                    print("🗄️ You can check the logs in exec_vllm.log")
-                    print(f"🗄️ Waiting for warm-up..., please wait for about {self.warm_up_sec+5} seconds")
-                    count_down(self.warm_up_sec + 5, "Warm-up vllm server")
-            except FileNotFoundError as e:
-                print(f"❌ Error: some file is not found, please check the paths. Details:\n{e}")
+                record = manager.ensure_server(self.model_name, vllm_model_weights_path, self.vram_limit)
+                self.gen_conf["api_base"] = record.api_base_url
+                print(f"🗄️ vllm server for model {self.model_name} is up, it stays up while commit-bot is running and for {manager.idle_grace_sec} seconds after.")
+            except RuntimeError as e:
+                print(f"❌ {e}")
             except Exception as e:
                 print(f"❌ An unexpected error occurred while starting the VLLM server. Details:\n{e}")
 
-    def stream(self, messages: Annotated[List[Dict[str, str]], 'Example: [{"role": "system", "content": "..."}, {"role": "user", "content": "..."}]']) -> Generator["ChunkWrapper", None, None]:
-        self._set_vllm_settings()
-        self._check_model_change_and_stop_previous()
-        self._start_vllm_server()
-        ModelExecutor.__prev_model_id = self.model_id
-        ModelExecutor.__prev_server_type = self.server_type
-        ModelExecutor.__prev_api_base = self.gen_conf.get("api_base")
-        params = self.gen_conf
-        params["stream"] = True
-        response = litellm.completion(model=self.model_id, messages=messages, **params)
-
-        for chunk in response:
-            delta = chunk.choices[0].delta
-            content = getattr(delta, "content")
-            content = content if content is not None else ""
-            reasoning = getattr(delta, "reasoning_content", "")
-            model_id = getattr(chunk, "model", "")
-            yield ChunkWrapper(content, reasoning=reasoning, response_metadata={"model": model_id})
+    def prepare(self) -> None:
+        """Makes sure the server of this model is up, stopping the server of the previously used model if needed."""
+        with ModelExecutor._prepare_lock:
+            self._set_vllm_settings()
+            self._check_model_change_and_stop_previous()
+            self._start_vllm_server()
+            ModelExecutor.__prev_model_id = self.model_id
+            ModelExecutor.__prev_server_type = self.server_type
+            ModelExecutor.__prev_api_base = self.gen_conf.get("api_base")
+
+    async def aprepare(self) -> None:
+        """Awaitable `prepare()`. The lifecycle steps block on subprocesses and file locks, so they run in a worker thread."""
+        await asyncio.to_thread(self.prepare)
+
+    def _apply_thinking(self, messages: List[Dict[str, str]], params: Dict[str, Any], thinking: Optional[bool]) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+        """Turns thinking off for the request when `thinking` is False, with the switch the backend understands."""
+        if thinking is not False:
+            return messages, params
+        if self.server_type == "vllm":
+            extra_body = params.get("extra_body") or {}
+            chat_template_kwargs = {**extra_body.get("chat_template_kwargs", {}), "enable_thinking": False}
+            params = {**params, "extra_body": {**extra_body, "chat_template_kwargs": chat_template_kwargs}}
+        elif self.server_type == "ollama" and messages and messages[-1]["role"] == "user":
+            params = {key: value for key, value in params.items() if key != "reasoning_effort"}
+            messages = messages[:-1] + [{**messages[-1], "content": messages[-1]["content"] + NO_THINK_SWITCH}]
+        return messages, params
+
+    def _apply_reasoning_effort(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Sends `reasoning_effort` in the request body of the local servers: litellm rejects it for the `openai/` provider
+        of vllm, and turns it into `options.think=True` for ollama, which drops the level (ollama reads a top-level `think`).
+        """
+        if "reasoning_effort" not in params or self.server_type not in ["ollama", "vllm"]:
+            return params
+        params = dict(params)
+        reasoning_effort = params.pop("reasoning_effort")
+        extra_body = params.get("extra_body") or {}
+        key = "think" if self.server_type == "ollama" else "reasoning_effort"
+        params["extra_body"] = {**extra_body, key: reasoning_effort}
+        return params
+
+    async def _acompletion(self, messages: List[Dict[str, str]], params: Dict[str, Any], thinking: Optional[bool] = None) -> Any:
+        """Calls litellm asynchronously, reusing the pooled connections to the local server (ollama, vllm) across requests."""
+        messages, params = self._apply_thinking(messages, params, self.thinking if thinking is None else thinking)
+        params = self._apply_reasoning_effort(params)
+        api_base = params.get("api_base")
+        if self.server_type in ["ollama", "vllm"] and api_base and "client" not in params:
+            params = {**params, "client": get_http_client(api_base).async_litellm_client(self.server_type, api_base, params.get("api_key"))}
+        return await import_litellm().acompletion(model=self.model_id, messages=messages, **params)
+
+    @staticmethod
+    async def _aiter_chunks(response: Any, chunk_timeout_sec: Optional[float]) -> AsyncGenerator[Any, None]:
+        """
+        Iterates a litellm stream, raising `TimeoutError` when no chunk arrives within `chunk_timeout_sec`.
+        The upstream response is closed when the iteration stops early (cancellation, timeout or `aclose()`).
+        """
+        finished = False
+        try:
+            iterator = response.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(iterator.__anext__(), chunk_timeout_sec)
+                except StopAsyncIteration:
+                    finished = True
+                    return
+                yield chunk
+        finally:
+            if not finished:
+                await close_litellm_stream(response)
+
+    async def acomplete(self, messages: List[Dict[str, str]], **gen_overrides: Any) -> str:
+        """Non-streaming completion. It does not touch the server lifecycle, so it is safe to call concurrently after `aprepare()`."""
+        response = await self._acompletion(messages, {**self.gen_conf, **gen_overrides, "stream": False})
+        return response.choices[0].message.content or ""
+
+    async def astream(
+        self,
+        messages: Annotated[List[Dict[str, str]], 'Example: [{"role": "system", "content": "..."}, {"role": "user", "content": "..."}]'],
+        chunk_timeout_sec: Optional[float] = None,
+        **gen_overrides: Any,
+    ) -> AsyncGenerator["ChunkWrapper", None]:
+        await self.aprepare()
+        # Closed along with this stream (e.g. the losing request of a hedged stream), not at garbage collection
+        async with aclosing(self.astream_completion(messages, chunk_timeout_sec=chunk_timeout_sec, **gen_overrides)) as chunks:
+            async for chunk in chunks:
+                yield chunk
+
+    async def astream_completion(self, messages: List[Dict[str, str]], chunk_timeout_sec: Optional[float] = None, **gen_overrides: Any) -> AsyncGenerator["ChunkWrapper", None]:
+        """
+        Streaming completion without the server lifecycle checks of `astream()`, safe to run concurrently after `aprepare()`.
+        Args:
+            messages (List[Dict[str, str]]): Chat messages.
+            chunk_timeout_sec (Optional[float]): Maximum wait for each chunk, defaults to `stream_chunk_timeout_seconds` of job.conf.
+            **gen_overrides: Generation configs of this request only.
+        """
+        chunk_timeout_sec = chunk_timeout_sec if chunk_timeout_sec is not None else load_config("job.conf").get("stream_chunk_timeout_seconds", None)
+        params = {**self.gen_conf, **gen_overrides, "stream": True}
+        response = await self._acompletion(messages, params)
+        think_state = ThinkTagState()
+        reasoning_text = ""
+        answering = False
+        model_id = ""
+
+        chunks = self._aiter_chunks(response, chunk_timeout_sec)
+        try:
+            async for chunk in chunks:
+                delta = chunk.choices[0].delta
+                content = getattr(delta, "content")
+                content = content if content is not None else ""
+                reasoning = getattr(delta, "reasoning_content", "")
+                model_id = getattr(chunk, "model", "")
+                reasoning_text += reasoning or ""
+                answering = answering or bool(content)
+                yield ChunkWrapper(content, reasoning=reasoning, response_metadata={"model": model_id}, think_state=think_state)
+                if self.max_reasoning_tokens and not answering and reasoning_text and approx_token_count(reasoning_text) >= self.max_reasoning_tokens:
+                    break
+            else:
+                return
+        finally:
+            await chunks.aclose()
+
+        # Reasoning budget reached: the reasoning is cut off and the model answers right away, with thinking turned off
+        yield ChunkWrapper("", reasoning="", response_metadata={"model": model_id, "reasoning_budget_reached": True}, think_state=think_state)
+        answer_messages = messages + [{"role": "user", "content": ANSWER_NOW_PROMPT.format(reasoning=reasoning_text)}]
+        if "reasoning_effort" in params:
+            params = {**params, "reasoning_effort": "low"}  # gpt-oss always reasons, as little as possible then
+        response = await self._acompletion(answer_messages, params, thinking=False)
+        async with aclosing(self._aiter_chunks(response, chunk_timeout_sec)) as chunks:
+            async for chunk in chunks:
+                content = getattr(chunk.choices[0].delta, "content")
+                if content:
+                    yield ChunkWrapper(content, reasoning="", response_metadata={"model": getattr(chunk, "model", "")}, think_state=think_state)
+
+    async def astream_choices(self, messages: List[Dict[str, str]], n: int, chunk_timeout_sec: Optional[float] = None, **gen_overrides: Any) -> AsyncGenerator[Tuple[int, "ChunkWrapper"], None]:
+        """
+        Streams `n` completions of a single request, yielding `(choice index, chunk)`. Requires `supports_n` and `aprepare()`.
+        The stream is read with the OpenAI client of the pool: litellm ends a streamed `n>1` response at the first `finish_reason`.
+        """
+        chunk_timeout_sec = chunk_timeout_sec if chunk_timeout_sec is not None else load_config("job.conf").get("stream_chunk_timeout_seconds", None)
+        response = await self._aopenai_stream(messages, {**self.gen_conf, **gen_overrides, "stream": True, "n": n})
+        think_states = [ThinkTagState() for _ in range(n)]
+
+        async with aclosing(self._aiter_chunks(response, chunk_timeout_sec)) as chunks:
+            async for chunk in chunks:
+                model_id = getattr(chunk, "model", "")
+                for choice in chunk.choices:
+                    content = getattr(choice.delta, "content", None)
+                    content = content if content is not None else ""
+                    reasoning = getattr(choice.delta, "reasoning_content", None) or ""
+                    response_metadata = {"model": model_id, "finish_reason": choice.finish_reason}
+                    yield choice.index, ChunkWrapper(content, reasoning=reasoning, response_metadata=response_metadata, think_state=think_states[choice.index])
+
+    async def _aopenai_stream(self, messages: List[Dict[str, str]], params: Dict[str, Any]) -> Any:
+        """Sends the request with the pooled OpenAI client of the vllm server, the sampling params it does not know go in `extra_body`."""
+        messages, params = self._apply_thinking(messages, params, self.thinking)
+        params = self._apply_reasoning_effort(params)
+        api_base = params["api_base"]
+        client = get_http_client(api_base).async_litellm_client(self.server_type, api_base, params.get("api_key"))
+        kwargs: Dict[str, Any] = {}
+        extra_body = dict(params.get("extra_body") or {})
+        for key, value in params.items():
+            if key in OPENAI_CHAT_PARAMS:
+                kwargs[key] = value
+            elif key not in ["api_base", "api_key", "extra_body"]:
+                extra_body[key] = value  # e.g. `top_k`, `repetition_penalty`
+        return await client.chat.completions.create(model=self.model_id.split("/", 1)[-1], messages=messages, extra_body=extra_body, **kwargs)
+
+    def complete(self, messages: List[Dict[str, str]], **gen_overrides: Any) -> str:
+        """Sync wrapper of `acomplete()`."""
+        return run_in_background(self.acomplete(messages, **gen_overrides))
+
+    def stream(self, messages: Annotated[List[Dict[str, str]], 'Example: [{"role": "system", "content": "..."}, {"role": "user", "content": "..."}]'], **gen_overrides: Any) -> Generator["ChunkWrapper", None, None]:
+        """Sync wrapper of `astream()`, closing the generator cancels the request."""
+        yield from iterate_in_background(self.astream(messages, **gen_overrides))
+
+    def stream_completion(self, messages: List[Dict[str, str]], **gen_overrides: Any) -> Generator["ChunkWrapper", None, None]:
+        """Sync wrapper of `astream_completion()`."""
+        yield from iterate_in_background(self.astream_completion(messages, **gen_overrides))
+
+    @property
+    def supports_n(self) -> bool:
+        """Whether the backend can return several completions for one request with the OpenAI-compatible `n` parameter."""
+        return self.server_type == "vllm"
+
+    def stream_choices(self, messages: List[Dict[str, str]], n: int, **gen_overrides: Any) -> Generator[Tuple[int, "ChunkWrapper"], None, None]:
+        """Sync wrapper of `astream_choices()`."""
+        yield from iterate_in_background(self.astream_choices(messages, n, **gen_overrides))
 
     def __setattr__(self, name: str, value: Any) -> None:
-        vllm_settings = ["model_name", "warm_up_sec", "idle_min", "vram_limit", "vllm_model_weights_root_dir"]
-        if name in ["model_id", "gen_conf", "server_type", "log_dir"] + vllm_settings:
+        vllm_settings = ["model_name", "vram_limit", "vllm_model_weights_root_dir"]
+        if name in ["model_id", "gen_conf", "server_type", "log_dir", "thinking", "max_reasoning_tokens"] + vllm_settings:
             super().__setattr__(name, value)
         else:
             self.gen_conf[name] = value
@@ -158,10 +346,14 @@ class AIModels:
         conf = load_config("model.conf")
         cls._ollama_base_url = conf.get("ollama_base_url")
         cls._vllm_base_url = conf.get("vllm_base_url", None)
+        cls._ollama_keep_alive = conf.get("ollama_keep_alive", None)
+        cls._default_max_reasoning_tokens = conf.get("default_max_reasoning_tokens", None)
         cls._instance = super(AIModels, cls).__new__(cls)
         cls._instance._models = {}
         cls._instance._model_configs = conf.get_config("model_configs").as_plain_ordered_dict()
         cls._instance._default_gen_configs = conf.get_config("default_gen_configs").as_plain_ordered_dict()
+        cls._instance._routing_conf = conf.get_config("routing").as_plain_ordered_dict() if "routing" in conf else {}
+        cls._instance._hedging_conf = conf.get_config("hedging").as_plain_ordered_dict() if "hedging" in conf else {}
         return cls._instance
 
     def _get_all_configs(self, model_spec: str) -> Optional[Tuple[Optional[str], Dict[str, Any]]]:
@@ -177,14 +369,25 @@ class AIModels:
             raise UserWarning(f"{model_spec} is not in the support list, you can watch it in model.conf")
         model_conf, gen_conf = configs
         model_id, model_server = model_conf["model_id"], model_conf["server_type"]
+        thinking = model_conf.get("thinking", None)
+        max_reasoning_tokens = model_conf.get("max_reasoning_tokens", self._default_max_reasoning_tokens)
+        if "reasoning_effort" in model_conf:
+            gen_conf = {**gen_conf, "reasoning_effort": model_conf["reasoning_effort"]}
         if model_server == "ollama":
             self._api_base_url = self._ollama_base_url
+            keep_alive = model_conf.get("keep_alive", self._ollama_keep_alive)
+            if keep_alive is not None:
+                gen_conf = {**gen_conf, "keep_alive": keep_alive}
         elif model_server == "vllm":
             self._api_base_url = self._vllm_base_url
+        elif model_server == "hf-local":
+            from .hf_local import HFLocalExecutor  # Imported on use, it depends on this module
+
+            return HFLocalExecutor(model_id, gen_conf, model_conf["model_path"], model_conf.get("torch_dtype", "auto"), model_conf.get("device_map", "cpu"), thinking=thinking)
         else:
             self._api_base_url = None
 
-        return ModelExecutor(model_id, gen_conf, self._api_base_url, model_server)
+        return ModelExecutor(model_id, gen_conf, self._api_base_url, model_server, thinking=thinking, max_reasoning_tokens=max_reasoning_tokens)
 
     def get_model(self, model_spec: str) -> Optional["ModelExecutor"]:
         if model_spec not in self._models:
@@ -197,3 +400,47 @@ class AIModels:
 
     def list_available_models(self) -> List[str]:
         return list(self._model_configs.keys())
+
+    def is_routing_enabled(self) -> bool:
+        return bool(self._routing_conf.get("enabled", False))
+
+    def route_model(self, staged_changes: str, records: Optional[List[Dict[str, Any]]] = None) -> Optional[RoutingDecision]:
+        """
+        Picks the model of the staged changes with the `routing` policy of model.conf: by diff size, then by the latency
+        measured in the telemetry of past runs. Returns None when routing is disabled or none of its models is configured.
+        """
+        if not self.is_routing_enabled():
+            return None
+        if records is None:
+            telemetry_path = get_telemetry_path()
+            records = load_records(telemetry_path) if telemetry_path is not None else []
+        backends = {model_spec: model_conf["server_type"] for model_spec, model_conf in self._model_configs.items()}
+        return choose_model(staged_changes, self._routing_conf, records, self.list_available_models(), backends)
+
+    def get_hedging(self, model_spec: str) -> Optional[Tuple[str, float]]:
+        """
+        Fallback model and first token deadline of the hedged requests of the model, from the `hedging` configs of model.conf.
+        Returns None when hedging is disabled or the fallback model is not configured (or is the model itself).
+        """
+        if not self._hedging_conf.get("enabled", False):
+            return None
+        model_conf = self._model_configs.get(model_spec, {})
+        fallback_spec = model_conf.get("fallback_model", self._hedging_conf.get("fallback_model", None))
+        if not fallback_spec or fallback_spec == model_spec or fallback_spec not in self._model_configs:
+            return None
+        return fallback_spec, float(self._hedging_conf.get("first_token_deadline_seconds", 5))
+
+
+def preload_model(model_spec: str) -> bool:
+    """
+    Asks the ollama server to load the model without generating anything, so that the load overlaps with other work.
+    It only reads the configs, to stay cheap while the main thread reads the staged diff.
+    Returns:
+        bool: True if the model was loaded, False for other server types or on failure.
+    """
+    conf = load_config("model.conf")
+    model_conf = conf.get("model_configs").get(f'"{model_spec}"', None)
+    if model_conf is None or model_conf.get("server_type") != "ollama":
+        return False
+    keep_alive = model_conf.get("keep_alive", conf.get("ollama_keep_alive", None))
+    return preload_ollama_model(conf.get("ollama_base_url"), model_conf.get("model_id").split("/")[-1], keep_alive)
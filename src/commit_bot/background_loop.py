@@ -0,0 +1,55 @@
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Coroutine, Generator, Optional, TypeVar
+
+T = TypeVar("T")
+
+_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_LOOP_LOCK = threading.Lock()
+
+
+def get_background_loop() -> asyncio.AbstractEventLoop:
+    """Returns the event loop of the process, running in a daemon thread, that serves the sync wrappers of the async APIs."""
+    global _LOOP
+    with _LOOP_LOCK:
+        if _LOOP is None or _LOOP.is_closed():
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="commit-bot-event-loop", daemon=True).start()
+            _LOOP = loop
+        return _LOOP
+
+
+def _wait(future: "Any") -> Any:
+    """Waits for a future of the background loop, cancelling it when the caller is interrupted (e.g. Ctrl-C)."""
+    try:
+        return future.result()
+    except BaseException:
+        future.cancel()
+        raise
+
+
+def run_in_background(coro: Coroutine[Any, Any, T]) -> T:
+    """Runs the coroutine on the background loop and blocks until it is done."""
+    return _wait(asyncio.run_coroutine_threadsafe(coro, get_background_loop()))
+
+
+def iterate_in_background(async_iterator: AsyncIterator[T]) -> Generator[T, None, None]:
+    """
+    Iterates an async iterator on the background loop from synchronous code.
+    Closing the generator (or an exception in the caller) closes the async iterator, which cancels the work behind it.
+    """
+    loop = get_background_loop()
+    try:
+        while True:
+            try:
+                item = _wait(asyncio.run_coroutine_threadsafe(async_iterator.__anext__(), loop))
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        aclose = getattr(async_iterator, "aclose", None)
+        if aclose is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(aclose(), loop).result()
+            except (RuntimeError, asyncio.CancelledError):
+                pass  # Already running or cancelled, e.g. when interrupted in the middle of a chunk
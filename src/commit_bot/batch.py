@@ -0,0 +1,155 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set
+
+from .ai_models import AIModels, ModelExecutor
+from .diff_compaction import compact_staged_changes, get_token_counter
+from .diff_filter import read_filtered_diff
+from .prompts import build_prompt_messages, format_staged_changes
+from .prompts import deriv_sys_ppt_1 as defautl_sys_ppt
+from .utils import load_config, post_process_commit_message
+
+STAGED = "staged"
+
+
+@dataclass
+class BatchItem:
+    repo: str
+    commit: str  # Commit hash, or `staged` for the staged changes of the repository
+    subject: str = ""
+
+    @property
+    def item_id(self) -> str:
+        return f"{self.repo}@{self.commit}"
+
+
+def list_batch_items(repos: List[str], revision_range: Optional[str]) -> List[BatchItem]:
+    """Lists the commits of the range in each repository (oldest first), or the staged changes of each repository."""
+    items = []
+    for repo in repos:
+        repo = os.path.abspath(repo)
+        if revision_range is None:
+            # The staged diff is identified by its content, so that a resumed run regenerates it when it changed
+            diff = subprocess.run(["git", "-C", repo, "diff", "--cached"], capture_output=True, text=True, check=True).stdout
+            if diff.strip():
+                items.append(BatchItem(repo, f"{STAGED}:{hashlib.sha1(diff.encode()).hexdigest()[:12]}"))
+            continue
+        log = subprocess.run(["git", "-C", repo, "log", "--reverse", "--format=%H%x09%s", revision_range], capture_output=True, text=True, check=True).stdout
+        for line in log.splitlines():
+            commit, _, subject = line.partition("\t")
+            items.append(BatchItem(repo, commit, subject))
+    return items
+
+
+def read_item_diff(item: BatchItem) -> str:
+    if item.commit.startswith(STAGED):
+        command = ["git", "-C", item.repo, "diff", "--cached"]
+    else:
+        # Merge commits are diffed against their first parent
+        command = ["git", "-C", item.repo, "show", "--format=", "--no-color", "--diff-merges=first-parent", item.commit]
+    return read_filtered_diff(command, item.repo).text
+
+
+def load_done_ids(output_path: str) -> Set[str]:
+    """Reads the ids of the items that already have a message in the output, failed items are retried."""
+    done_ids: Set[str] = set()
+    if not os.path.exists(output_path):
+        return done_ids
+    with open(output_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # Line cut off by an interruption
+            if record.get("message"):
+                done_ids.add(record["id"])
+    return done_ids
+
+
+async def generate_batch(model: ModelExecutor, model_spec: str, items: List[BatchItem], output_path: str, max_in_flight: int) -> Dict[str, Any]:
+    """
+    Generates the messages of the items with at most `max_in_flight` concurrent requests, so that the vllm server
+    batches them, and appends one JSON line per item to the output as soon as it is done.
+    Returns:
+        Dict[str, Any]: Counts of generated and failed items, and the elapsed time.
+    """
+    semaphore = asyncio.Semaphore(max_in_flight)
+    stats = {"generated": 0, "failed": 0}
+    start = time.perf_counter()
+
+    async def generate_item(item: BatchItem, output_file: Any) -> None:
+        async with semaphore:
+            record: Dict[str, Any] = {"id": item.item_id, "repo": item.repo, "commit": item.commit, "subject": item.subject, "model": model_spec}
+            item_start = time.perf_counter()
+            try:
+                diff = await asyncio.to_thread(read_item_diff, item)
+                # Tokenizing blocks, off the event loop so that the requests of the other items keep streaming
+                prompt_changes = await asyncio.to_thread(compact_staged_changes, diff, model_spec)
+                message = await model.acomplete(build_prompt_messages(defautl_sys_ppt, format_staged_changes(prompt_changes)))
+                record["message"] = post_process_commit_message(message)
+                stats["generated"] += 1
+            except Exception as e:
+                record["error"] = f"{type(e).__name__}: {e}"
+                stats["failed"] += 1
+            record["seconds"] = round(time.perf_counter() - item_start, 3)
+        output_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        output_file.flush()
+        n_done = stats["generated"] + stats["failed"]
+        print(f"⌛ {n_done}/{len(items)} done ({stats['failed']} failed)", end="\r")
+
+    await model.aprepare()
+    await asyncio.to_thread(get_token_counter, model_spec)  # The tokenizer is loaded once, before the items compact their diffs in parallel
+    with open(output_path, "a") as output_file:
+        await asyncio.gather(*(generate_item(item, output_file) for item in items))
+    print(" " * 50, end="\r")
+    return {**stats, "seconds": time.perf_counter() - start}
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="commit-bot batch", description="Generate commit messages for a range of commits or for many repositories, without interaction.")
+    parser.add_argument("revision_range", nargs="?", default=None, help="Commits to generate messages for, e.g. `main..HEAD`. Without it, the staged changes of each repository are used.")
+    parser.add_argument("--repo", action="append", dest="repos", default=None, help="Repository to process, can be repeated (default: the current directory).")
+    parser.add_argument("--output", default="commit-bot-batch.jsonl", help="JSONL file the results are appended to. Items already in it are skipped, so an interrupted run can be resumed.")
+    parser.add_argument("--max-in-flight", type=int, default=None, help="Maximum number of concurrent requests (default: `batch_max_in_flight` in job.conf).")
+    parser.add_argument("--model", default=None, help="Model to use (default: `used_model` in job.conf).")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    job_conf = load_config("job.conf")
+    model_spec = args.model or job_conf["used_model"]
+    max_in_flight = args.max_in_flight or job_conf.get("batch_max_in_flight", 32)
+    model = AIModels().get_model(model_spec)
+    if not model:
+        print(f"❌ Model '{model_spec}' is not available.")
+        sys.exit(1)
+
+    try:
+        items = list_batch_items(args.repos or [os.getcwd()], args.revision_range)
+    except subprocess.CalledProcessError as e:
+        print(f"❌ Error listing the commits: {e.stderr.strip()}")
+        sys.exit(1)
+    done_ids = load_done_ids(args.output)
+    pending = [item for item in items if item.item_id not in done_ids]
+    print(f"🧠 Generating {len(pending)} commit messages using model '{model_spec}' with up to {max_in_flight} requests in flight ({len(items) - len(pending)} already in {args.output})...")
+    if not pending:
+        return
+
+    stats = asyncio.run(generate_batch(model, model_spec, pending, args.output, max_in_flight))
+    throughput = stats["generated"] / stats["seconds"] if stats["seconds"] > 0 else 0.0
+    print(f"✅ {stats['generated']} messages generated, {stats['failed']} failed, in {stats['seconds']:.1f}s ({throughput:.2f} messages/s). Results are in {args.output}")
+    if stats["failed"]:
+        print("🔁 Run the same command again to retry the failed items.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
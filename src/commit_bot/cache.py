@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .utils import get_user_cache_dir, load_config
+
+# Generation params that do not change the generated text, so they are left out of the cache key.
+NON_SEMANTIC_GEN_KEYS = ("api_base", "stream", "keep_alive")
+
+
+def make_cache_key(staged_changes: str, model_spec: str, sys_prompt: str, gen_conf: Dict[str, Any]) -> str:
+    """
+    Build a content-addressed key for a generated commit message.
+    Args:
+        staged_changes (str): The staged diff sent to the model.
+        model_spec (str): The model spec (key of `model_configs` in model.conf).
+        sys_prompt (str): The system prompt used for generation.
+        gen_conf (Dict[str, Any]): The effective generation configs.
+    Returns:
+        str: Hex digest identifying the request.
+    """
+    effective_gen_conf = {k: v for k, v in gen_conf.items() if k not in NON_SEMANTIC_GEN_KEYS}
+    hasher = hashlib.sha256()
+    for part in (staged_changes, model_spec, sys_prompt, json.dumps(effective_gen_conf, sort_keys=True, default=str)):
+        hasher.update(part.encode("utf-8"))
+        hasher.update(b"\0")
+    return hasher.hexdigest()
+
+
+class CommitMessageCache:
+    """On-disk LRU cache of generated commit messages, one JSON file per entry."""
+
+    def __init__(self, cache_dir: Path, max_entries: int = 200, max_bytes: int = 20 * 1024 * 1024, max_age_sec: float = 14 * 24 * 3600) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_sec = max_age_sec
+
+    @classmethod
+    def from_config(cls) -> "CommitMessageCache":
+        conf = load_config("job.conf")
+        cache_dir = conf.get("message_cache_dir", None)
+        cache_dir = Path(cache_dir).expanduser() if cache_dir else get_user_cache_dir() / "messages"
+        return cls(
+            cache_dir=cache_dir,
+            max_entries=conf.get("message_cache_max_entries", 200),
+            max_bytes=int(conf.get("message_cache_max_megabytes", 20) * 1024 * 1024),
+            max_age_sec=conf.get("message_cache_max_age_days", 14) * 24 * 3600,
+        )
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the cached message for `key`, or None on a miss or an expired entry."""
+        path = self._entry_path(key)
+        try:
+            if time.time() - path.stat().st_mtime > self.max_age_sec:
+                path.unlink(missing_ok=True)
+                return None
+            message = json.loads(path.read_text(encoding="utf-8"))["message"]
+            os.utime(path)  # Mark the entry as recently used
+            return message
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(self, key: str, message: str, model_spec: str = "") -> None:
+        """Stores `message` under `key` and evicts old entries if the cache is over its limits."""
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            payload = json.dumps({"message": message, "model_spec": model_spec, "created_at": time.time()})
+            with tempfile.NamedTemporaryFile(mode="w", dir=self.cache_dir, suffix=".tmp", delete=False, encoding="utf-8") as temp_file:
+                temp_file.write(payload)
+            os.replace(temp_file.name, self._entry_path(key))
+            self.evict()
+        except OSError as e:
+            print(f"⚠️ Failed to write the commit message cache. Details:\n{e}")
+
+    def _list_entries(self) -> List[Tuple[Path, os.stat_result]]:
+        entries = []
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                entries.append((path, path.stat()))
+            except OSError:
+                continue
+        return entries
+
+    def evict(self) -> None:
+        """Drops expired entries, then the least recently used ones until the count and size limits hold."""
+        now = time.time()
+        entries = []
+        for path, stat in self._list_entries():
+            if now - stat.st_mtime > self.max_age_sec:
+                path.unlink(missing_ok=True)
+            else:
+                entries.append((path, stat))
+        entries.sort(key=lambda entry: entry[1].st_mtime)
+        total_bytes = sum(stat.st_size for _, stat in entries)
+        while entries and (len(entries) > self.max_entries or total_bytes > self.max_bytes):
+            path, stat = entries.pop(0)
+            path.unlink(missing_ok=True)
+            total_bytes -= stat.st_size
+
+    def clear(self) -> None:
+        for path, _ in self._list_entries():
+            path.unlink(missing_ok=True)
@@ -0,0 +1,83 @@
+import queue
+import threading
+from typing import Any, Dict, Generator, List, Tuple
+
+from .ai_models import ChunkWrapper, ModelExecutor
+from .utils import post_process_commit_message
+
+
+def stream_candidates(model: ModelExecutor, messages: List[Dict[str, str]], n: int, **gen_overrides: Any) -> Generator[Tuple[int, ChunkWrapper], None, None]:
+    """
+    Streams `n` candidate completions, yielding `(candidate index, chunk)`.
+    Backends that support the `n` parameter (vllm) get a single request, others get `n` concurrent requests.
+    The last chunk of each candidate has a `finish_reason` in its response metadata.
+    """
+    model.prepare()
+    if model.supports_n:
+        yield from model.stream_choices(messages, n, **gen_overrides)
+        return
+
+    chunk_queue: "queue.Queue[Tuple[int, Any]]" = queue.Queue()
+    cancel_event = threading.Event()
+
+    def worker(index: int) -> None:
+        try:
+            response_chunks = model.stream_completion(messages, **gen_overrides)
+            for chunk in response_chunks:
+                if cancel_event.is_set():
+                    response_chunks.close()
+                    break
+                chunk_queue.put((index, chunk))
+            chunk_queue.put((index, ChunkWrapper("", "", response_metadata={"finish_reason": "stop"})))
+        except Exception as e:
+            chunk_queue.put((index, e))
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    try:
+        n_finished = 0
+        while n_finished < n:
+            index, item = chunk_queue.get()
+            if isinstance(item, Exception):
+                n_finished += 1
+                print(f"\n❌ Candidate {index + 1} failed: {item}")
+                continue
+            if item.response_metadata and item.response_metadata.get("finish_reason"):
+                n_finished += 1
+            yield index, item
+    finally:
+        cancel_event.set()
+
+
+def collect_candidates(model: ModelExecutor, messages: List[Dict[str, str]], n: int, **gen_overrides: Any) -> List[str]:
+    """Generates `n` candidate messages and lists each one as soon as it is finished."""
+    contents: List[List[str]] = [[] for _ in range(n)]
+    finished: List[str] = [""] * n
+    n_done = 0
+    print(f"⌛ Generating {n} candidates..., 0/{n} done", end="\r")
+    for index, chunk in stream_candidates(model, messages, n, **gen_overrides):
+        contents[index].append(chunk.content)
+        if chunk.response_metadata and chunk.response_metadata.get("finish_reason"):
+            n_done += 1
+            finished[index] = post_process_commit_message("".join(contents[index]))
+            print(" " * 50, end="\r")
+            print(f"── Candidate {index + 1} " + "─" * 40)
+            print(finished[index], end="\n\n")
+            print(f"⌛ Generating {n} candidates..., {n_done}/{n} done", end="\r")
+    print(" " * 50, end="\r")
+    return finished
+
+
+def pick_candidate(candidates: List[str]) -> str:
+    """Asks the user to pick one of the candidates by number, the first one is the default."""
+    valid = [i for i, candidate in enumerate(candidates) if candidate]
+    if not valid:
+        return ""
+    while True:
+        answer = input(f"Pick a candidate [{', '.join(str(i + 1) for i in valid)}] (default {valid[0] + 1}): ").strip()
+        if not answer:
+            return candidates[valid[0]]
+        if answer.isdigit() and int(answer) - 1 in valid:
+            return candidates[int(answer) - 1]
+        print("❗ Invalid candidate number.")
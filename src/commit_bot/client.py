@@ -0,0 +1,126 @@
+# Thin client of the commit-bot daemon.
+# It only imports the standard library, so that it stays cheap to import while the daemon does the heavy lifting.
+import json
+import os
+import socket
+from typing import Any, Dict, Generator, List, Optional
+
+SOCKET_ENV_VAR = "COMMIT_BOT_SOCKET"
+
+
+def get_default_socket_path() -> str:
+    """Returns `$COMMIT_BOT_SOCKET`, or `daemon.sock` in the commit-bot cache directory."""
+    if os.environ.get(SOCKET_ENV_VAR):
+        return os.environ[SOCKET_ENV_VAR]
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "commit-bot", "daemon.sock")
+
+
+class RemoteChunk:
+    """Chunk received from the daemon, with the same attributes as `ChunkWrapper`."""
+
+    def __init__(self, content: str, reasoning: str, response_metadata: Optional[Dict[str, Any]] = None) -> None:
+        self.content = content
+        self.reasoning = reasoning
+        self.response_metadata = response_metadata
+
+
+class DaemonClient:
+    def __init__(self, socket_path: Optional[str] = None, connect_timeout: float = 1.0) -> None:
+        self.socket_path = socket_path or get_default_socket_path()
+        self.connect_timeout = connect_timeout
+
+    def _request(self, payload: Dict[str, Any]) -> Generator[Dict[str, Any], None, None]:
+        """Sends one request and yields the JSON lines of the response until `done`."""
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(self.connect_timeout)
+            sock.connect(self.socket_path)
+            sock.settimeout(None)  # Generation can take arbitrarily long, e.g. while a server warms up
+            sock.sendall(json.dumps(payload).encode("utf-8") + b"\n")
+            with sock.makefile("r", encoding="utf-8") as reader:
+                for line in reader:
+                    message = json.loads(line)
+                    if "error" in message:
+                        raise RuntimeError(f"commit-bot daemon error: {message['error']}")
+                    if message.get("done"):
+                        if "result" in message:
+                            yield message
+                        return
+                    yield message
+            raise ConnectionError("commit-bot daemon closed the connection unexpectedly.")
+        finally:
+            sock.close()
+
+    def ping(self) -> bool:
+        try:
+            return bool(next(self._request({"op": "ping"}))["result"].get("pong"))
+        except (OSError, RuntimeError, ValueError, KeyError, StopIteration):
+            return False
+
+    def status(self) -> Dict[str, Any]:
+        """Returns the PID of the daemon and the connection reuse stats of its HTTP pools."""
+        return next(self._request({"op": "ping"}))["result"]
+
+    def describe(self, model_spec: str) -> Dict[str, Any]:
+        return next(self._request({"op": "describe", "model_spec": model_spec}))["result"]
+
+    def prepare(self, model_spec: str) -> None:
+        for _ in self._request({"op": "prepare", "model_spec": model_spec}):
+            pass
+
+    def complete(self, model_spec: str, messages: List[Dict[str, str]], gen_overrides: Dict[str, Any]) -> str:
+        return next(self._request({"op": "complete", "model_spec": model_spec, "messages": messages, "gen_overrides": gen_overrides}))["result"]
+
+    def stream(self, model_spec: str, messages: List[Dict[str, str]], gen_overrides: Dict[str, Any], prepare: bool = True) -> Generator[RemoteChunk, None, None]:
+        payload = {"op": "stream", "model_spec": model_spec, "messages": messages, "gen_overrides": gen_overrides, "prepare": prepare}
+        for message in self._request(payload):
+            yield RemoteChunk(message.get("content", ""), message.get("reasoning", ""), message.get("response_metadata"))
+
+    def shutdown(self) -> None:
+        for _ in self._request({"op": "shutdown"}):
+            pass
+
+
+class RemoteModelExecutor:
+    """Stands in for `ModelExecutor` when generation is served by the daemon."""
+
+    supports_n = False
+
+    def __init__(self, model_spec: str, client: DaemonClient) -> None:
+        self.model_spec = model_spec
+        self.client = client
+        self._description: Optional[Dict[str, Any]] = None
+
+    def _describe(self) -> Dict[str, Any]:
+        if self._description is None:
+            self._description = self.client.describe(self.model_spec)
+        return self._description
+
+    @property
+    def gen_conf(self) -> Dict[str, Any]:
+        return self._describe()["gen_conf"]
+
+    @property
+    def server_type(self) -> str:
+        return self._describe()["server_type"]
+
+    def prepare(self) -> None:
+        self.client.prepare(self.model_spec)
+
+    def complete(self, messages: List[Dict[str, str]], **gen_overrides: Any) -> str:
+        return self.client.complete(self.model_spec, messages, gen_overrides)
+
+    def stream(self, messages: List[Dict[str, str]], **gen_overrides: Any) -> Generator[RemoteChunk, None, None]:
+        yield from self.client.stream(self.model_spec, messages, gen_overrides, prepare=True)
+
+    def stream_completion(self, messages: List[Dict[str, str]], **gen_overrides: Any) -> Generator[RemoteChunk, None, None]:
+        yield from self.client.stream(self.model_spec, messages, gen_overrides, prepare=False)
+
+
+def connect_daemon(socket_path: Optional[str] = None) -> Optional[DaemonClient]:
+    """Returns a client of the running daemon, or None when no daemon is listening."""
+    client = DaemonClient(socket_path)
+    if not os.path.exists(client.socket_path):
+        return None
+    return client if client.ping() else None
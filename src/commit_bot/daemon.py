@@ -0,0 +1,137 @@
+import argparse
+import json
+import os
+import socketserver
+import sys
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from .ai_models import AIModels, ModelExecutor, import_litellm
+from .client import DaemonClient, get_default_socket_path
+from .http_pool import get_http_pool_stats
+
+
+class DaemonRequestHandler(socketserver.StreamRequestHandler):
+    """Serves one newline-delimited JSON request per connection."""
+
+    server: "DaemonServer"
+
+    def _send(self, message: Dict[str, Any]) -> None:
+        self.wfile.write(json.dumps(message).encode("utf-8") + b"\n")
+        self.wfile.flush()
+
+    def handle(self) -> None:
+        try:
+            request = json.loads(self.rfile.readline())
+            op = request.get("op")
+            if op == "ping":
+                self._send({"done": True, "result": {"pong": True, "pid": os.getpid(), "http_pool": get_http_pool_stats()}})
+            elif op == "shutdown":
+                self._send({"done": True, "result": {}})
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+            elif op == "describe":
+                model = self.server.get_model(request["model_spec"])
+                self._send({"done": True, "result": {"gen_conf": model.gen_conf, "server_type": model.server_type}})
+            elif op == "prepare":
+                self.server.prepare(request["model_spec"])
+                self._send({"done": True, "result": {}})
+            elif op == "complete":
+                model = self.server.get_model(request["model_spec"])
+                self._send({"done": True, "result": model.complete(request["messages"], **request.get("gen_overrides", {}))})
+            elif op == "stream":
+                self._stream(request)
+            else:
+                self._send({"error": f"Unknown op: {op}"})
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The client went away, e.g. the user aborted
+        except Exception as e:
+            try:
+                self._send({"error": f"{type(e).__name__}: {e}"})
+            except OSError:
+                pass
+
+    def _stream(self, request: Dict[str, Any]) -> None:
+        model = self.server.get_model(request["model_spec"])
+        if request.get("prepare", True):
+            self.server.prepare(request["model_spec"])
+        response_chunks = model.stream_completion(request["messages"], **request.get("gen_overrides", {}))
+        try:
+            for chunk in response_chunks:
+                self._send({"content": chunk.content, "reasoning": chunk.reasoning, "response_metadata": chunk.response_metadata})
+        finally:
+            # Closing the stream aborts the upstream request when the client disconnects
+            response_chunks.close()
+        self._send({"done": True})
+
+
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Long-lived process that keeps litellm imported and the configs and model executors warm,
+    so that `commit-bot` runs do not pay the startup cost.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, get_model: Optional[Callable[[str], ModelExecutor]] = None) -> None:
+        self.socket_path = socket_path
+        self._get_model = get_model or AIModels().get_model
+        # Server start/stop of the model lifecycle must not run concurrently
+        self._prepare_lock = threading.Lock()
+        os.makedirs(os.path.dirname(socket_path), exist_ok=True)
+        if os.path.exists(socket_path):
+            os.remove(socket_path)  # Stale socket of a daemon that did not exit cleanly
+        super().__init__(socket_path, DaemonRequestHandler)
+        os.chmod(socket_path, 0o600)
+
+    def get_model(self, model_spec: str) -> ModelExecutor:
+        model = self._get_model(model_spec)
+        if not model:
+            raise ValueError(f"Model '{model_spec}' is not available.")
+        return model
+
+    def prepare(self, model_spec: str) -> None:
+        with self._prepare_lock:
+            self.get_model(model_spec).prepare()
+
+    def server_close(self) -> None:
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(prog="commit-bot-daemon", description="Serve commit-bot generation requests from a long-lived process.")
+    parser.add_argument("--socket", default=None, help="Path of the Unix domain socket (default: $COMMIT_BOT_SOCKET or ~/.cache/commit-bot/daemon.sock).")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--stop", action="store_true", help="Stop the running daemon.")
+    group.add_argument("--status", action="store_true", help="Check whether the daemon is running.")
+    args = parser.parse_args(argv)
+
+    socket_path = args.socket or get_default_socket_path()
+    client = DaemonClient(socket_path)
+    if args.stop or args.status:
+        running = client.ping()
+        if running and args.stop:
+            client.shutdown()
+            print("🛑 commit-bot daemon stopped.")
+        else:
+            print(f"{'✅' if running else '❌'} commit-bot daemon is {'' if running else 'not '}running on {socket_path}.")
+            for origin, stats in (client.status().get("http_pool", {}) if running else {}).items():
+                print(f"🔌 {origin}: {stats['requests']} requests over {stats['connections']} connections ({stats['reused']} reused)")
+        sys.exit(0 if running else 1)
+    if client.ping():
+        print(f"❌ A commit-bot daemon is already running on {socket_path}.")
+        sys.exit(1)
+
+    import_litellm()  # Pay for the slowest import once, up front
+    with DaemonServer(socket_path) as server:
+        print(f"🤖 commit-bot daemon (PID {os.getpid()}) is listening on {socket_path}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    print("🛑 commit-bot daemon stopped.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from .utils import load_config
+
+# Lower value means higher signal; files and hunks are kept in this order when the diff is over budget.
+SOURCE_PRIORITY = 0
+TEST_PRIORITY = 1
+LOCKFILE_PRIORITY = 2
+
+LOCKFILE_PATTERNS = [
+    r"(^|/)[^/]*\.lock$",
+    r"(^|/)package-lock\.json$",
+    r"(^|/)pnpm-lock\.yaml$",
+    r"(^|/)go\.sum$",
+    r"(^|/)Cargo\.lock$",
+    r"\.min\.(js|css)$",
+    r"(^|/)(vendor|node_modules|third_party)/",
+    r"_pb2\.pyi?$",
+    r"\.pb\.go$",
+]
+TEST_DOC_PATTERNS = [
+    r"(^|/)tests?/",
+    r"(^|/)test_[^/]*$",
+    r"_test\.[^/]+$",
+    r"\.(spec|test)\.[^/]+$",
+    r"(^|/)docs?/",
+    r"\.(md|rst|txt)$",
+]
+
+_DIFF_FILE_HEADER = re.compile(r"^diff --git a/(.+?) b/(.+)$")
+_TOKENIZER_CACHE: Dict[str, Optional[Callable[[str], int]]] = {}
+
+
+@dataclass
+class Hunk:
+    lines: List[str]
+    additions: int = 0
+    deletions: int = 0
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+
+@dataclass
+class FileDiff:
+    path: str
+    header: List[str]
+    hunks: List[Hunk] = field(default_factory=list)
+
+    @property
+    def additions(self) -> int:
+        return sum(h.additions for h in self.hunks)
+
+    @property
+    def deletions(self) -> int:
+        return sum(h.deletions for h in self.hunks)
+
+
+def approx_token_count(text: str) -> int:
+    """Fast token estimate (~4 characters per token) used when no tokenizer is available."""
+    return len(text) // 4 + 1
+
+
+def get_token_counter(model_spec: str) -> Callable[[str], int]:
+    """
+    Returns a token counting function for the model.
+    The model's own tokenizer is used when its weights are available locally (vllm and hf-local models),
+    otherwise a character based approximation is used.
+    """
+    if model_spec in _TOKENIZER_CACHE:
+        return _TOKENIZER_CACHE[model_spec] or approx_token_count
+    counter = None
+    model_conf = load_config("model.conf").get_config("model_configs").get(f'"{model_spec}"', None)
+    weights_path = None
+    if model_conf is not None and model_conf.get("server_type") == "vllm":
+        weights_root_dir = load_config("job.conf").get("vllm_model_weights_root_dir", "")
+        weights_path = os.path.join(weights_root_dir, model_conf.get("model_id").split("/")[-1])
+    elif model_conf is not None and model_conf.get("server_type") == "hf-local":
+        weights_path = model_conf.get("model_path")
+    if weights_path is not None:
+        # `model_path` of hf-local models can also be a hub id, resolved by transformers
+        if os.path.isdir(weights_path) or model_conf.get("server_type") == "hf-local":
+            try:
+                from transformers import AutoTokenizer
+
+                tokenizer = AutoTokenizer.from_pretrained(weights_path)
+                counter = lambda text: len(tokenizer.encode(text, add_special_tokens=False))  # noqa: E731
+            except Exception as e:
+                print(f"⚠️ Failed to load the tokenizer of {model_spec}, falling back to approximate token counts. Details:\n{e}")
+    _TOKENIZER_CACHE[model_spec] = counter
+    return counter or approx_token_count
+
+
+def get_diff_token_budget(model_spec: str) -> int:
+    """Returns the diff token budget of the model, from `model_configs` or `default_diff_token_budget` in model.conf."""
+    conf = load_config("model.conf")
+    default_budget = conf.get("default_diff_token_budget", 6000)
+    model_conf = conf.get_config("model_configs").get(f'"{model_spec}"', None)
+    return model_conf.get("diff_token_budget", default_budget) if model_conf is not None else default_budget
+
+
+def parse_diff(diff: str) -> List[FileDiff]:
+    """Splits a unified `git diff` output into files and hunks."""
+    files: List[FileDiff] = []
+    for line in diff.splitlines():
+        match = _DIFF_FILE_HEADER.match(line)
+        if match:
+            files.append(FileDiff(path=match.group(2), header=[line]))
+        elif not files:
+            continue
+        elif line.startswith("@@"):
+            files[-1].hunks.append(Hunk(lines=[line]))
+        elif not files[-1].hunks:
+            files[-1].header.append(line)
+        else:
+            hunk = files[-1].hunks[-1]
+            hunk.lines.append(line)
+            if line.startswith("+"):
+                hunk.additions += 1
+            elif line.startswith("-"):
+                hunk.deletions += 1
+    return files
+
+
+def classify_path(path: str) -> int:
+    if any(re.search(pattern, path) for pattern in LOCKFILE_PATTERNS):
+        return LOCKFILE_PRIORITY
+    if any(re.search(pattern, path) for pattern in TEST_DOC_PATTERNS):
+        return TEST_PRIORITY
+    return SOURCE_PRIORITY
+
+
+def format_stat_line(file_diff: FileDiff, note: str) -> str:
+    return f" {file_diff.path} | +{file_diff.additions} -{file_diff.deletions} ({note})"
+
+
+def compact_diff(diff: str, token_budget: int, count_tokens: Callable[[str], int] = approx_token_count) -> str:
+    """
+    Cuts a diff down to `token_budget` tokens.
+    Hunks are ranked by file type (source over tests over lockfiles), then additions over pure deletions,
+    then small dense hunks first. Dropped hunks are replaced with a `--stat`-style summary.
+    Lines before the first file (e.g. the list of excluded files) are kept.
+    Args:
+        diff (str): Output of `git diff`.
+        token_budget (int): Maximum number of tokens of the returned diff.
+        count_tokens (Callable[[str], int]): Token counting function of the target model.
+    Returns:
+        str: The diff itself when it fits, otherwise the compacted diff.
+    """
+    if count_tokens(diff) <= token_budget:
+        return diff
+    files = parse_diff(diff)
+    if not files:
+        return diff
+
+    ranked = []
+    for file_idx, file_diff in enumerate(files):
+        priority = classify_path(file_diff.path)
+        for hunk_idx, hunk in enumerate(file_diff.hunks):
+            changed = hunk.additions + hunk.deletions
+            density = changed / max(len(hunk.lines) - 1, 1)
+            tokens = count_tokens(hunk.text)
+            is_pure_deletion = hunk.additions == 0
+            ranked.append(((priority, is_pure_deletion, tokens / max(density, 0.05)), file_idx, hunk_idx, tokens))
+    ranked.sort(key=lambda item: item[0])
+
+    preamble = "" if diff.startswith("diff --git ") else diff[: diff.find("\ndiff --git ") + 1]
+    # Reserve room for the preamble, the file headers and the summary of what was left out
+    used_tokens = count_tokens(preamble) + sum(count_tokens("\n".join(f.header)) for f in files) + sum(count_tokens(format_stat_line(f, "omitted")) for f in files)
+    kept = set()
+    for _, file_idx, hunk_idx, tokens in ranked:
+        if used_tokens + tokens > token_budget:
+            continue
+        kept.add((file_idx, hunk_idx))
+        used_tokens += tokens
+
+    kept_lines: List[str] = preamble.splitlines()
+    summary_lines: List[str] = []
+    for file_idx, file_diff in enumerate(files):
+        kept_hunks = [hunk for hunk_idx, hunk in enumerate(file_diff.hunks) if (file_idx, hunk_idx) in kept]
+        if not kept_hunks and file_diff.hunks:
+            summary_lines.append(format_stat_line(file_diff, "omitted"))
+            continue
+        kept_lines.extend(file_diff.header)
+        kept_lines.extend(line for hunk in kept_hunks for line in hunk.lines)
+        if len(kept_hunks) < len(file_diff.hunks):
+            summary_lines.append(format_stat_line(file_diff, f"{len(file_diff.hunks) - len(kept_hunks)} of {len(file_diff.hunks)} hunks omitted"))
+
+    if summary_lines:
+        kept_lines.append("")
+        kept_lines.append(f"# {len(summary_lines)} file(s) were shortened or omitted to fit the token budget:")
+        kept_lines.extend(summary_lines)
+    return "\n".join(kept_lines)
+
+
+def compact_staged_changes(staged_changes: str, model_spec: str) -> str:
+    """Compacts the staged changes to the diff token budget of the model."""
+    token_budget = get_diff_token_budget(model_spec)
+    count_tokens = get_token_counter(model_spec)
+    compacted = compact_diff(staged_changes, token_budget, count_tokens)
+    if compacted is not staged_changes:
+        print(f"✂️ Staged changes exceed the {token_budget}-token budget of '{model_spec}', lower-signal hunks are summarized.")
+    return compacted
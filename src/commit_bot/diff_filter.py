@@ -0,0 +1,104 @@
+import os
+import subprocess
+from typing import Any, List, Optional
+
+from .git_diff import StagedDiff, read_staged_diff
+from .utils import load_config
+
+IGNORE_FILE_NAME = ".commitbotignore"
+GIT_STATUS_NAMES = {"A": "added", "C": "copied", "D": "deleted", "M": "modified", "R": "renamed", "T": "type changed"}
+WHITESPACE_OPTIONS = {"space-at-eol": "--ignore-space-at-eol", "space-change": "--ignore-space-change", "all-space": "--ignore-all-space"}
+
+
+def get_repo_root(repo: Optional[str] = None) -> Optional[str]:
+    command = ["git"] + (["-C", repo] if repo else []) + ["rev-parse", "--show-toplevel"]
+    result = subprocess.run(command, capture_output=True, text=True)
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def load_exclude_patterns(repo_root: Optional[str]) -> List[str]:
+    """
+    Patterns of the files left out of the diff: `diff_exclude_patterns` of job.conf, then the `.commitbotignore` file
+    at the root of the repository. Its lines are gitignore-like patterns, `!pattern` turns an earlier pattern off.
+    """
+    patterns = list(load_config("job.conf").get("diff_exclude_patterns", []))
+    ignore_file = os.path.join(repo_root, IGNORE_FILE_NAME) if repo_root else None
+    if ignore_file and os.path.isfile(ignore_file):
+        with open(ignore_file, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                if line.startswith("!"):
+                    patterns = [pattern for pattern in patterns if pattern != line[1:]]
+                elif line not in patterns:
+                    patterns.append(line)
+    return patterns
+
+
+def to_pathspec(pattern: str, exclude: bool = True) -> str:
+    """
+    Turns a gitignore-like pattern into a git pathspec relative to the top of the repository, e.g.
+    `*.lock` -> `:(top,exclude,glob)**/*.lock` and `vendor/` -> `:(top,exclude,glob)**/vendor/**`.
+    Like in .gitignore, a pattern with a slash (other than a trailing one) is anchored at the top.
+    """
+    is_directory = pattern.endswith("/")
+    pattern = pattern.rstrip("/")
+    if "/" in pattern:
+        pattern = pattern.lstrip("/")
+    else:
+        pattern = "**/" + pattern
+    if is_directory:
+        pattern += "/**"
+    return f":(top,{'exclude,' if exclude else ''}glob){pattern}"
+
+
+def get_diff_options(job_conf: Any) -> List[str]:
+    """Options of the diff from job.conf: context lines, whitespace, rename detection, and never any textconv or external diff."""
+    options = ["--no-color", "--no-ext-diff", "--no-textconv", f"--unified={job_conf.get('diff_context_lines', 3)}"]
+    whitespace = job_conf.get("diff_ignore_whitespace", "none")
+    if whitespace in WHITESPACE_OPTIONS:
+        options.append(WHITESPACE_OPTIONS[whitespace])
+    if job_conf.get("diff_find_renames", True):
+        options.append("--find-renames")
+    return options
+
+
+def list_excluded_files(base_command: List[str], patterns: List[str]) -> List[str]:
+    """One-line `--stat`-style entries of the changed files matching the patterns, from their status only (their content is not diffed)."""
+    if not patterns:
+        return []
+    command = base_command + ["--name-status", "--no-renames", "--"] + [to_pathspec(pattern, exclude=False) for pattern in patterns]
+    output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+    entries = []
+    for line in output.splitlines():
+        status, _, path = line.partition("\t")
+        if path:
+            entries.append(f" {path} | {GIT_STATUS_NAMES.get(status[:1], status)} (excluded)")
+    return entries
+
+
+def read_filtered_diff(base_command: List[str], repo: Optional[str] = None) -> StagedDiff:
+    """
+    Reads a diff (`git diff --cached`, `git show <commit>`...) without the files matching the exclusion patterns,
+    with the diff options of job.conf. Git never diffs the excluded files, they are listed before the diff instead.
+    Args:
+        base_command (List[str]): Git command producing the diff, without options nor pathspecs.
+        repo (Optional[str]): Repository of the command, the current one by default.
+    Returns:
+        StagedDiff: The filtered diff, preceded by the list of the excluded files.
+    """
+    job_conf = load_config("job.conf")
+    if not job_conf.get("diff_filter_enabled", True):
+        return read_staged_diff(base_command)
+    patterns = load_exclude_patterns(get_repo_root(repo))
+    command = base_command + get_diff_options(job_conf) + ["--"] + [to_pathspec(pattern) for pattern in patterns]
+    staged_diff = read_staged_diff(command)
+    excluded = list_excluded_files(base_command, patterns)
+    if not staged_diff.text.strip() and not excluded:
+        # Whitespace-only changes disappear with the whitespace options, the plain diff is better than nothing
+        return read_staged_diff(base_command)
+    if excluded:
+        header = f"# {len(excluded)} file(s) were excluded from the diff by the `{IGNORE_FILE_NAME}` rules:\n" + "\n".join(excluded) + "\n\n"
+        staged_diff.text = header + staged_diff.text
+    return staged_diff
@@ -0,0 +1,95 @@
+import os
+import shlex
+import subprocess
+import sys
+import tempfile
+from dataclasses import dataclass
+from typing import List, Optional
+
+from .utils import load_config
+
+READ_CHUNK_BYTES = 64 * 1024
+
+
+@dataclass
+class StagedDiff:
+    text: str
+    truncated: bool = False
+    bytes_read: int = 0
+    lines_read: int = 0
+
+
+def read_bounded_output(command: List[str], max_bytes: int, max_lines: int) -> StagedDiff:
+    """
+    Runs a command and consumes its stdout incrementally, without any wall-clock timeout.
+    The process is stopped as soon as the output exceeds `max_bytes` or `max_lines`.
+    Args:
+        command (List[str]): The command to run.
+        max_bytes (int): Maximum number of bytes kept from stdout.
+        max_lines (int): Maximum number of lines kept from stdout.
+    Returns:
+        StagedDiff: The kept output and whether it was cut off.
+    Raises:
+        subprocess.CalledProcessError: When the command fails before it is cut off.
+    """
+    chunks: List[bytes] = []
+    bytes_read = 0
+    lines_read = 0
+    truncated = False
+    # stderr goes to a file so that a chatty stderr can never block the process while stdout is being read
+    with tempfile.TemporaryFile() as stderr_file, subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr_file) as proc:
+        while True:
+            chunk = proc.stdout.read1(READ_CHUNK_BYTES)
+            if not chunk:
+                break
+            chunk_lines = chunk.count(b"\n")
+            if bytes_read + len(chunk) > max_bytes or lines_read + chunk_lines > max_lines:
+                # Keep whole lines only, up to whichever limit is hit first
+                for line in chunk.splitlines(keepends=True):
+                    if bytes_read + len(line) > max_bytes or lines_read >= max_lines or not line.endswith(b"\n"):
+                        break
+                    chunks.append(line)
+                    bytes_read += len(line)
+                    lines_read += 1
+                truncated = True
+                proc.kill()
+                break
+            chunks.append(chunk)
+            bytes_read += len(chunk)
+            lines_read += chunk_lines
+        returncode = proc.wait()
+        stderr_file.seek(0)
+        stderr = stderr_file.read()
+    if returncode != 0 and not truncated:
+        raise subprocess.CalledProcessError(returncode, command, output=b"".join(chunks), stderr=stderr.decode("utf-8", errors="replace"))
+    output = b"".join(chunks)
+    if truncated:
+        # A line that started in an earlier chunk may have been cut off with it
+        output = output[: output.rfind(b"\n") + 1]
+        bytes_read = len(output)
+    text = output.decode("utf-8", errors="replace")
+    return StagedDiff(text=text, truncated=truncated, bytes_read=bytes_read, lines_read=lines_read)
+
+
+def read_staged_diff(command: List[str], max_bytes: Optional[int] = None, max_lines: Optional[int] = None) -> StagedDiff:
+    """Reads the staged diff within the `staged_diff_max_*` limits of job.conf."""
+    conf = load_config("job.conf")
+    max_bytes = max_bytes if max_bytes is not None else int(conf.get("staged_diff_max_megabytes", 8) * 1024 * 1024)
+    max_lines = max_lines if max_lines is not None else conf.get("staged_diff_max_lines", 200000)
+    staged_diff = read_bounded_output(command, max_bytes, max_lines)
+    if staged_diff.truncated:
+        print(f"✂️ Staged changes are larger than the configured limit, only the first {staged_diff.lines_read} lines ({staged_diff.bytes_read} bytes) are used.")
+        staged_diff.text += f"\n# [commit-bot] The staged diff was cut off after {staged_diff.lines_read} lines.\n"
+    return staged_diff
+
+
+def show_in_pager(text: str) -> None:
+    """Shows text through `$GIT_PAGER`/`$PAGER` (default `less -R`) when stdout is a terminal, otherwise prints it."""
+    if not sys.stdout.isatty():
+        print(text)
+        return
+    pager = os.environ.get("GIT_PAGER") or os.environ.get("PAGER") or "less -R"
+    try:
+        subprocess.run(shlex.split(pager), input=text, text=True, encoding="utf-8", check=False)
+    except FileNotFoundError:
+        print(text)
@@ -0,0 +1,109 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, Generator, List, Optional, Tuple
+
+from .ai_models import ChunkWrapper, ModelExecutor, import_litellm
+from .background_loop import iterate_in_background
+
+PRIMARY, FALLBACK = "primary", "fallback"
+
+
+@dataclass
+class HedgeOutcome:
+    """What happened to a hedged stream: whether the fallback request was sent, and which request streamed first."""
+
+    hedged: bool = False
+    winner: Optional[str] = None
+    winner_model: Optional[str] = None
+    errors: Dict[str, str] = field(default_factory=dict)
+
+
+async def _first_token(chunks: AsyncIterator[ChunkWrapper]) -> Tuple[List[ChunkWrapper], bool]:
+    """Reads the stream up to its first chunk with content or reasoning, returns the chunks read and whether the stream ended."""
+    read = []
+    async for chunk in chunks:
+        read.append(chunk)
+        if chunk.content or chunk.reasoning:
+            return read, False
+    return read, True
+
+
+async def _close(task: "asyncio.Task[Any]", chunks: AsyncGenerator[ChunkWrapper, None]) -> None:
+    """Cancels the request of the losing stream, closing its connection so that the server stops generating."""
+    task.cancel()
+    try:
+        await task
+    except BaseException:
+        pass
+    await chunks.aclose()
+
+
+async def _race(tasks: Dict[str, "asyncio.Task[Tuple[List[ChunkWrapper], bool]]"], outcome: HedgeOutcome) -> str:
+    """Waits for the first request to stream a first token, failed requests drop out of the race (primary first on a tie)."""
+    while True:
+        for name, task in tasks.items():
+            if not task.done():
+                continue
+            if task.exception() is None:
+                return name
+            outcome.errors.setdefault(name, f"{type(task.exception()).__name__}: {task.exception()}")
+        pending = [task for task in tasks.values() if not task.done()]
+        if not pending:
+            raise tasks[PRIMARY].exception()  # type: ignore[misc]
+        await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+
+async def ahedged_stream(
+    primary: ModelExecutor,
+    fallback: ModelExecutor,
+    messages: List[Dict[str, str]],
+    first_token_deadline_sec: float,
+    outcome: Optional[HedgeOutcome] = None,
+    **gen_overrides: Any,
+) -> AsyncGenerator[ChunkWrapper, None]:
+    """
+    Streams the completion of `primary` (server start included), hedged by `fallback`: when the primary request has not
+    streamed a first token within `first_token_deadline_sec`, or failed before it, the same request is sent to the
+    fallback model. Whichever streams a first token first wins, the other request is cancelled.
+    The fallback request skips the server lifecycle of `prepare()`, its server is expected to be up (ollama, third-party).
+    Args:
+        primary (ModelExecutor): Model of the request.
+        fallback (ModelExecutor): Model of the hedging request.
+        messages (List[Dict[str, str]]): Chat messages.
+        first_token_deadline_sec (float): Time to first token of the primary request before hedging.
+        outcome (Optional[HedgeOutcome]): Filled with the outcome of the race, for the telemetry.
+        **gen_overrides: Generation configs of both requests.
+    """
+    outcome = outcome if outcome is not None else HedgeOutcome()
+    # Both requests need litellm, its first import must not count towards the deadline
+    await asyncio.to_thread(import_litellm)
+    models = {PRIMARY: primary, FALLBACK: fallback}
+    streams: Dict[str, AsyncGenerator[ChunkWrapper, None]] = {PRIMARY: primary.astream(messages, **gen_overrides)}
+    tasks: Dict[str, "asyncio.Task[Tuple[List[ChunkWrapper], bool]]"] = {PRIMARY: asyncio.ensure_future(_first_token(streams[PRIMARY]))}
+    try:
+        await asyncio.wait([tasks[PRIMARY]], timeout=first_token_deadline_sec)
+        if not tasks[PRIMARY].done() or tasks[PRIMARY].exception() is not None:
+            outcome.hedged = True
+            streams[FALLBACK] = fallback.astream_completion(messages, **gen_overrides)
+            tasks[FALLBACK] = asyncio.ensure_future(_first_token(streams[FALLBACK]))
+        winner = await _race(tasks, outcome)
+        outcome.winner, outcome.winner_model = winner, models[winner].model_id
+        for name in [name for name in tasks if name != winner]:
+            await _close(tasks.pop(name), streams.pop(name))
+
+        chunks, ended = tasks[winner].result()
+        for chunk in chunks:
+            yield chunk
+        if not ended:
+            async for chunk in streams[winner]:
+                yield chunk
+    finally:
+        for name, task in tasks.items():
+            await _close(task, streams[name])
+
+
+def stream_hedged(
+    primary: ModelExecutor, fallback: ModelExecutor, messages: List[Dict[str, str]], first_token_deadline_sec: float, outcome: Optional[HedgeOutcome] = None, **gen_overrides: Any
+) -> Generator[ChunkWrapper, None, None]:
+    """Synchronous `ahedged_stream()`, closing the generator cancels both requests."""
+    yield from iterate_in_background(ahedged_stream(primary, fallback, messages, first_token_deadline_sec, outcome, **gen_overrides))
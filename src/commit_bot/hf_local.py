@@ -0,0 +1,246 @@
+import asyncio
+import threading
+from collections import OrderedDict
+from contextlib import aclosing
+from typing import Any, AsyncGenerator, Callable, Dict, Generator, List, Optional, Tuple
+
+from .ai_models import ChunkWrapper
+from .background_loop import iterate_in_background, run_in_background
+from .utils import load_config
+
+# Generation configs of litellm (OpenAI names) -> `generate()` arguments of transformers
+GEN_CONF_TO_GENERATE_KWARGS = {"max_tokens": "max_new_tokens", "temperature": "temperature", "top_p": "top_p", "top_k": "top_k", "repetition_penalty": "repetition_penalty"}
+
+
+def estimate_model_bytes(model: Any) -> int:
+    """Memory taken by the parameters and buffers of a torch model."""
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+
+
+def load_hf_model(model_path: str, torch_dtype: str = "auto", device_map: str = "cpu") -> Tuple[Any, Any]:
+    """Loads the model and tokenizer of a local checkpoint directory or Hugging Face hub id."""
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    # Any `device_map` requires accelerate, the CPU is the default device anyway
+    device_kwargs = {"device_map": device_map} if device_map != "cpu" else {}
+    model = AutoModelForCausalLM.from_pretrained(model_path, torch_dtype=torch_dtype, **device_kwargs)
+    model.eval()
+    return model, tokenizer
+
+
+class HFModelCache:
+    """
+    Keeps loaded models resident in the process (the CLI or the daemon) within a memory budget,
+    evicting the least recently used ones when a new model does not fit.
+    """
+
+    def __init__(self, memory_budget_bytes: int, measure: Callable[[Any], int] = estimate_model_bytes) -> None:
+        self.memory_budget_bytes = memory_budget_bytes
+        self.measure = measure
+        self._entries: "OrderedDict[str, Tuple[Any, Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self.stats = {"hits": 0, "loads": 0, "evictions": 0}
+
+    @property
+    def used_bytes(self) -> int:
+        return sum(entry[2] for entry in self._entries.values())
+
+    def get(self, key: str, loader: Callable[[], Tuple[Any, Any]]) -> Tuple[Any, Any]:
+        """Returns the cached `(model, tokenizer)` of the key, loading it with `loader` (once, even when called concurrently)."""
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        with load_lock:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    model, tokenizer, _ = self._entries[key]
+                    return model, tokenizer
+            model, tokenizer = loader()
+            n_bytes = self.measure(model)
+            with self._lock:
+                while self._entries and self.used_bytes + n_bytes > self.memory_budget_bytes:
+                    evicted_key, _ = self._entries.popitem(last=False)
+                    self.stats["evictions"] += 1
+                    print(f"🛑 Unloaded the least recently used local model {evicted_key} to stay within the memory budget.")
+                self._entries[key] = (model, tokenizer, n_bytes)
+                self.stats["loads"] += 1
+            return model, tokenizer
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            return list(self._entries)
+
+
+_MODEL_CACHE: Optional[HFModelCache] = None
+_MODEL_CACHE_LOCK = threading.Lock()
+
+
+def get_hf_model_cache() -> HFModelCache:
+    global _MODEL_CACHE
+    with _MODEL_CACHE_LOCK:
+        if _MODEL_CACHE is None:
+            budget_gigabytes = load_config("job.conf").get("hf_local_memory_budget_gigabytes", 4)
+            _MODEL_CACHE = HFModelCache(int(budget_gigabytes * 1024**3))
+        return _MODEL_CACHE
+
+
+class BatchTextStreamer:
+    """
+    Streamer of `generate()` that decodes each returned sequence incrementally and hands
+    `(sequence index, text delta)` to `on_text`, for one or several sequences (`num_return_sequences`).
+    """
+
+    def __init__(self, tokenizer: Any, n: int, on_text: Callable[[int, str], None], on_end: Callable[[], None]) -> None:
+        self.tokenizer = tokenizer
+        self.n = n
+        self.on_text = on_text
+        self.on_end = on_end
+        self._token_ids: List[List[int]] = [[] for _ in range(n)]
+        self._texts = [""] * n
+        self._prompt_skipped = False
+
+    def put(self, value: Any) -> None:
+        if not self._prompt_skipped:
+            self._prompt_skipped = True  # The first call carries the prompt
+            return
+        for index, token_id in enumerate(value.reshape(-1).tolist()[: self.n]):
+            self._token_ids[index].append(token_id)
+            text = self.tokenizer.decode(self._token_ids[index], skip_special_tokens=True)
+            # Wait for complete characters, a multi-byte character can span several tokens
+            if text.endswith("�") or len(text) <= len(self._texts[index]):
+                continue
+            delta, self._texts[index] = text[len(self._texts[index]) :], text
+            self.on_text(index, delta)
+
+    def end(self) -> None:
+        self.on_end()
+
+
+class HFLocalExecutor:
+    """
+    In-process transformers backend (`server_type=hf-local`), a no-server path for small models on CPU.
+    It has the same interface as `ModelExecutor`, with weights loaded once per process through `HFModelCache`.
+    """
+
+    supports_n = True
+
+    def __init__(self, model_id: str, gen_conf: Dict[str, Any], model_path: str, torch_dtype: str = "auto", device_map: str = "cpu", cache: Optional[HFModelCache] = None, thinking: Optional[bool] = None) -> None:
+        self.model_id = model_id
+        self.gen_conf = gen_conf.copy()
+        self.server_type = "hf-local"
+        self.model_path = model_path
+        self.torch_dtype = torch_dtype
+        self.device_map = device_map
+        self._cache = cache
+        self.thinking = thinking
+
+    @property
+    def cache(self) -> HFModelCache:
+        return self._cache or get_hf_model_cache()
+
+    def _load(self) -> Tuple[Any, Any]:
+        return self.cache.get(self.model_path, lambda: load_hf_model(self.model_path, self.torch_dtype, self.device_map))
+
+    def prepare(self) -> None:
+        """Loads the model into the residency cache, unless it is already loaded."""
+        if self.model_path not in self.cache.keys():
+            print(f"🗄️ Loading local model {self.model_path}...")
+        self._load()
+
+    async def aprepare(self) -> None:
+        await asyncio.to_thread(self.prepare)
+
+    def _generate_kwargs(self, params: Dict[str, Any], n: int) -> Dict[str, Any]:
+        kwargs = {GEN_CONF_TO_GENERATE_KWARGS[key]: value for key, value in params.items() if key in GEN_CONF_TO_GENERATE_KWARGS}
+        kwargs["do_sample"] = kwargs.get("temperature", 0) > 0 or n > 1
+        if not kwargs["do_sample"]:
+            for key in ["temperature", "top_p", "top_k"]:
+                kwargs.pop(key, None)
+        kwargs["num_return_sequences"] = n
+        return kwargs
+
+    async def _astream_sequences(self, messages: List[Dict[str, str]], n: int, **gen_overrides: Any) -> AsyncGenerator[Tuple[int, str, Optional[str]], None]:
+        """
+        Generates `n` sequences in one batched `generate()` call in a worker thread, yielding `(index, text delta, finish_reason)`.
+        Stopping the iteration early stops the generation at the next token.
+        """
+        from transformers import StoppingCriteria, StoppingCriteriaList
+
+        model, tokenizer = await asyncio.to_thread(self._load)
+        loop = asyncio.get_running_loop()
+        deltas: "asyncio.Queue[Optional[Tuple[int, str]]]" = asyncio.Queue()
+        cancel_event = threading.Event()
+
+        class CancelCriteria(StoppingCriteria):
+            def __call__(self, input_ids: Any, scores: Any, **kwargs: Any) -> bool:
+                return cancel_event.is_set()
+
+        streamer = BatchTextStreamer(
+            tokenizer, n, on_text=lambda index, text: loop.call_soon_threadsafe(deltas.put_nowait, (index, text)), on_end=lambda: loop.call_soon_threadsafe(deltas.put_nowait, None)
+        )
+        # Extra keyword arguments are passed to the chat template, the Qwen3 one turns thinking off with `enable_thinking=False`
+        template_kwargs = {"enable_thinking": self.thinking} if self.thinking is not None else {}
+        # A dict on all transformers versions (only v5 returns one by default), with the attention mask
+        inputs = tokenizer.apply_chat_template(messages, add_generation_prompt=True, return_tensors="pt", return_dict=True, **template_kwargs).to(model.device)
+        kwargs = self._generate_kwargs({**self.gen_conf, **gen_overrides}, n)
+        if tokenizer.pad_token_id is None:
+            kwargs["pad_token_id"] = tokenizer.eos_token_id
+
+        def generate() -> None:
+            try:
+                model.generate(**inputs, streamer=streamer, stopping_criteria=StoppingCriteriaList([CancelCriteria()]), **kwargs)
+            except Exception as e:
+                loop.call_soon_threadsafe(deltas.put_nowait, (-1, f"{type(e).__name__}: {e}"))
+                loop.call_soon_threadsafe(deltas.put_nowait, None)
+
+        generation = loop.run_in_executor(None, generate)
+        try:
+            while True:
+                item = await deltas.get()
+                if item is None:
+                    break
+                if item[0] < 0:
+                    raise RuntimeError(f"Local generation failed: {item[1]}")
+                yield item[0], item[1], None
+            for index in range(n):
+                yield index, "", "stop"
+        finally:
+            cancel_event.set()
+            await generation
+
+    async def acomplete(self, messages: List[Dict[str, str]], **gen_overrides: Any) -> str:
+        return "".join([chunk.content async for chunk in self.astream_completion(messages, **gen_overrides)])
+
+    # The inner generators are closed as soon as the outer one is, so that the generation stops right away instead of at garbage collection
+    async def astream(self, messages: List[Dict[str, str]], **gen_overrides: Any) -> AsyncGenerator[ChunkWrapper, None]:
+        await self.aprepare()
+        async with aclosing(self.astream_completion(messages, **gen_overrides)) as chunks:
+            async for chunk in chunks:
+                yield chunk
+
+    async def astream_completion(self, messages: List[Dict[str, str]], **gen_overrides: Any) -> AsyncGenerator[ChunkWrapper, None]:
+        async with aclosing(self._astream_sequences(messages, 1, **gen_overrides)) as sequences:
+            async for _, text, finish_reason in sequences:
+                if not finish_reason:
+                    yield ChunkWrapper(text, "", response_metadata={"model": self.model_id})
+
+    async def astream_choices(self, messages: List[Dict[str, str]], n: int, **gen_overrides: Any) -> AsyncGenerator[Tuple[int, ChunkWrapper], None]:
+        async with aclosing(self._astream_sequences(messages, n, **gen_overrides)) as sequences:
+            async for index, text, finish_reason in sequences:
+                yield index, ChunkWrapper(text, "", response_metadata={"model": self.model_id, "finish_reason": finish_reason})
+
+    def complete(self, messages: List[Dict[str, str]], **gen_overrides: Any) -> str:
+        return run_in_background(self.acomplete(messages, **gen_overrides))
+
+    def stream(self, messages: List[Dict[str, str]], **gen_overrides: Any) -> Generator[ChunkWrapper, None, None]:
+        yield from iterate_in_background(self.astream(messages, **gen_overrides))
+
+    def stream_completion(self, messages: List[Dict[str, str]], **gen_overrides: Any) -> Generator[ChunkWrapper, None, None]:
+        yield from iterate_in_background(self.astream_completion(messages, **gen_overrides))
+
+    def stream_choices(self, messages: List[Dict[str, str]], n: int, **gen_overrides: Any) -> Generator[Tuple[int, ChunkWrapper], None, None]:
+        yield from iterate_in_background(self.astream_choices(messages, n, **gen_overrides))
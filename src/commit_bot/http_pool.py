@@ -0,0 +1,211 @@
+import asyncio
+import threading
+import weakref
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Tuple
+from urllib.parse import urlsplit
+
+from .utils import load_config
+
+
+def get_origin(url: str) -> str:
+    """Returns the `scheme://host:port` part of the url, connections are pooled per origin."""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def _ends_with_done(tail: bytes) -> bool:
+    return tail.rstrip().endswith(b"[DONE]")
+
+
+def make_draining_transport(limits: Any, is_async: bool = False) -> Any:
+    """
+    Returns an httpx transport that finishes reading a server-sent events body closed right after `data: [DONE]`.
+    The openai client stops reading at `[DONE]` and closes the response, which would otherwise discard the
+    connection instead of returning it to the pool. Bodies closed earlier (cancelled generations) are not drained.
+    """
+    import httpx
+
+    if is_async:
+        return _make_async_draining_transport(limits)
+
+    class DrainingByteStream(httpx.SyncByteStream):
+        def __init__(self, stream: Any) -> None:
+            self._stream = stream
+            self._chunks: Optional[Iterator[bytes]] = None
+            self._tail = b""
+
+        def __iter__(self) -> Iterator[bytes]:
+            self._chunks = iter(self._stream)
+            for chunk in self._chunks:
+                self._tail = (self._tail + chunk)[-16:]
+                yield chunk
+
+        def close(self) -> None:
+            if self._chunks is not None and _ends_with_done(self._tail):
+                try:
+                    for _ in self._chunks:
+                        pass
+                except httpx.HTTPError:
+                    pass
+            self._stream.close()
+
+    class DrainingTransport(httpx.HTTPTransport):
+        def handle_request(self, request: Any) -> Any:
+            response = super().handle_request(request)
+            response.stream = DrainingByteStream(response.stream)
+            return response
+
+    return DrainingTransport(limits=limits)
+
+
+def _make_async_draining_transport(limits: Any) -> Any:
+    import httpx
+
+    class AsyncDrainingByteStream(httpx.AsyncByteStream):
+        def __init__(self, stream: Any) -> None:
+            self._stream = stream
+            self._chunks: Optional[AsyncIterator[bytes]] = None
+            self._tail = b""
+
+        async def __aiter__(self) -> AsyncIterator[bytes]:
+            self._chunks = self._stream.__aiter__()
+            async for chunk in self._chunks:
+                self._tail = (self._tail + chunk)[-16:]
+                yield chunk
+
+        async def aclose(self) -> None:
+            if self._chunks is not None and _ends_with_done(self._tail):
+                try:
+                    async for _ in self._chunks:
+                        pass
+                except httpx.HTTPError:
+                    pass
+            await self._stream.aclose()
+
+    class AsyncDrainingTransport(httpx.AsyncHTTPTransport):
+        async def handle_async_request(self, request: Any) -> Any:
+            response = await super().handle_async_request(request)
+            response.stream = AsyncDrainingByteStream(response.stream)
+            return response
+
+    return AsyncDrainingTransport(limits=limits)
+
+
+class PooledHTTPClient:
+    """
+    Keep-alive connection pool to one backend origin (e.g. the ollama or vllm server), shared by completions,
+    health probes and unload calls. httpx is imported on first use.
+    """
+
+    def __init__(self, origin: str, connect_timeout: float = 5.0, read_timeout: float = 600.0, max_connections: int = 16) -> None:
+        import httpx
+
+        self.origin = origin
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self._stats_lock = threading.Lock()
+        self._stats = {"requests": 0, "connections": 0}
+        self._limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.client = httpx.Client(timeout=self.timeout, transport=make_draining_transport(self._limits), event_hooks={"request": [self._trace_request]})
+        # Async connections belong to the event loop that opened them, so there is one async client per loop
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+        self._async_litellm_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[str, str], Any]]" = weakref.WeakKeyDictionary()
+
+    def _trace_request(self, request: Any) -> None:
+        with self._stats_lock:
+            self._stats["requests"] += 1
+        request.extensions["trace"] = self._trace
+
+    def _trace(self, event_name: str, info: Dict[str, Any]) -> None:
+        # Only called by httpcore when a new TCP connection is opened, reused connections skip it
+        if event_name == "connection.connect_tcp.complete":
+            with self._stats_lock:
+                self._stats["connections"] += 1
+
+    async def _atrace_request(self, request: Any) -> None:
+        self._trace_request(request)
+        request.extensions["trace"] = self._atrace
+
+    async def _atrace(self, event_name: str, info: Dict[str, Any]) -> None:
+        self._trace(event_name, info)
+
+    @property
+    def async_client(self) -> Any:
+        """Async client of the running event loop, sharing the limits, timeouts and stats of this pool."""
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        if loop not in self._async_clients:
+            self._async_clients[loop] = httpx.AsyncClient(
+                timeout=self.timeout, transport=make_draining_transport(self._limits, is_async=True), event_hooks={"request": [self._atrace_request]}
+            )
+        return self._async_clients[loop]
+
+    def get(self, path: str, timeout: Optional[float] = None) -> Any:
+        return self.client.get(self.origin + path, timeout=timeout if timeout is not None else self.timeout)
+
+    def post(self, path: str, json: Dict[str, Any], timeout: Optional[float] = None) -> Any:
+        return self.client.post(self.origin + path, json=json, timeout=timeout if timeout is not None else self.timeout)
+
+    def async_litellm_client(self, server_type: str, api_base: str, api_key: Optional[str] = None) -> Any:
+        """Returns the client object `litellm.acompletion` expects for the server type, backed by this pool and bound to the running event loop."""
+        clients = self._async_litellm_clients.setdefault(asyncio.get_running_loop(), {})
+        key = (server_type, api_base)
+        if key not in clients:
+            if server_type == "vllm":
+                from openai import AsyncOpenAI
+
+                clients[key] = AsyncOpenAI(base_url=api_base, api_key=api_key or "mock_api_key", http_client=self.async_client, max_retries=0)
+            else:
+                from litellm.llms.custom_httpx.http_handler import AsyncHTTPHandler
+
+                async_client = self.async_client
+
+                class PooledAsyncHTTPHandler(AsyncHTTPHandler):
+                    """AsyncHTTPHandler does not take a client, it is given the pooled one instead of creating its own."""
+
+                    def create_client(self, *args: Any, **kwargs: Any) -> Any:
+                        return async_client
+
+                clients[key] = PooledAsyncHTTPHandler(timeout=self.timeout)
+        return clients[key]
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Number of requests, of opened connections, and of requests served by an already open connection."""
+        with self._stats_lock:
+            return {**self._stats, "reused": self._stats["requests"] - self._stats["connections"]}
+
+    def close(self) -> None:
+        self.client.close()
+
+
+_CLIENTS: Dict[str, PooledHTTPClient] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def get_http_client(url: str) -> PooledHTTPClient:
+    """Returns the shared client of the url's origin, created with the timeouts of job.conf on first use."""
+    origin = get_origin(url)
+    with _CLIENTS_LOCK:
+        if origin not in _CLIENTS:
+            job_conf = load_config("job.conf")
+            _CLIENTS[origin] = PooledHTTPClient(
+                origin,
+                connect_timeout=job_conf.get("http_connect_timeout_seconds", 5),
+                read_timeout=job_conf.get("http_read_timeout_seconds", 600),
+                max_connections=job_conf.get("http_max_connections", 16),
+            )
+        return _CLIENTS[origin]
+
+
+def get_http_pool_stats() -> Dict[str, Dict[str, int]]:
+    """Connection reuse stats of every pool, keyed by origin."""
+    with _CLIENTS_LOCK:
+        return {origin: client.stats for origin, client in _CLIENTS.items()}
+
+
+def close_http_clients() -> None:
+    with _CLIENTS_LOCK:
+        for client in _CLIENTS.values():
+            client.close()
+        _CLIENTS.clear()
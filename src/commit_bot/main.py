@@ -1,66 +1,231 @@
+import argparse
 import os
 import subprocess
 import sys
 import tempfile
+import threading
+import time
 import traceback
 from pathlib import Path
-from typing import Optional, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 
-from .ai_models import AIModels
+from .ai_models import AIModels, ModelExecutor, preload_model
+from .batch import main as batch_main
+from .cache import CommitMessageCache, make_cache_key
+from .candidates import collect_candidates, pick_candidate
+from .client import DaemonClient, RemoteModelExecutor, connect_daemon
+from .diff_compaction import compact_diff, compact_staged_changes, get_diff_token_budget, get_token_counter
+from .diff_filter import read_filtered_diff
+from .git_diff import show_in_pager
+from .hedging import FALLBACK, HedgeOutcome, stream_hedged
+from .map_reduce import should_use_map_reduce, summarize_staged_changes
+from .prompts import build_prompt_messages, format_staged_changes
 from .prompts import deriv_sys_ppt_1 as defautl_sys_ppt
-from .utils import get_conf_regen_commit_msg, load_config, post_process_commit_message
+from .server_manager import hold_server_lease
+from .server_probe import get_prefix_cache_hit_rate, read_prefix_cache_counters
+from .speculation import SpeculativeRegenerator
+from .stream_filter import CommitMessageStreamFilter, ThrottledPrinter
+from .telemetry import RunTelemetry, get_process_age_seconds, record_session_phase, session_phase
+from .telemetry import main as stats_main
+from .utils import get_conf_regen_commit_msg, load_config
 
 commands = {
     "is_git_repo": "git rev-parse --git-dir",
     "clear_screen": ["cls" if os.name == "nt" else "clear"],
     "commit": "git commit -m",
     "get_stashed_changes": "git diff --cached",
+    "has_no_stashed_changes": "git diff --cached --quiet",
 }
 
-MODEL_SPEC = load_config("job.conf")["used_model"]
+# Loaded lazily by `get_model_spec()`, so that exiting early (not a repo, nothing staged) does not parse any config
+MODEL_SPEC: Optional[str] = None
+DAEMON_CLIENT: Optional[DaemonClient] = None
 
 
-def generate_commit_message(staged_changes: str, random_regen: bool = False) -> str:
-    """Generates a commit message using the specified AI model."""
+def get_model_spec() -> str:
+    global MODEL_SPEC
+    if MODEL_SPEC is None:
+        MODEL_SPEC = load_config("job.conf")["used_model"]
+    return MODEL_SPEC
+
+
+def get_prefix_cache_counters(model: Union[ModelExecutor, RemoteModelExecutor]) -> Optional[Tuple[float, float]]:
+    """Prefix cache counters of the local vllm server of the model, concurrent requests (e.g. speculation) are counted too."""
+    api_base = model.gen_conf.get("api_base") if isinstance(model, ModelExecutor) and model.server_type == "vllm" else None
+    return read_prefix_cache_counters(api_base) if api_base else None
+
+
+def get_model(model_spec: str) -> Optional[Union[ModelExecutor, RemoteModelExecutor]]:
+    """Returns the executor of the model, served by the commit-bot daemon when one is running."""
+    if DAEMON_CLIENT is not None:
+        return RemoteModelExecutor(model_spec, DAEMON_CLIENT)
+    return AIModels().get_model(model_spec)
+
+
+def generate_commit_message(staged_changes: str, random_regen: bool = False, use_cache: bool = True) -> str:
+    """
+    Generates a commit message using the specified AI model.
+    Randomized regenerations are never served from nor stored in the message cache.
+    Ctrl-C while streaming cancels the request and returns the partial message, so that the menu is shown again.
+    The timings of each phase are appended to the telemetry file (see `commit-bot stats`).
+    """
+    telemetry = None
     try:
-        global MODEL_SPEC
-        ai_models = AIModels()
-        model = ai_models.get_model(MODEL_SPEC)
+        model = get_model(get_model_spec())
         if not model:
             raise ValueError(f"Model '{MODEL_SPEC}' is not available.")
+        telemetry = RunTelemetry(MODEL_SPEC, model.server_type, "regenerate" if random_regen else "generate", daemon=DAEMON_CLIENT is not None, diff_chars=len(staged_changes))
 
+        sys_prompt = defautl_sys_ppt
+        gen_overrides: Dict[str, Any] = {}
+        regen_instruction = None
         if random_regen:
-            new_sys_ppt, new_model_gen_conf = get_conf_regen_commit_msg()
-            for k, v in new_model_gen_conf.items():
-                setattr(model, k, v)
-            sys_prompt = new_sys_ppt
+            regen_instruction, gen_overrides = get_conf_regen_commit_msg()
+
+        use_cache = use_cache and not random_regen and load_config("job.conf").get("message_cache_enabled", True)
+        if use_cache:
+            cache = CommitMessageCache.from_config()
+            cache_key = make_cache_key(staged_changes, MODEL_SPEC, sys_prompt, model.gen_conf)
+            cached_message = cache.get(cache_key)
+            if cached_message is not None:
+                print(f"⚡ Using cached commit message generated by model '{MODEL_SPEC}' (run with --no-cache to regenerate)...\n")
+                print(cached_message, end="\n" * 3)
+                telemetry.save(cached=True)
+                return cached_message
+
+        # The daemon serves a single model at a time, requests are only hedged in-process
+        hedging = AIModels().get_hedging(MODEL_SPEC) if isinstance(model, ModelExecutor) else None
+        # The map requests would wait on the model with no deadline, a hedged request compacts the diff instead
+        use_map_reduce = hedging is None and should_use_map_reduce(staged_changes)
+        with telemetry.phase("prompt"):
+            if use_map_reduce:
+                summaries, _ = summarize_staged_changes(model, MODEL_SPEC, staged_changes)
+                user_content = f"Here are summaries of the staged changes, part by part:\n'''\n{summaries}\n'''"
+            else:
+                prompt_changes = compact_staged_changes(staged_changes, MODEL_SPEC)
+                user_content = format_staged_changes(prompt_changes)
+
+        messages = build_prompt_messages(sys_prompt, user_content, regen_instruction)
+        job_conf = load_config("job.conf")
+        hedge_outcome = HedgeOutcome()
+        prefix_cache_before = None
+        if hedging is not None:
+            fallback_spec, first_token_deadline_sec = hedging
+            # The server is started within the hedged request, its start counts towards the first token deadline
+            start = time.perf_counter()
+            response_chunks = stream_hedged(model, AIModels().get_model(fallback_spec), messages, first_token_deadline_sec, hedge_outcome, **gen_overrides)
         else:
-            sys_prompt = defautl_sys_ppt
-
-        response_chunks = model.stream(
-            [
-                {
-                    "role": "system",
-                    "content": sys_prompt,
-                },
-                {
-                    "role": "user",
-                    "content": f"Here are the staged changes:\n'''\n{staged_changes}\n'''",
-                },
-            ]
-        )
+            with telemetry.phase("server"):
+                model.prepare()
+            prefix_cache_before = get_prefix_cache_counters(model) if job_conf.get("prefix_cache_stats_enabled", True) else None
+            start = time.perf_counter()
+            response_chunks = model.stream_completion(messages, **gen_overrides)
         print(f"🧠 Generating commit message using model '{MODEL_SPEC}'...\n")
-        commit_message = ""
-        for chunk in response_chunks:
-            commit_message += chunk.content
-            print(chunk.reasoning or chunk.content, end="", flush=True)
+        # Markers are stripped as the tokens arrive, and the stream is closed once the message is complete
+        stream_filter = CommitMessageStreamFilter(early_stop=job_conf.get("stream_early_stop", True))
+        printer = ThrottledPrinter(job_conf.get("stream_render_interval_ms", 50) / 1000)
+        cancelled = False
+        try:
+            for chunk in telemetry.observe_stream(response_chunks):
+                printer.write(chunk.reasoning)
+                if chunk.response_metadata and chunk.response_metadata.get("reasoning_budget_reached"):
+                    printer.write("✂️ Reasoning budget reached, answering right away...\n\n")
+                printer.write(stream_filter.feed(chunk.content))
+                if stream_filter.complete:
+                    break
+        except KeyboardInterrupt:
+            cancelled = True
+        finally:
+            response_chunks.close()
+        printer.write(stream_filter.flush())
+        printer.flush()
         print("\n" * 3, end="")
+        if cancelled:
+            print("⏹️ Generation cancelled, the partial message is kept.\n")
+        if hedge_outcome.winner == FALLBACK:
+            print(f"🪂 No first token from '{MODEL_SPEC}' within {first_token_deadline_sec:g}s, the message was generated by '{fallback_spec}'.\n")
+        if prefix_cache_before is not None:
+            prefix_cache_after = get_prefix_cache_counters(model)
+            if prefix_cache_after is not None:
+                telemetry.record["prefix_cache_hit_rate"] = get_prefix_cache_hit_rate(prefix_cache_before, prefix_cache_after)
+        if use_map_reduce:
+            print(f"⏱️ reduce: {time.perf_counter() - start:.2f}s")
     except Exception as e:
         print(f"❌ Error generating commit message: {e}")
         traceback.print_exc()
+        if telemetry:
+            telemetry.save(error=type(e).__name__)
         sys.exit(1)
 
-    return post_process_commit_message(commit_message)
+    with telemetry.phase("post_process"):
+        commit_message = stream_filter.message
+    # A message of the fallback model is not cached under the key of the requested model
+    if use_cache and commit_message and not cancelled and hedge_outcome.winner != FALLBACK:
+        cache.put(cache_key, commit_message, model_spec=MODEL_SPEC)
+    telemetry.save(early_stop=stream_filter.complete, cancelled=cancelled, hedged=hedge_outcome.hedged, hedge_winner=hedge_outcome.winner if hedge_outcome.hedged else None)
+    return commit_message
+
+
+def generate_commit_message_candidates(staged_changes: str, n_candidates: int) -> str:
+    """Generates several commit messages at once and lets the user pick one."""
+    telemetry = None
+    try:
+        model = get_model(get_model_spec())
+        if not model:
+            raise ValueError(f"Model '{MODEL_SPEC}' is not available.")
+        telemetry = RunTelemetry(MODEL_SPEC, model.server_type, "candidates", daemon=DAEMON_CLIENT is not None, diff_chars=len(staged_changes), n_candidates=n_candidates)
+        with telemetry.phase("prompt"):
+            prompt_changes = compact_staged_changes(staged_changes, MODEL_SPEC)
+        temperature = load_config("job.conf").get("candidates_temperature", 0.7)
+        print(f"🧠 Generating {n_candidates} candidate commit messages using model '{MODEL_SPEC}'...\n")
+        with telemetry.phase("generation"):
+            candidates = collect_candidates(model, build_prompt_messages(defautl_sys_ppt, format_staged_changes(prompt_changes)), n_candidates, temperature=temperature)
+    except KeyboardInterrupt:
+        print("\n⏹️ Generation cancelled.\n")
+        if telemetry:
+            telemetry.save(cancelled=True)
+        return ""
+    except Exception as e:
+        print(f"❌ Error generating commit message: {e}")
+        traceback.print_exc()
+        if telemetry:
+            telemetry.save(error=type(e).__name__)
+        sys.exit(1)
+    telemetry.save()
+
+    commit_message = pick_candidate(candidates)
+    print("\n" + commit_message, end="\n" * 3)
+    return commit_message
+
+
+def generate_speculative_candidate(staged_changes: str, model_spec: str, cancel_event: threading.Event) -> Optional[str]:
+    """Silently generates a randomized regeneration candidate, giving up as soon as `cancel_event` is set."""
+    model = get_model(model_spec)
+    regen_instruction, gen_overrides = get_conf_regen_commit_msg()
+    prompt_changes = compact_diff(staged_changes, get_diff_token_budget(model_spec), get_token_counter(model_spec))
+    response_chunks = model.stream_completion(build_prompt_messages(defautl_sys_ppt, format_staged_changes(prompt_changes), regen_instruction), **gen_overrides)
+    stream_filter = CommitMessageStreamFilter(early_stop=load_config("job.conf").get("stream_early_stop", True))
+    try:
+        for chunk in response_chunks:
+            if cancel_event.is_set():
+                return None
+            stream_filter.feed(chunk.content)
+            if stream_filter.complete:
+                break
+    finally:
+        response_chunks.close()
+    stream_filter.flush()
+    return stream_filter.message or None
+
+
+def start_speculation(staged_changes: str, n_candidates: int) -> Optional[SpeculativeRegenerator]:
+    """Starts generating regeneration candidates in the background, unless it is disabled or the diff needs map-reduce."""
+    if n_candidates <= 0 or should_use_map_reduce(staged_changes):
+        return None
+    model_spec = get_model_spec()
+    speculator = SpeculativeRegenerator(lambda cancel_event: generate_speculative_candidate(staged_changes, model_spec, cancel_event), n_candidates)
+    speculator.start()
+    return speculator
 
 
 def handel_edit_commit_message(commit_message: str) -> str:
@@ -90,74 +255,148 @@ def handel_edit_commit_message(commit_message: str) -> str:
             os.remove(temp_file_path)
 
 
-def show_commit_diff() -> None:
-    """Displays the current staged changes."""
+def start_model_preload() -> threading.Thread:
+    """Loads the model in the background (ollama only), overlapping the model load with the diff collection."""
+    thread = threading.Thread(target=lambda: preload_model(get_model_spec()), daemon=True)
+    thread.start()
+    return thread
+
+
+def get_staged_changes(use_routing: bool = False) -> str:
+    """
+    Reads the staged changes incrementally, within the size limits of job.conf, without the files excluded by `.commitbotignore`.
+    The model is preloaded meanwhile, unless it is routed by the staged changes (it is preloaded once routed then).
+    """
+    # Cheap exit status check first, so that nothing (configs included) is loaded when nothing is staged
+    if subprocess.run(commands["has_no_stashed_changes"].split()).returncode == 0:
+        return ""
+    if not (use_routing and AIModels().is_routing_enabled()):
+        start_model_preload()
     try:
-        diff = run_command(commands["get_stashed_changes"])
-        if diff:
-            print("Current staged changes:\n")
-            print(diff)
-        else:
-            print("No staged changes found.")
+        with session_phase("git"):
+            return read_filtered_diff(commands["get_stashed_changes"].split()).text
     except subprocess.CalledProcessError as e:
         print(f"❌ Error retrieving staged changes: {e.stderr}")
         sys.exit(1)
 
 
-def interaction_loop():
-    """Handles user interaction for commit message generation."""
+def show_commit_diff(staged_changes: str) -> None:
+    """Displays the staged changes captured at startup through a pager."""
+    if staged_changes:
+        print("Current staged changes:\n")
+        show_in_pager(staged_changes)
+    else:
+        print("No staged changes found.")
+
+
+def route_model(staged_changes: str) -> None:
+    """Switches to the model the routing policy of model.conf picks for the staged changes, and preloads it."""
     global MODEL_SPEC
-    staged_changes = run_command(commands["get_stashed_changes"]).strip()
+    if not AIModels().is_routing_enabled():
+        return
+    decision = AIModels().route_model(staged_changes)
+    if decision is not None:
+        MODEL_SPEC = decision.model_spec
+        print(f"🧭 Routed to model '{MODEL_SPEC}': {decision.reason}")
+    start_model_preload()
+
+
+def interaction_loop(use_cache: bool = True, n_speculative: Optional[int] = None, n_candidates: int = 1, use_daemon: bool = True, use_routing: bool = True):
+    """Handles user interaction for commit message generation."""
+    global MODEL_SPEC, DAEMON_CLIENT
+    staged_changes = get_staged_changes(use_routing=use_routing).strip()
     if not staged_changes:
         print("🔎 No staged changes found.")
         sys.exit(0)
-    commit_message = generate_commit_message(staged_changes)
-    while True:
-        action = input("Proceed to commit? [y(yes) | n(no) | s(show) | r(regenerate) | m(model) | e(edit)]:").strip().lower()
-        match action:
-            case "r" | "regenerate":
-                subprocess.run(commands["clear_screen"])
-                print("🔄 Regenerating commit message...")
-                print("-" * 50 + "\n")
-                commit_message = generate_commit_message(staged_changes, random_regen=True)
-                continue
-            case "s" | "show":
-                subprocess.run(commands["clear_screen"])
-                show_commit_diff()
-                print("=" * 20 + "\n")
-                print("Generated commit message:\n")
-                print(commit_message)
-                print("-" * 50 + "\n")
-            case "m" | "model":
-                subprocess.run(commands["clear_screen"])
-                valid_models = AIModels().list_available_models()
-                print(f"Current model: {MODEL_SPEC}")
-                new_model_spec = input(f"Enter new model name (or press Enter to keep current):\nAvailable models: {', '.join(valid_models)}\n>>> ")
-                if new_model_spec in valid_models:
-                    MODEL_SPEC = new_model_spec
-                    print(f"🔀 Model changed to: {MODEL_SPEC}")
-                else:
-                    print("🚧 Model Unchanged.")
-            case "y" | "yes":
-                print("🔄 Committing changes...")
-                res = run_command(command=commands["commit"], extra_args=[commit_message])
-                print(f"✅ Committed with message:\n{res.strip()}")
-                break
-            case "n" | "no":
-                print("❌ Commit aborted by user.")
-                break
-            case "e" | "edit":
-                edited_commit_message = handel_edit_commit_message(commit_message)
-                commit_message = edited_commit_message
-                subprocess.run(commands["clear_screen"])
-                print("✨ Edited commit message...")
-                print("-" * 50 + "\n")
-                print(commit_message)
-                print("\n" * 3, end="")
-                continue
-            case _:
-                print("❗ Invalid input. Please enter 'y', 'n', 's', 'r', or 'e'.")
-                break
+    if use_routing:
+        route_model(staged_changes)
+    if use_daemon:
+        DAEMON_CLIENT = connect_daemon()
+        if DAEMON_CLIENT is not None:
+            print(f"🤖 Using the commit-bot daemon on {DAEMON_CLIENT.socket_path}")
+    if n_speculative is None:
+        n_speculative = load_config("job.conf").get("speculative_candidates", 0)
+    # Keeps the local server up while the user reads the diff or edits the message, it is released on exit
+    lease = hold_server_lease(get_model_spec())
+    if n_candidates > 1:
+        commit_message = generate_commit_message_candidates(staged_changes, n_candidates)
+        n_speculative = 0  # Regeneration produces a new set of candidates instead
+    else:
+        commit_message = generate_commit_message(staged_changes, use_cache=use_cache)
+    speculator = start_speculation(staged_changes, n_speculative)
+    try:
+        while True:
+            action = input("Proceed to commit? [y(yes) | n(no) | s(show) | r(regenerate) | m(model) | e(edit)]:").strip().lower()
+            match action:
+                case "r" | "regenerate":
+                    subprocess.run(commands["clear_screen"])
+                    print("🔄 Regenerating commit message...")
+                    print("-" * 50 + "\n")
+                    candidate = speculator.pop() if speculator else None
+                    if n_candidates > 1:
+                        commit_message = generate_commit_message_candidates(staged_changes, n_candidates)
+                    elif candidate:
+                        print(f"⚡ Showing a candidate generated in the background by model '{MODEL_SPEC}'...\n")
+                        print(candidate, end="\n" * 3)
+                        commit_message = candidate
+                    else:
+                        commit_message = generate_commit_message(staged_changes, random_regen=True)
+                        speculator = speculator or start_speculation(staged_changes, n_speculative)
+                    continue
+                case "s" | "show":
+                    subprocess.run(commands["clear_screen"])
+                    show_commit_diff(staged_changes)
+                    print("=" * 20 + "\n")
+                    print("Generated commit message:\n")
+                    print(commit_message)
+                    print("-" * 50 + "\n")
+                case "m" | "model":
+                    subprocess.run(commands["clear_screen"])
+                    valid_models = AIModels().list_available_models()
+                    print(f"Current model: {MODEL_SPEC}")
+                    new_model_spec = input(f"Enter new model name (or press Enter to keep current):\nAvailable models: {', '.join(valid_models)}\n>>> ")
+                    if new_model_spec in valid_models:
+                        MODEL_SPEC = new_model_spec
+                        print(f"🔀 Model changed to: {MODEL_SPEC}")
+                        if lease:
+                            lease.release()
+                        lease = hold_server_lease(MODEL_SPEC)
+                        if speculator:
+                            # Candidates of the previous model are stale, speculation restarts after the next regeneration
+                            speculator.cancel()
+                            speculator = None
+                    else:
+                        print("🚧 Model Unchanged.")
+                case "y" | "yes":
+                    if not commit_message.strip():
+                        print("❗ The commit message is empty, regenerate (r) or edit (e) it first.")
+                        continue
+                    if speculator:
+                        speculator.cancel()
+                    print("🔄 Committing changes...")
+                    res = run_command(command=commands["commit"], extra_args=[commit_message])
+                    print(f"✅ Committed with message:\n{res.strip()}")
+                    break
+                case "n" | "no":
+                    print("❌ Commit aborted by user.")
+                    break
+                case "e" | "edit":
+                    edited_commit_message = handel_edit_commit_message(commit_message)
+                    commit_message = edited_commit_message
+                    subprocess.run(commands["clear_screen"])
+                    print("✨ Edited commit message...")
+                    print("-" * 50 + "\n")
+                    print(commit_message)
+                    print("\n" * 3, end="")
+                    continue
+                case _:
+                    print("❗ Invalid input. Please enter 'y', 'n', 's', 'r', or 'e'.")
+                    break
+    finally:
+        if speculator:
+            speculator.cancel()
+        if lease:
+            lease.release()
 
 
 def run_command(command: Union[list[str], str], extra_args: Optional[list[str]] = None):
@@ -179,12 +418,37 @@ def run_command(command: Union[list[str], str], extra_args: Optional[list[str]]
         raise e
 
 
-def run():
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="commit-bot", description="Generate git commit messages from staged changes with LLMs.")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the cache of generated commit messages.")
+    parser.add_argument(
+        "--speculate",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Generate N regeneration candidates in the background while you decide (default: `speculative_candidates` in job.conf).",
+    )
+    parser.add_argument("--no-daemon", action="store_true", help="Generate in this process even when the commit-bot daemon is running.")
+    parser.add_argument("--candidates", type=int, default=1, metavar="N", help="Generate N commit messages at once and pick one of them.")
+    parser.add_argument("--no-route", action="store_true", help="Use `used_model` of job.conf even when model routing is enabled in model.conf.")
+    return parser.parse_args(argv)
+
+
+def run(argv: Optional[List[str]] = None):
     """Runs the main command to check if the current directory is a git repository."""
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["batch"]:
+        batch_main(argv[1:])
+        return
+    if argv[:1] == ["stats"]:
+        stats_main(argv[1:])
+        return
+    record_session_phase("startup", get_process_age_seconds())
+    args = parse_args(argv)
     try:
         output = run_command(commands["is_git_repo"])
         print(f"✅ Current directory is a git repository: {output.strip()}")
-        interaction_loop()
+        interaction_loop(use_cache=not args.no_cache, n_speculative=args.speculate, n_candidates=args.candidates, use_daemon=not args.no_daemon, use_routing=not args.no_route)
     except subprocess.CalledProcessError as e:
         if "not a git repository" in e.stderr:
             print("❌ Current directory is not a git repository.")
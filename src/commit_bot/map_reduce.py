@@ -0,0 +1,119 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
+
+from .ai_models import ModelExecutor
+from .diff_compaction import FileDiff, compact_diff, get_diff_token_budget, get_token_counter, parse_diff
+from .prompts import map_sys_ppt
+from .utils import load_config, post_process_commit_message
+
+
+def should_use_map_reduce(staged_changes: str) -> bool:
+    """Map-reduce generation switches on when the staged diff is larger than `map_reduce_threshold_kilobytes` in job.conf."""
+    conf = load_config("job.conf")
+    if not conf.get("map_reduce_enabled", True):
+        return False
+    return len(staged_changes.encode("utf-8")) > conf.get("map_reduce_threshold_kilobytes", 64) * 1024
+
+
+def _render_file_diff(file_diff: FileDiff) -> str:
+    return "\n".join(file_diff.header + [line for hunk in file_diff.hunks for line in hunk.lines])
+
+
+def split_diff_into_groups(staged_changes: str, max_group_tokens: int, count_tokens) -> List[str]:
+    """
+    Splits a diff into groups of whole files, each close to `max_group_tokens` tokens.
+    Small files are packed together, and a file larger than the limit gets a group of its own
+    (it is compacted to the limit later).
+    """
+    groups: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    for file_diff in parse_diff(staged_changes):
+        rendered = _render_file_diff(file_diff)
+        tokens = count_tokens(rendered)
+        if current and current_tokens + tokens > max_group_tokens:
+            groups.append("\n".join(current))
+            current, current_tokens = [], 0
+        current.append(rendered)
+        current_tokens += tokens
+    if current:
+        groups.append("\n".join(current))
+    return groups or [staged_changes]
+
+
+def cap_group_count(groups: List[str], max_groups: int) -> List[str]:
+    """Merges consecutive groups so that there are at most `max_groups` of them (each one is compacted to the budget later)."""
+    if len(groups) <= max_groups:
+        return groups
+    size = -(-len(groups) // max_groups)
+    return ["\n".join(groups[i : i + size]) for i in range(0, len(groups), size)]
+
+
+def fit_summaries(summaries: List[str], token_budget: int, count_tokens: Callable[[str], int]) -> str:
+    """
+    Joins the summaries into the `## Part i` sections of the reduce prompt, within `token_budget` tokens.
+    When they do not fit, each part keeps the lines that fit in an equal share of the budget (at least the start of its first line).
+    """
+    parts = [f"## Part {i + 1}\n{summary.strip()}" for i, summary in enumerate(summaries)]
+    joined = "\n\n".join(parts)
+    if count_tokens(joined) <= token_budget:
+        return joined
+    share = max(token_budget // len(parts) - 1, 1)  # One token for the separator
+    fitted = []
+    for part in parts:
+        lines = part.split("\n")
+        kept = [lines[0]]
+        for line in lines[1:]:
+            if count_tokens("\n".join(kept + [line])) > share:
+                break
+            kept.append(line)
+        if len(kept) == 1 and len(lines) > 1:
+            # The first line of the summary alone is over the share, cut at ~4 characters per token
+            kept.append(lines[1][: max(share - count_tokens(lines[0]), 1) * 4 - 4])
+        fitted.append("\n".join(kept))
+    return "\n\n".join(fitted)
+
+
+def summarize_staged_changes(model: ModelExecutor, model_spec: str, staged_changes: str) -> Tuple[str, Dict[str, float]]:
+    """
+    Map stage of map-reduce generation: summarizes groups of files concurrently with a bounded thread pool,
+    so a vllm server can batch the requests. There are at most `map_reduce_max_groups` groups, and the joined
+    summaries fit in the diff token budget of the model, as they make the prompt of the reduce stage.
+    Args:
+        model (ModelExecutor): The model used for the summaries.
+        model_spec (str): The model spec, used to look up the diff token budget and tokenizer.
+        staged_changes (str): The staged diff.
+    Returns:
+        Tuple[str, Dict[str, float]]: The joined summaries and the timings (in seconds) of the stages.
+    """
+    conf = load_config("job.conf")
+    max_workers = conf.get("map_reduce_max_workers", 4)
+    token_budget = get_diff_token_budget(model_spec)
+    count_tokens = get_token_counter(model_spec)
+    timings: Dict[str, float] = {}
+
+    start = time.perf_counter()
+    groups = cap_group_count(split_diff_into_groups(staged_changes, token_budget, count_tokens), conf.get("map_reduce_max_groups", 16))
+    groups = [compact_diff(group, token_budget, count_tokens) for group in groups]
+    timings["split"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    model.prepare()
+    timings["prepare"] = time.perf_counter() - start
+
+    def summarize(group: str) -> str:
+        messages = [
+            {"role": "system", "content": map_sys_ppt},
+            {"role": "user", "content": f"Here is a part of the staged changes:\n'''\n{group}\n'''"},
+        ]
+        return post_process_commit_message(model.complete(messages))
+
+    print(f"🗺️ Staged changes are large, summarizing {len(groups)} groups of files with up to {max_workers} parallel requests...")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        summaries = list(pool.map(summarize, groups))
+    timings["map"] = time.perf_counter() - start
+    print(f"⏱️ split: {timings['split']:.2f}s, prepare: {timings['prepare']:.2f}s, map: {timings['map']:.2f}s ({len(groups)} requests)")
+
+    return fit_summaries(summaries, token_budget, count_tokens), timings
@@ -1,3 +1,5 @@
+from typing import Dict, List, Optional
+
 # ref: https://www.conventionalcommits.org/en/v1.0.0/
 # all following system prompts are derivated by this
 ywt_conventional_commits = """
@@ -226,3 +228,46 @@ Your final response **must** be only the generated commit message, without any a
 
 """
 
+
+map_sys_ppt = """
+
+### System Prompt: Change Summarizer
+
+You summarize one part of a larger set of staged code changes.
+Another step will combine all the summaries into a single conventional commit message.
+
+* List the files you were given and, for each file, what changed and why it likely changed.
+* Mention new, removed or renamed functions, classes, configs and dependencies by name.
+* Flag breaking changes explicitly with `BREAKING CHANGE`.
+* Use short bullet points, no more than 8 per file, and do not write a commit message.
+
+"""
+
+
+# Regenerations keep the system prompt and the staged changes of the first generation, a byte-identical prefix that
+# the server's prefix cache reuses, and vary with one of these instructions appended after the changes
+regen_instructions = [
+    "Write another commit message for these changes, worded differently from the previous one.",
+    "Write another commit message for these changes, with a body focused on why the changes were made.",
+    "Write another commit message for these changes, with a shorter description and a more detailed body.",
+]
+
+
+def format_staged_changes(prompt_changes: str) -> str:
+    return f"Here are the staged changes:\n'''\n{prompt_changes}\n'''"
+
+
+def build_prompt_messages(sys_prompt: str, user_content: str, instruction: Optional[str] = None) -> List[Dict[str, str]]:
+    """Stable parts first: the system prompt, then the staged changes, then the instruction of this request only."""
+    if instruction:
+        user_content = f"{user_content}\n\n{instruction}"
+    return [
+        {
+            "role": "system",
+            "content": sys_prompt,
+        },
+        {
+            "role": "user",
+            "content": user_content,
+        },
+    ]
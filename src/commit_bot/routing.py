@@ -0,0 +1,122 @@
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from .diff_compaction import approx_token_count
+from .telemetry import percentile
+
+SMALL, LARGE = "small", "large"
+
+
+@dataclass
+class LatencyEstimate:
+    runs: int
+    ttft_seconds: float
+    tokens_per_sec: float
+    expected_seconds: float
+
+
+@dataclass
+class RoutingDecision:
+    model_spec: str
+    tier: str
+    reason: str
+    estimate: Optional[LatencyEstimate] = None
+
+
+def get_diff_tier(staged_changes: str, routing_conf: Dict[str, Any]) -> str:
+    """Small diffs (few tokens and files) go to the fast models, the others to the large ones."""
+    n_tokens = approx_token_count(staged_changes)
+    n_files = staged_changes.count("\ndiff --git ") + staged_changes.startswith("diff --git ")
+    if n_tokens <= routing_conf.get("small_diff_max_tokens", 1500) and n_files <= routing_conf.get("small_diff_max_files", 3):
+        return SMALL
+    return LARGE
+
+
+def estimate_latency(records: List[Dict[str, Any]], model_spec: str, backend: Optional[str], expected_output_tokens: int, min_runs: int) -> Optional[LatencyEstimate]:
+    """
+    Expected generation time of the model from its telemetry records: p50 time to first token plus the expected
+    output at its p50 tokens/sec. None when fewer than `min_runs` generations were measured.
+    """
+    measured = [
+        record
+        for record in records
+        if record.get("model") == model_spec
+        and (backend is None or record.get("backend") == backend)
+        and not record.get("cached")
+        and not record.get("error")
+        and record.get("hedge_winner") != "fallback"  # Answered by another model
+        and record.get("ttft_seconds") is not None
+        and record.get("tokens_per_sec")
+    ]
+    if len(measured) < max(min_runs, 1):
+        return None
+    ttft = percentile([record["ttft_seconds"] for record in measured], 50)
+    tokens_per_sec = percentile([record["tokens_per_sec"] for record in measured], 50)
+    return LatencyEstimate(len(measured), ttft, tokens_per_sec, ttft + expected_output_tokens / tokens_per_sec)
+
+
+def choose_model(
+    staged_changes: str,
+    routing_conf: Dict[str, Any],
+    records: List[Dict[str, Any]],
+    available_models: List[str],
+    backends: Optional[Dict[str, str]] = None,
+    now: Optional[float] = None,
+) -> Optional[RoutingDecision]:
+    """
+    Routes the diff to a model of its tier (`fast_models` or `large_models` of the routing configs, in order of preference).
+    A model of the tier run fewer than `min_history_runs` times in the last `history_days` is tried first, so that
+    every model gets measured. Otherwise the one with the lowest expected latency is chosen, or the first available one
+    when none is measured (e.g. their runs failed).
+    A large diff goes to the fast tier when the best large model is expected to take over `max_expected_seconds`
+    and a fast model is measured below it.
+    Args:
+        staged_changes (str): The staged diff.
+        routing_conf (Dict[str, Any]): `routing` of model.conf.
+        records (List[Dict[str, Any]]): Telemetry records, see `telemetry.load_records`.
+        available_models (List[str]): Model specs of model.conf.
+        backends (Optional[Dict[str, str]]): Server type of each model, to only use the history of that backend.
+        now (Optional[float]): Current time, for the history window.
+    Returns:
+        Optional[RoutingDecision]: None when no model of the routing configs is available.
+    """
+    backends = backends or {}
+    since_ts = (now if now is not None else time.time()) - routing_conf.get("history_days", 14) * 24 * 3600
+    records = [record for record in records if record.get("ts", 0) >= since_ts]
+    expected_output_tokens = routing_conf.get("expected_output_tokens", 120)
+    min_runs = routing_conf.get("min_history_runs", 3)
+
+    def n_runs(model: str) -> int:
+        # Failed runs count, a model that keeps failing is not tried over and over
+        backend = backends.get(model)
+        return sum(1 for record in records if record.get("model") == model and (backend is None or record.get("backend") == backend) and not record.get("cached"))
+
+    def best_of(tier: str, explore: bool = True) -> Optional[RoutingDecision]:
+        candidates = [model for model in routing_conf.get("fast_models" if tier == SMALL else "large_models", []) if model in available_models]
+        if not candidates:
+            return None
+        estimates = {model: estimate_latency(records, model, backends.get(model), expected_output_tokens, min_runs) for model in candidates}
+        measured = {model: estimate for model, estimate in estimates.items() if estimate is not None}
+        unexplored = [model for model in candidates if model not in measured and n_runs(model) < min_runs]
+        if measured and unexplored and explore:
+            return RoutingDecision(unexplored[0], tier, f"{tier} diff, no latency history yet for this model, trying it")
+        if not measured:
+            return RoutingDecision(candidates[0], tier, f"{tier} diff, no latency history yet")
+        model = min(measured, key=lambda model: measured[model].expected_seconds)
+        estimate = measured[model]
+        reason = f"{tier} diff, fastest measured model: ttft {estimate.ttft_seconds:.2f}s, {estimate.tokens_per_sec:.0f} tok/s over {estimate.runs} runs"
+        return RoutingDecision(model, tier, reason, estimate)
+
+    tier = get_diff_tier(staged_changes, routing_conf)
+    decision = best_of(tier)
+    max_expected_seconds = routing_conf.get("max_expected_seconds", None)
+    if tier == LARGE and max_expected_seconds is not None and decision is not None and decision.estimate is not None and decision.estimate.expected_seconds > max_expected_seconds:
+        fallback = best_of(SMALL, explore=False)  # Only a measured model is known to be faster
+        if fallback is not None and fallback.estimate is not None and fallback.estimate.expected_seconds <= max_expected_seconds:
+            fallback.reason = (
+                f"large diff, but {decision.model_spec} is expected to take {decision.estimate.expected_seconds:.1f}s "
+                f"and {fallback.model_spec} {fallback.estimate.expected_seconds:.1f}s (max_expected_seconds={max_expected_seconds})"
+            )
+            return fallback
+    return decision or best_of(SMALL if tier == LARGE else LARGE)
@@ -0,0 +1,466 @@
+import argparse
+import fcntl
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from functools import partial
+from typing import Any, Callable, Iterator, List, Optional, Sequence
+from urllib.parse import urlparse
+
+from .server_probe import is_serving_model, read_metric, wait_until_ready
+from .utils import load_config
+
+THIS_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+STARTING = "starting"
+READY = "ready"
+DRAINING = "draining"
+STOPPED = "stopped"
+
+# Builds the command that starts a server: (model name, model path, port, gpu memory utilization) -> argv
+LaunchCommand = Callable[[str, str, int, float], List[str]]
+
+
+def to_safe_name(model_name: str) -> str:
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in model_name)
+
+
+def get_vllm_server_args(job_conf: Any) -> List[str]:
+    """
+    Extra flags of the vllm servers, from job.conf. Automatic prefix caching is on by default, so that the constant
+    system prompt (and the diff, when a message is regenerated) is not prefilled again on every request.
+    """
+    args = ["--enable-prefix-caching" if job_conf.get("vllm_enable_prefix_caching", True) else "--no-enable-prefix-caching"]
+    for key, flag in [("vllm_max_model_len", "--max-model-len"), ("vllm_max_num_seqs", "--max-num-seqs"), ("vllm_max_num_batched_tokens", "--max-num-batched-tokens")]:
+        value = job_conf.get(key, None)
+        if value is not None:
+            args += [flag, str(value)]
+    return args + [str(arg) for arg in job_conf.get("vllm_extra_args", [])]
+
+
+def vllm_launch_command(model_name: str, model_path: str, port: int, gpu_memory_utilization: float, server_args: Sequence[str] = ()) -> List[str]:
+    return [
+        sys.executable,
+        "-m",
+        "vllm.entrypoints.openai.api_server",
+        "--port",
+        str(port),
+        "--model",
+        model_path,
+        "--served-model-name",
+        model_name,
+        "--gpu-memory-utilization",
+        str(gpu_memory_utilization),
+        *server_args,
+    ]
+
+
+def is_pid_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        # Reap the process when it is a child of this one, a zombie would still answer the signal below
+        if os.waitpid(pid, os.WNOHANG)[0] == pid:
+            return False
+    except ChildProcessError:
+        pass
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+@dataclass
+class ServerRecord:
+    model_name: str
+    host: str
+    port: int
+    pid: int
+    gpu_memory_utilization: float
+    state: str
+    started_at: float
+    last_used_at: float
+    monitor_pid: Optional[int] = None
+
+    @property
+    def api_base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+
+class ServerManager:
+    """
+    Tracks local inference servers by PID file and port, one JSON record per model in `run_dir`.
+    Several servers can stay resident at once; when a new one does not fit in `memory_budget`
+    (the sum of their GPU memory utilization), the least recently used servers are stopped first.
+    """
+
+    def __init__(
+        self,
+        run_dir: str,
+        log_dir: str,
+        memory_budget: float,
+        host: str = "localhost",
+        ports: Optional[List[int]] = None,
+        launch_command: LaunchCommand = vllm_launch_command,
+        startup_timeout_sec: float = 300,
+        idle_grace_sec: float = 60,
+        spawn_monitor: bool = True,
+    ) -> None:
+        self.run_dir = run_dir
+        self.log_dir = log_dir
+        self.memory_budget = memory_budget
+        self.host = host
+        self.ports = ports or list(range(8000, 8010))
+        self.launch_command = launch_command
+        self.startup_timeout_sec = startup_timeout_sec
+        self.idle_grace_sec = idle_grace_sec
+        self.spawn_monitor = spawn_monitor
+        os.makedirs(self.run_dir, exist_ok=True)
+
+    @classmethod
+    def from_config(cls) -> "ServerManager":
+        job_conf = load_config("job.conf")
+        vllm_base_url = urlparse(load_config("model.conf").get("vllm_base_url", "http://localhost:8000/v1"))
+        first_port = vllm_base_url.port or 8000
+        return cls(
+            run_dir=os.path.join(THIS_SCRIPT_DIR, "var/run"),
+            log_dir=os.path.join(THIS_SCRIPT_DIR, "var/logs"),
+            memory_budget=job_conf.get("vllm_gpu_memory_budget", 0.8),
+            host=vllm_base_url.hostname or "localhost",
+            ports=list(range(first_port, first_port + job_conf.get("vllm_max_resident_servers", 4))),
+            startup_timeout_sec=job_conf.get("server_startup_timeout_seconds", 300),
+            idle_grace_sec=job_conf.get("server_idle_grace_seconds", 60),
+            launch_command=partial(vllm_launch_command, server_args=get_vllm_server_args(job_conf)),
+        )
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Serializes start/stop decisions across commit-bot processes."""
+        with open(os.path.join(self.run_dir, ".lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _record_path(self, model_name: str) -> str:
+        return os.path.join(self.run_dir, f"{to_safe_name(model_name)}.json")
+
+    def _lease_dir(self, model_name: str) -> str:
+        return os.path.join(self.run_dir, "leases", to_safe_name(model_name))
+
+    def renew_lease(self, model_name: str, lease_id: str, ttl_sec: float) -> None:
+        """Creates or extends a lease, the server of the model is kept up while it has live leases."""
+        lease_dir = self._lease_dir(model_name)
+        os.makedirs(lease_dir, exist_ok=True)
+        path = os.path.join(lease_dir, f"{lease_id}.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump({"pid": os.getpid(), "expires_at": time.time() + ttl_sec}, f)
+        os.replace(path + ".tmp", path)
+
+    def release_lease(self, model_name: str, lease_id: str) -> None:
+        path = os.path.join(self._lease_dir(model_name), f"{lease_id}.json")
+        if os.path.exists(path):
+            os.remove(path)
+
+    def count_live_leases(self, model_name: str) -> int:
+        """Counts the unexpired leases of live processes, removing the others."""
+        lease_dir = self._lease_dir(model_name)
+        if not os.path.isdir(lease_dir):
+            return 0
+        n_live = 0
+        for file_name in os.listdir(lease_dir):
+            if not file_name.endswith(".json"):
+                continue
+            path = os.path.join(lease_dir, file_name)
+            try:
+                with open(path) as f:
+                    lease = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if lease["expires_at"] > time.time() and is_pid_alive(lease["pid"]):
+                n_live += 1
+            elif os.path.exists(path):
+                os.remove(path)
+        return n_live
+
+    def _write_record(self, record: ServerRecord) -> None:
+        path = self._record_path(record.model_name)
+        with open(path + ".tmp", "w") as f:
+            json.dump(asdict(record), f)
+        os.replace(path + ".tmp", path)
+
+    def get_record(self, model_name: str) -> Optional[ServerRecord]:
+        """Returns the record of the model's server, or None when it is not running (stale records are removed)."""
+        path = self._record_path(model_name)
+        try:
+            with open(path) as f:
+                record = ServerRecord(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+        if not is_pid_alive(record.pid):
+            if os.path.exists(path):
+                os.remove(path)
+            return None
+        return record
+
+    def list_servers(self) -> List[ServerRecord]:
+        records = []
+        for file_name in sorted(os.listdir(self.run_dir)):
+            if file_name.endswith(".json"):
+                with open(os.path.join(self.run_dir, file_name)) as f:
+                    try:
+                        model_name = json.load(f)["model_name"]
+                    except (ValueError, KeyError):
+                        continue
+                record = self.get_record(model_name)
+                if record:
+                    records.append(record)
+        return records
+
+    def get_state(self, model_name: str) -> str:
+        record = self.get_record(model_name)
+        return record.state if record else STOPPED
+
+    def touch(self, model_name: str) -> None:
+        """Marks the server as recently used, for the LRU eviction."""
+        record = self.get_record(model_name)
+        if record:
+            record.last_used_at = time.time()
+            self._write_record(record)
+
+    def find_unmanaged_server(self, model_name: str) -> Optional[str]:
+        """
+        Returns the API base URL of a server of the model that commit-bot did not start (e.g. a vllm server started by
+        hand on `vllm_base_url`), found on the ports without a record. It is reused as is, and never stopped.
+        """
+        managed_ports = [r.port for r in self.list_servers()]
+        for port in self.ports:
+            api_base_url = f"http://{self.host}:{port}/v1"
+            if port not in managed_ports and is_serving_model(api_base_url, model_name):
+                return api_base_url
+        return None
+
+    def _find_free_port(self, used_ports: List[int]) -> int:
+        for port in self.ports:
+            if port in used_ports:
+                continue
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+                try:
+                    sock.bind(("127.0.0.1", port))
+                except OSError:
+                    continue
+            return port
+        raise RuntimeError(f"No free port for a new server in {self.ports[0]}-{self.ports[-1]}, stop some servers first.")
+
+    def _make_room(self, gpu_memory_utilization: float) -> None:
+        """Stops the least recently used servers until the new one fits in the memory budget."""
+        # Servers without live leases go first, nobody is waiting on them
+        servers = sorted(self.list_servers(), key=lambda r: (self.count_live_leases(r.model_name) > 0, r.last_used_at))
+        used = sum(r.gpu_memory_utilization for r in servers)
+        while servers and (used + gpu_memory_utilization > self.memory_budget + 1e-9 or len(servers) >= len(self.ports)):
+            evicted = servers.pop(0)
+            print(f"🛑 Stopping the least recently used server of model {evicted.model_name} to free GPU memory.")
+            self._stop(evicted)
+            used -= evicted.gpu_memory_utilization
+
+    def ensure_server(self, model_name: str, model_path: str, gpu_memory_utilization: float) -> ServerRecord:
+        """
+        Returns a ready server of the model, starting it if it is not resident.
+        Raises:
+            RuntimeError: When the server does not become ready before the startup timeout.
+        """
+        with self._locked():
+            record = self.get_record(model_name)
+            if record is None:
+                self._make_room(gpu_memory_utilization)
+                record = self._launch(model_name, model_path, gpu_memory_utilization)
+            record.last_used_at = time.time()
+            self._write_record(record)
+        if record.state != READY:
+            if not wait_until_ready(record.api_base_url, self.startup_timeout_sec, is_alive=lambda: is_pid_alive(record.pid)):
+                self.stop_server(model_name)
+                raise RuntimeError(f"The server of model {model_name} is not ready after {self.startup_timeout_sec} seconds, please check the logs in {self.log_dir}.")
+            record = self.get_record(model_name) or record
+            record.state = READY
+            self._write_record(record)
+        return record
+
+    def _launch(self, model_name: str, model_path: str, gpu_memory_utilization: float) -> ServerRecord:
+        port = self._find_free_port([r.port for r in self.list_servers()])
+        os.makedirs(self.log_dir, exist_ok=True)
+        server_log_path = os.path.join(self.log_dir, f"server_{port}.log")
+        command = self.launch_command(model_name, model_path, port, gpu_memory_utilization)
+        with open(server_log_path, "w") as log_file:
+            # A new session detaches the server from the terminal, so it outlives this commit-bot run
+            proc = subprocess.Popen(command, stdout=log_file, stderr=subprocess.STDOUT, start_new_session=True)
+        now = time.time()
+        record = ServerRecord(model_name, self.host, port, proc.pid, gpu_memory_utilization, STARTING, now, now)
+        print(f"🗄️ Starting server for model {model_name} on port {port} (PID {proc.pid}), logs are in {server_log_path}")
+        if self.spawn_monitor:
+            record.monitor_pid = self._spawn_monitor(model_name)
+        self._write_record(record)
+        return record
+
+    def _spawn_monitor(self, model_name: str) -> int:
+        monitor_log_path = os.path.join(self.log_dir, "server_monitor.log")
+        command = [sys.executable, "-m", "commit_bot.server_manager", "monitor", model_name]
+        env = {**os.environ, "PYTHONPATH": os.pathsep.join([os.path.dirname(THIS_SCRIPT_DIR), os.environ.get("PYTHONPATH", "")])}
+        with open(monitor_log_path, "a") as log_file:
+            proc = subprocess.Popen(command, stdout=log_file, stderr=subprocess.STDOUT, start_new_session=True, env=env)
+        return proc.pid
+
+    def _stop(self, record: ServerRecord, timeout_sec: float = 10) -> None:
+        record.state = DRAINING
+        self._write_record(record)
+        try:
+            os.killpg(record.pid, signal.SIGTERM)
+        except (ProcessLookupError, PermissionError):
+            pass
+        deadline = time.monotonic() + timeout_sec
+        while is_pid_alive(record.pid) and time.monotonic() < deadline:
+            time.sleep(0.1)
+        if is_pid_alive(record.pid):
+            print(f"❌ Graceful shutdown of the server of model {record.model_name} failed, killing it.")
+            try:
+                os.killpg(record.pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+        if record.monitor_pid and record.monitor_pid != os.getpid() and is_pid_alive(record.monitor_pid):
+            os.kill(record.monitor_pid, signal.SIGTERM)
+        path = self._record_path(record.model_name)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def stop_server(self, model_name: str) -> bool:
+        """Stops the model's server, returns False when it was not running."""
+        with self._locked():
+            record = self.get_record(model_name)
+            if record is None:
+                return False
+            self._stop(record)
+            return True
+
+    def stop_all(self) -> None:
+        for record in self.list_servers():
+            self.stop_server(record.model_name)
+
+    def monitor_idle(self, model_name: str, poll_sec: Optional[float] = None) -> None:
+        """
+        Stops the model's server once it has had no live lease and no running request for `idle_grace_sec` seconds.
+        A server still starting after `startup_timeout_sec` without a live lease (its client crashed) is stopped too.
+        Args:
+            model_name (str): Served name of the model.
+            poll_sec (Optional[float]): Delay between checks, defaults to a fraction of the grace period (at most 5 seconds).
+        """
+        poll_sec = poll_sec or max(0.5, min(5.0, self.idle_grace_sec / 4))
+        last_active_at = time.time()
+        while True:
+            record = self.get_record(model_name)
+            if record is None:
+                return
+            if record.state == STARTING and time.time() - record.started_at > self.startup_timeout_sec and self.count_live_leases(model_name) == 0:
+                print(f"Server of model {model_name} not ready after {self.startup_timeout_sec} seconds and nobody is waiting on it, shutting it down.")
+                self.stop_server(model_name)
+                return
+            if record.state == READY:
+                running_requests = read_metric(record.api_base_url, "vllm:num_requests_running")
+                if running_requests is None:
+                    print(f"Server of model {model_name} is not reachable, shutting it down.")
+                    self.stop_server(model_name)
+                    return
+                now = time.time()
+                if running_requests > 0 or self.count_live_leases(model_name) > 0:
+                    last_active_at = now
+                last_active_at = max(last_active_at, record.last_used_at)
+                if now - last_active_at >= self.idle_grace_sec:
+                    print(f"Server of model {model_name} idle for {now - last_active_at:.0f} seconds, shutting it down.")
+                    self.stop_server(model_name)
+                    return
+            time.sleep(poll_sec)
+
+
+class ServerLease:
+    """
+    Keeps the server of a model up while a commit-bot session is alive, by renewing a lease in a background thread.
+    A crashed session stops renewing, so its lease expires after `ttl_sec` at the latest.
+    """
+
+    def __init__(self, manager: ServerManager, model_name: str, ttl_sec: float = 15) -> None:
+        self.manager = manager
+        self.model_name = model_name
+        self.ttl_sec = ttl_sec
+        self.lease_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "ServerLease":
+        self.manager.renew_lease(self.model_name, self.lease_id, self.ttl_sec)
+        self._thread = threading.Thread(target=self._renew_until_released, daemon=True)
+        self._thread.start()
+        return self
+
+    def _renew_until_released(self) -> None:
+        while not self._stop_event.wait(self.ttl_sec / 3):
+            try:
+                self.manager.renew_lease(self.model_name, self.lease_id, self.ttl_sec)
+            except OSError:
+                pass
+
+    def release(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.manager.release_lease(self.model_name, self.lease_id)
+
+
+def hold_server_lease(model_spec: str) -> Optional[ServerLease]:
+    """Takes a lease on the local server of the model, returns None for models without a managed server."""
+    model_conf = load_config("model.conf").get("model_configs").get(f'"{model_spec}"', None)
+    if model_conf is None or model_conf.get("server_type") != "vllm":
+        return None
+    model_name = model_conf.get("model_id").split("/")[-1]
+    return ServerLease(ServerManager.from_config(), model_name, load_config("job.conf").get("server_lease_ttl_seconds", 15)).start()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m commit_bot.server_manager", description="Manage the local inference servers of commit-bot.")
+    subparsers = parser.add_subparsers(dest="action", required=True)
+    subparsers.add_parser("status", help="List the resident servers.")
+    stop_parser = subparsers.add_parser("stop", help="Stop the server of a model, or all servers.")
+    stop_parser.add_argument("model_name", nargs="?", default=None)
+    monitor_parser = subparsers.add_parser("monitor", help="Stop the server of a model once it is idle (started automatically).")
+    monitor_parser.add_argument("model_name")
+    args = parser.parse_args(argv)
+
+    manager = ServerManager.from_config()
+    if args.action == "status":
+        servers = manager.list_servers()
+        if not servers:
+            print("No server is running.")
+        for record in servers:
+            idle_sec = time.time() - record.last_used_at
+            n_leases = manager.count_live_leases(record.model_name)
+            print(f"{record.model_name}: {record.state}, PID {record.pid}, {record.api_base_url}, GPU memory {record.gpu_memory_utilization}, {n_leases} lease(s), last used {idle_sec:.0f}s ago")
+    elif args.action == "stop":
+        if args.model_name:
+            print("🛑 Stopped." if manager.stop_server(args.model_name) else f"No server is running for {args.model_name}.")
+        else:
+            manager.stop_all()
+    elif args.action == "monitor":
+        manager.monitor_idle(args.model_name)
+
+
+if __name__ == "__main__":
+    main()
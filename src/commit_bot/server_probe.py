@@ -0,0 +1,133 @@
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .http_pool import get_http_client
+
+READY_PATHS = ("/health", "/v1/models")
+# Counters of prompt tokens looked up in and found in the prefix cache: (queries, hits), by vllm version
+PREFIX_CACHE_METRICS = [("vllm:prefix_cache_queries_total", "vllm:prefix_cache_hits_total"), ("vllm:gpu_prefix_cache_queries_total", "vllm:gpu_prefix_cache_hits_total")]
+
+
+def get_server_root_url(api_base_url: str) -> str:
+    """Strips the OpenAI-compatible `/v1` suffix, e.g. `http://localhost:8000/v1` -> `http://localhost:8000`."""
+    root_url = api_base_url.rstrip("/")
+    return root_url[: -len("/v1")] if root_url.endswith("/v1") else root_url
+
+
+def _request(base_url: str, path: str, timeout: float, json: Optional[Dict[str, Any]] = None) -> Optional[Any]:
+    """Sends a GET (or a POST when `json` is given) through the shared pool, returns None when the server is unreachable."""
+    import httpx
+
+    client = get_http_client(base_url)
+    try:
+        return client.get(path, timeout=timeout) if json is None else client.post(path, json=json, timeout=timeout)
+    except (httpx.HTTPError, OSError, ValueError):
+        return None
+
+
+def probe_server(api_base_url: str, timeout: float = 1.0) -> bool:
+    """Returns True when the server answers `/health` or `/v1/models` with a 2xx status."""
+    for path in READY_PATHS:
+        response = _request(api_base_url, path, timeout)
+        if response is not None and response.is_success:
+            return True
+    return False
+
+
+def is_serving_model(api_base_url: str, model_name: str, timeout: float = 1.0) -> bool:
+    """Returns True when the server is up and `/v1/models` lists `model_name`."""
+    response = _request(api_base_url, "/v1/models", timeout)
+    try:
+        served_models = response.json().get("data", []) if response is not None and response.is_success else []
+    except ValueError:
+        return False
+    return any(model.get("id") == model_name for model in served_models)
+
+
+def preload_ollama_model(api_base_url: str, model_name: str, keep_alive: Any, timeout: float = 300) -> bool:
+    """Loads the model into the ollama server with an empty generate request, returns True once it is loaded."""
+    response = _request(api_base_url, "/api/generate", timeout, json={"model": model_name, "keep_alive": keep_alive})
+    return response is not None and response.is_success
+
+
+def wait_until_ready(
+    api_base_url: str,
+    deadline_sec: float,
+    is_alive: Optional[Callable[[], bool]] = None,
+    initial_interval_sec: float = 0.25,
+    max_interval_sec: float = 2.0,
+    show_progress: bool = True,
+) -> bool:
+    """
+    Polls the server with exponential backoff until it is ready.
+    Args:
+        api_base_url (str): OpenAI-compatible base url of the server.
+        deadline_sec (float): Maximum time to wait.
+        is_alive (Optional[Callable[[], bool]]): Returns False once the server process has died, to stop waiting early.
+        initial_interval_sec (float): First delay between probes, doubled after each failed probe.
+        max_interval_sec (float): Upper bound of the delay between probes.
+        show_progress (bool): Whether to print the elapsed time while waiting.
+    Returns:
+        bool: True if the server became ready before the deadline.
+    """
+    start = time.monotonic()
+    interval = initial_interval_sec
+    while True:
+        elapsed = time.monotonic() - start
+        if probe_server(api_base_url, timeout=min(max_interval_sec, 1.0)):
+            if show_progress:
+                print(" " * 60, end="\r")
+                print(f"✅ Server is ready after {elapsed:.1f} seconds.")
+            return True
+        if is_alive is not None and not is_alive():
+            if show_progress:
+                print(" " * 60, end="\r")
+            return False
+        if elapsed >= deadline_sec:
+            if show_progress:
+                print(" " * 60, end="\r")
+            return False
+        if show_progress:
+            print(f"⌛ Waiting for the server to be ready..., {elapsed:.0f}/{deadline_sec:.0f} seconds", end="\r")
+        time.sleep(min(interval, max(deadline_sec - elapsed, 0.01)))
+        interval = min(interval * 2, max_interval_sec)
+
+
+def read_metrics(api_base_url: str, metric_names: List[str], timeout: float = 1.0) -> Optional[Dict[str, float]]:
+    """
+    Reads metrics from the Prometheus `/metrics` endpoint of the server, each one summed over all its label sets.
+    Returns None when the server is unreachable, metrics that are not exported are left out.
+    """
+    response = _request(api_base_url, "/metrics", timeout)
+    if response is None or not response.is_success:
+        return None
+    totals: Dict[str, float] = {}
+    for line in response.text.splitlines():
+        name = line.split("{", 1)[0].split(" ", 1)[0]
+        if name in metric_names:
+            try:
+                totals[name] = totals.get(name, 0.0) + float(line.rsplit(" ", 1)[-1])
+            except ValueError:
+                continue
+    return totals
+
+
+def read_metric(api_base_url: str, metric_name: str, timeout: float = 1.0) -> Optional[float]:
+    """Reads one metric of the server, None when the server is unreachable and 0 when the metric is not exported."""
+    totals = read_metrics(api_base_url, [metric_name], timeout)
+    return None if totals is None else totals.get(metric_name, 0.0)
+
+
+def read_prefix_cache_counters(api_base_url: str, timeout: float = 0.5) -> Optional[Tuple[float, float]]:
+    """Returns the (queried, hit) prompt token counters of the vllm prefix cache, None when they are not available."""
+    totals = read_metrics(api_base_url, [name for names in PREFIX_CACHE_METRICS for name in names], timeout)
+    for queries_name, hits_name in PREFIX_CACHE_METRICS:
+        if totals and queries_name in totals:
+            return totals[queries_name], totals.get(hits_name, 0.0)
+    return None
+
+
+def get_prefix_cache_hit_rate(before: Tuple[float, float], after: Tuple[float, float]) -> Optional[float]:
+    """Share of the prompt tokens found in the prefix cache between two readings of the counters."""
+    queries, hits = after[0] - before[0], after[1] - before[1]
+    return round(hits / queries, 4) if queries > 0 else None
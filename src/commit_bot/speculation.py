@@ -0,0 +1,71 @@
+import threading
+from collections import deque
+from typing import Callable, Deque, List, Optional
+
+# Generates one candidate message; it should stop early and return None once the event is set.
+CandidateGenerator = Callable[[threading.Event], Optional[str]]
+
+
+class SpeculativeRegenerator:
+    """
+    Generates regeneration candidates in background threads while the user is deciding,
+    so that the `r` action can show a ready candidate instantly.
+    """
+
+    def __init__(self, generate_candidate: CandidateGenerator, n_candidates: int) -> None:
+        self.generate_candidate = generate_candidate
+        self.n_candidates = n_candidates
+        self._ready: Deque[str] = deque()
+        self._in_flight = 0
+        self._cancel_event = threading.Event()
+        self._condition = threading.Condition()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        """Starts background generation until `n_candidates` candidates are ready or in flight."""
+        with self._condition:
+            if self._cancel_event.is_set():
+                return
+            n_missing = self.n_candidates - len(self._ready) - self._in_flight
+            self._in_flight += max(n_missing, 0)
+        for _ in range(n_missing):
+            thread = threading.Thread(target=self._worker, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _worker(self) -> None:
+        try:
+            candidate = self.generate_candidate(self._cancel_event)
+        except Exception:
+            candidate = None
+        with self._condition:
+            self._in_flight -= 1
+            if candidate and not self._cancel_event.is_set():
+                self._ready.append(candidate)
+            self._condition.notify_all()
+
+    @property
+    def n_ready(self) -> int:
+        with self._condition:
+            return len(self._ready)
+
+    def pop(self) -> Optional[str]:
+        """
+        Returns a ready candidate, waiting for an in-flight one if none is ready yet,
+        and starts generating its replacement. Returns None when nothing is being generated.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._ready or self._in_flight == 0 or self._cancel_event.is_set())
+            candidate = self._ready.popleft() if self._ready and not self._cancel_event.is_set() else None
+        self.start()
+        return candidate
+
+    def cancel(self, wait: bool = False) -> None:
+        """Stops the background generation and drops the buffered candidates."""
+        self._cancel_event.set()
+        with self._condition:
+            self._ready.clear()
+            self._condition.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
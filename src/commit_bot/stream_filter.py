@@ -0,0 +1,184 @@
+import re
+import sys
+import time
+from functools import lru_cache
+from typing import FrozenSet, List, Optional, TextIO, Tuple
+
+from .utils import post_process_commit_message
+
+THINK_OPEN, THINK_CLOSE = "<think>", "</think>"
+# Same markers as `post_process_commit_message`, matched as they stream in
+MARKER_RE = re.compile(r"Body:\n|Body: |</?Body>|```\w*\n?")
+MARKER_PREFIXES = ("Body:\n", "Body: ", "<Body>", "</Body>", "```")
+CONVENTIONAL_HEADER_RE = re.compile(r"(feat|fix|docs|style|refactor|perf|test|build|ci|chore|revert)(\([^)\n]*\))?!?: \S")
+# Partial line that may still turn into a conventional header or a separator line, held back from the display
+STOP_LINE_PREFIX_RE = re.compile(r"[a-z]*(\([^)\n]*\)?)?!?(: ?)?|[-*_]*")
+SEPARATOR_LINE_RE = re.compile(r"(-{3,}|\*{3,}|_{3,})\s*")
+
+# States of the message structure, as lines complete
+BEFORE_HEADER, AFTER_HEADER, BODY, NOT_CONVENTIONAL = "before_header", "after_header", "body", "not_conventional"
+
+
+@lru_cache(maxsize=None)
+def _marker_starts(markers: Tuple[str, ...]) -> Tuple[int, FrozenSet[str]]:
+    return max(len(marker) for marker in markers), frozenset(marker[0] for marker in markers)
+
+
+def _held_back_length(text: str, markers: Tuple[str, ...]) -> int:
+    """Length of the longest suffix of `text` that is the beginning of one of the markers, and may complete with the next chunk."""
+    window, first_chars = _marker_starts(markers)
+    for start in range(max(len(text) - window, 0), len(text)):
+        # Most chunks end without any character a marker starts with
+        if text[start] in first_chars and any(marker.startswith(text[start:]) for marker in markers):
+            return len(text) - start
+    return 0
+
+
+class CommitMessageStreamFilter:
+    """
+    Incremental counterpart of `post_process_commit_message`: strips `<think>` blocks, `Body:` markers and code
+    fences as the chunks arrive, holding back only the few characters that may be the beginning of a marker.
+
+    With `early_stop`, it also follows the structure of the message and sets `complete` once a well-formed
+    conventional commit (header, blank line, body, optional footers) is followed by something that is not part
+    of it: another commit header, a closing code fence or a separator line. Whatever follows is dropped, so the
+    caller can close the stream instead of paying for the tokens the model keeps emitting.
+    """
+
+    def __init__(self, early_stop: bool = True) -> None:
+        self.early_stop = early_stop
+        self.complete = False
+        self._parts: List[str] = []
+        self._think_tail = ""  # Raw text that may be the beginning of a `<think>`/`</think>` tag
+        self._marker_tail = ""  # Text out of the think blocks that may be the beginning of a marker
+        self._in_think = False
+        self._line = ""  # Filtered text of the current line, not shown yet
+        self._shown_line_length = 0
+        self._state = BEFORE_HEADER
+        self._has_body = False
+        self._started = False
+
+    @property
+    def message(self) -> str:
+        """The message so far, post-processed like a complete generation."""
+        return post_process_commit_message("".join(self._parts) + self._line)
+
+    def feed(self, content: str) -> str:
+        """Filters a chunk of content, returning the text that can be displayed now."""
+        if self.complete or not content:
+            return ""
+        text = self._marker_tail + self._strip_think(self._think_tail + content)
+        held = _held_back_length(text, MARKER_PREFIXES)
+        fence_start = text.rfind("```")
+        if fence_start >= 0 and re.fullmatch(r"```\w*", text[fence_start:]):
+            held = max(held, len(text) - fence_start)  # A fence with its language name, not ended yet
+        self._marker_tail = text[len(text) - held :]
+        return self._add_filtered(text[: len(text) - held])
+
+    def flush(self) -> str:
+        """Filters the text held back at the end of the stream, returning what is left to display."""
+        text = self._marker_tail + ("" if self._in_think else self._think_tail)
+        self._marker_tail = self._think_tail = ""
+        shown = self._add_filtered(text) if not self.complete else ""
+        if not self.complete:
+            self._parts.append(self._line)
+            shown += self._line[self._shown_line_length :]
+            self._line, self._shown_line_length = "", 0
+        return shown
+
+    def _strip_think(self, text: str) -> str:
+        output = []
+        while True:
+            tag = THINK_CLOSE if self._in_think else THINK_OPEN
+            index = text.find(tag)
+            if index < 0:
+                break
+            if not self._in_think:
+                output.append(text[:index])
+            self._in_think = not self._in_think
+            text = text[index + len(tag) :]
+        held = _held_back_length(text, (tag,))
+        if not self._in_think:
+            output.append(text[: len(text) - held])
+        self._think_tail = text[len(text) - held :]
+        return "".join(output)
+
+    def _add_filtered(self, text: str) -> str:
+        """Removes the markers of complete text, then follows the message structure line by line."""
+        shown = []
+        position = 0
+        for match in MARKER_RE.finditer(text):
+            shown.append(self._add_text(text[position : match.start()]))
+            if match.group().startswith("```") and self._state == BODY and self._has_body and self.early_stop:
+                self._finish()  # Closing fence of the message
+            if self.complete:
+                return "".join(shown)
+            position = match.end()
+        shown.append(self._add_text(text[position:]))
+        return "".join(shown)
+
+    def _add_text(self, text: str) -> str:
+        shown = []
+        while text and not self.complete:
+            if not self._started:
+                # Leading whitespace is stripped, as in `post_process_commit_message`
+                text = text.lstrip()
+                self._started = bool(text)
+                continue
+            line_end = text.find("\n")
+            piece, text = (text, "") if line_end < 0 else (text[: line_end + 1], text[line_end + 1 :])
+            self._line += piece
+            if self._should_stop_at(self._line):
+                self._line, self._shown_line_length = "", 0
+                self._finish()
+                break
+            if piece.endswith("\n"):
+                shown.append(self._line[self._shown_line_length :])
+                self._end_line(self._line.rstrip("\n"))
+            elif not (self._state == BODY and self._has_body and STOP_LINE_PREFIX_RE.fullmatch(self._line)):
+                shown.append(self._line[self._shown_line_length :])
+                self._shown_line_length = len(self._line)
+        return "".join(shown)
+
+    def _should_stop_at(self, line: str) -> bool:
+        """Whether the (partial) line starts something after a complete message."""
+        if not self.early_stop or self._state != BODY or not self._has_body:
+            return False
+        return bool(CONVENTIONAL_HEADER_RE.match(line)) or (line.endswith("\n") and bool(SEPARATOR_LINE_RE.fullmatch(line.rstrip("\n"))))
+
+    def _end_line(self, line: str) -> None:
+        self._parts.append(self._line)
+        self._line, self._shown_line_length = "", 0
+        if self._state == BEFORE_HEADER and line.strip():
+            self._state = AFTER_HEADER if CONVENTIONAL_HEADER_RE.match(line) else NOT_CONVENTIONAL
+        elif self._state == AFTER_HEADER and not line.strip():
+            self._state = BODY
+        elif self._state == BODY and line.strip():
+            self._has_body = True
+
+    def _finish(self) -> None:
+        self.complete = True
+        self._marker_tail = self._think_tail = ""
+
+
+class ThrottledPrinter:
+    """Writes streamed text to the terminal at most every `interval_sec`, instead of flushing every token."""
+
+    def __init__(self, interval_sec: float = 0.05, stream: Optional[TextIO] = None) -> None:
+        self.interval_sec = interval_sec
+        self.stream = stream or sys.stdout
+        self._pending: List[str] = []
+        self._last_flush = 0.0
+
+    def write(self, text: str) -> None:
+        if text:
+            self._pending.append(text)
+        if self._pending and time.monotonic() - self._last_flush >= self.interval_sec:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._pending:
+            self.stream.write("".join(self._pending))
+            self._pending.clear()
+        self.stream.flush()
+        self._last_flush = time.monotonic()
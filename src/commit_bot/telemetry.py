@@ -0,0 +1,234 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Generator, Iterable, Iterator, List, Optional, Tuple
+
+from .utils import get_config_parse_seconds, get_user_cache_dir, load_config
+
+# Phases measured once per process (startup, git diff collection), reported with its first generation
+_SESSION_PHASES: Dict[str, float] = {}
+_SESSION_LOCK = threading.Lock()
+_REPORTED_CONFIG_PARSE_SECONDS = 0.0
+
+# Columns of `commit-bot stats`: (title, record field or phase)
+STATS_COLUMNS = [("ttft", "ttft_seconds"), ("total", "total_seconds"), ("tok/s", "tokens_per_sec"), ("prefix hit", "prefix_cache_hit_rate"), ("server", "server"), ("git", "git"), ("startup", "startup")]
+
+
+def get_process_age_seconds() -> Optional[float]:
+    """Seconds since the process started, interpreter startup and imports included (Linux only)."""
+    try:
+        with open("/proc/self/stat") as f:
+            # Fields after the parenthesized command name, `starttime` is the 22nd field of the line
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return max(uptime - start_ticks / os.sysconf("SC_CLK_TCK"), 0.0)
+
+
+def record_session_phase(name: str, seconds: Optional[float]) -> None:
+    if seconds is not None:
+        with _SESSION_LOCK:
+            _SESSION_PHASES[name] = _SESSION_PHASES.get(name, 0.0) + seconds
+
+
+@contextmanager
+def session_phase(name: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_session_phase(name, time.perf_counter() - start)
+
+
+def _pop_session_phases() -> Dict[str, float]:
+    global _REPORTED_CONFIG_PARSE_SECONDS
+    with _SESSION_LOCK:
+        phases = dict(_SESSION_PHASES)
+        _SESSION_PHASES.clear()
+        parse_seconds = get_config_parse_seconds()
+        phases["load_config"] = parse_seconds - _REPORTED_CONFIG_PARSE_SECONDS
+        _REPORTED_CONFIG_PARSE_SECONDS = parse_seconds
+    return phases
+
+
+def get_telemetry_path() -> Optional[Path]:
+    """Returns the JSONL file of the telemetry records, or None when telemetry is disabled in job.conf."""
+    conf = load_config("job.conf")
+    if not conf.get("telemetry_enabled", True):
+        return None
+    path = conf.get("telemetry_file", None)
+    return Path(path).expanduser() if path else get_user_cache_dir() / "telemetry.jsonl"
+
+
+def append_record(record: Dict[str, Any], path: Path, max_bytes: int) -> None:
+    """Appends one JSON line, with a single write so that concurrent processes do not interleave, rotating a full file to `.1`."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        if path.stat().st_size > max_bytes:
+            os.replace(path, path.with_name(path.name + ".1"))
+    except FileNotFoundError:
+        pass
+    line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+    try:
+        os.write(fd, line)
+    finally:
+        os.close(fd)
+
+
+class RunTelemetry:
+    """
+    Timings of one generation: the phases before the request (prompt building, server start/readiness),
+    the time to first token, the streamed tokens and the post-processing. `save()` appends them as one JSON line.
+    """
+
+    def __init__(self, model_spec: str, backend: str, mode: str, **fields: Any) -> None:
+        self._start = time.perf_counter()
+        self.phases = _pop_session_phases()
+        self.record: Dict[str, Any] = {"ts": round(time.time(), 3), "model": model_spec, "backend": backend, "mode": mode, **fields}
+        self.tokens = 0
+        self._submitted: Optional[float] = None
+        self._first_token: Optional[float] = None
+        self._last_token: Optional[float] = None
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def observe_stream(self, chunks: Iterable[Any]) -> Generator[Any, None, None]:
+        """
+        Passes the chunks of a stream through, timing the first and last tokens.
+        Chunks with content or reasoning are counted as tokens, ollama and vllm stream one token per chunk.
+        """
+        self._submitted = time.perf_counter()
+        for chunk in chunks:
+            if chunk.content or chunk.reasoning:
+                self._last_token = time.perf_counter()
+                if self._first_token is None:
+                    self._first_token = self._last_token
+                self.tokens += 1
+            yield chunk
+
+    def summary(self) -> Dict[str, Any]:
+        record = {**self.record, "phases": {name: round(seconds, 4) for name, seconds in self.phases.items()}}
+        record["total_seconds"] = round(time.perf_counter() - self._start, 4)
+        if self._submitted is not None and self._first_token is not None:
+            record["ttft_seconds"] = round(self._first_token - self._submitted, 4)
+            record["tokens"] = self.tokens
+            decode_seconds = self._last_token - self._first_token
+            if self.tokens > 1 and decode_seconds > 0:
+                record["tokens_per_sec"] = round((self.tokens - 1) / decode_seconds, 2)
+        return record
+
+    def save(self, **fields: Any) -> None:
+        """Appends the record to the telemetry file. Telemetry never makes a run fail."""
+        try:
+            path = get_telemetry_path()
+            if path is None:
+                return
+            max_bytes = int(load_config("job.conf").get("telemetry_max_megabytes", 10) * 1024 * 1024)
+            append_record({**self.summary(), **fields}, path, max_bytes)
+        except Exception as e:
+            print(f"⚠️ Failed to save telemetry: {e}")
+
+
+def load_records(path: Path, since_ts: float = 0.0) -> List[Dict[str, Any]]:
+    """Reads the records of the telemetry file and of its rotated predecessor, skipping corrupted lines."""
+    records = []
+    for file_path in [path.with_name(path.name + ".1"), path]:
+        if not file_path.exists():
+            continue
+        with open(file_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get("ts", 0) >= since_ts:
+                    records.append(record)
+    return records
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Percentile `q` (0-100) of the values, linearly interpolated between the closest ranks."""
+    if not values:
+        return None
+    values = sorted(values)
+    rank = (len(values) - 1) * q / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (rank - lower)
+
+
+def _field(record: Dict[str, Any], name: str) -> Optional[float]:
+    value = record.get(name, record.get("phases", {}).get(name))
+    return value if isinstance(value, (int, float)) else None
+
+
+def summarize_records(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Groups the records by model and backend, with the p50/p95 of each column of `STATS_COLUMNS`.
+    Cache hits, failed runs and runs answered by the fallback model of a hedged request are counted but left out of
+    the latency percentiles, their latency is not the one of the model.
+    Returns:
+        List[Dict[str, Any]]: One row per (model, backend), most used first.
+    """
+    groups: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+    for record in records:
+        groups.setdefault((record.get("model", "?"), record.get("backend", "?")), []).append(record)
+    rows = []
+    for (model, backend), group in groups.items():
+        generated = [record for record in group if not record.get("cached") and not record.get("error") and record.get("hedge_winner") != "fallback"]
+        row: Dict[str, Any] = {"model": model, "backend": backend, "runs": len(group), "cached": sum(1 for record in group if record.get("cached"))}
+        row["hedged"] = sum(1 for record in group if record.get("hedged"))
+        row["fallback_won"] = sum(1 for record in group if record.get("hedge_winner") == "fallback")
+        for _, name in STATS_COLUMNS:
+            values = [value for value in (_field(record, name) for record in generated) if value is not None]
+            row[name] = (percentile(values, 50), percentile(values, 95))
+        rows.append(row)
+    return sorted(rows, key=lambda row: -row["runs"])
+
+
+def format_stats_table(rows: List[Dict[str, Any]]) -> str:
+    def cell(value: Optional[float]) -> str:
+        return "-" if value is None else f"{value:.2f}"
+
+    header = ["model", "backend", "runs", "cached", "hedged", "fallback won"] + [f"{title} p50/p95" for title, _ in STATS_COLUMNS]
+    lines = [header] + [
+        [row["model"], row["backend"], str(row["runs"]), str(row["cached"]), str(row["hedged"]), str(row["fallback_won"])]
+        + [f"{cell(row[name][0])}/{cell(row[name][1])}" for _, name in STATS_COLUMNS]
+        for row in rows
+    ]
+    widths = [max(len(line[i]) for line in lines) for i in range(len(header))]
+    return "\n".join("  ".join(value.ljust(width) for value, width in zip(line, widths)).rstrip() for line in lines)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="commit-bot stats", description="Summarize the latency telemetry of past runs per model and backend (times in seconds).")
+    parser.add_argument("--days", type=float, default=None, help="Only include the runs of the last N days.")
+    parser.add_argument("--model", default=None, help="Only include the runs of this model.")
+    parser.add_argument("--file", default=None, help="Telemetry file to read (default: `telemetry_file` in job.conf).")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    path = Path(args.file).expanduser() if args.file else get_telemetry_path()
+    if path is None:
+        print("❌ Telemetry is disabled, set `telemetry_enabled=true` in job.conf to record it.")
+        sys.exit(1)
+    since_ts = time.time() - args.days * 24 * 3600 if args.days is not None else 0.0
+    records = [record for record in load_records(path, since_ts) if args.model is None or record.get("model") == args.model]
+    if not records:
+        print(f"🔎 No telemetry recorded yet in {path}.")
+        return
+    print(f"📊 {len(records)} runs recorded in {path}\n")
+    print(format_stats_table(summarize_records(records)))
@@ -1,39 +1,132 @@
 import os
 import random
 import re
+import threading
+import time
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
 
-from pyhocon import ConfigFactory
+from .prompts import regen_instructions
 
-from .prompts import deriv_sys_ppt_1, deriv_sys_ppt_2, deriv_sys_ppt_3
+if TYPE_CHECKING:
+    from pyhocon import ConfigFactory
 
 
-def load_config(config_file_name: str) -> ConfigFactory:
+# Parsed configs keyed by (user config path, module default config path), with the (mtime, size) of both files
+_CONFIG_CACHE: Dict[Tuple[str, str], Tuple[Tuple[Optional[Tuple[int, int]], ...], Any]] = {}
+_CONFIG_CACHE_STATS = {"hits": 0, "misses": 0}
+_CONFIG_PARSE_SECONDS = 0.0  # Time spent parsing configs (cache misses), reported by the telemetry
+_CONFIG_CACHE_LOCK = threading.Lock()
+_FROZEN_CONFIG_TREE_CLASS: Optional[type] = None
+
+
+def _file_signature(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+    except OSError:
+        return None
+
+
+def _freeze_config(config: Any) -> Any:
+    """Makes a parsed config and all its nested configs read-only, since cached configs are shared by all callers."""
+    global _FROZEN_CONFIG_TREE_CLASS
+    from pyhocon import ConfigTree
+
+    if _FROZEN_CONFIG_TREE_CLASS is None:
+
+        class FrozenConfigTree(ConfigTree):
+            def _read_only(self, *args: Any, **kwargs: Any) -> None:
+                raise TypeError("Configs returned by load_config() are shared and read-only, use as_plain_ordered_dict() to get a mutable copy.")
+
+            __setitem__ = __delitem__ = put = pop = popitem = clear = update = setdefault = _read_only
+
+            def __reduce__(self) -> Tuple[Any, ...]:
+                # Copies (copy.deepcopy, with_fallback) are regular, mutable ConfigTrees
+                return (ConfigTree, (list(self.items()),))
+
+        _FROZEN_CONFIG_TREE_CLASS = FrozenConfigTree
+
+    nodes = [config]
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, ConfigTree):
+            node.__class__ = _FROZEN_CONFIG_TREE_CLASS
+            nodes.extend(node.values())
+        elif isinstance(node, list):
+            nodes.extend(node)
+    return config
+
+
+def load_config(config_file_name: str) -> "ConfigFactory":
     """
     Load configuration from a HOCON file.
+    The parsed configuration is cached until the user or module default file changes (mtime or size).
     Args:
         config_file_name (str): Name of the configuration file.
     Returns:
-        ConfigFactory: Parsed configuration object.
+        ConfigFactory: Parsed, read-only configuration object.
     """
-    home_dir = Path.home()
-    if (home_dir / f".config/commit-bot/{config_file_name}").exists():
-        user_config_path = (home_dir / f".config/commit-bot/{config_file_name}").as_posix()
-        user_config = ConfigFactory.parse_file(user_config_path)
+    user_config_path = (Path.home() / f".config/commit-bot/{config_file_name}").as_posix()
     this_script_dir = os.path.dirname(os.path.abspath(__file__))
     module_default_config_path = os.path.join(this_script_dir, "conf", config_file_name)
+    cache_key = (user_config_path, module_default_config_path)
+    signature = (_file_signature(user_config_path), _file_signature(module_default_config_path))
+    with _CONFIG_CACHE_LOCK:
+        cached = _CONFIG_CACHE.get(cache_key)
+        if cached is not None and cached[0] == signature:
+            _CONFIG_CACHE_STATS["hits"] += 1
+            return cached[1]
+        _CONFIG_CACHE_STATS["misses"] += 1
+
+    global _CONFIG_PARSE_SECONDS
+    parse_start = time.perf_counter()
+    from pyhocon import ConfigFactory
+
+    if signature[0] is not None:
+        user_config = ConfigFactory.parse_file(user_config_path)
     module_default_config = ConfigFactory.parse_file(module_default_config_path)
     ret_config = user_config.with_fallback(module_default_config) if "user_config" in locals() else module_default_config
+    ret_config = _freeze_config(ret_config)
 
+    with _CONFIG_CACHE_LOCK:
+        _CONFIG_CACHE[cache_key] = (signature, ret_config)
+        _CONFIG_PARSE_SECONDS += time.perf_counter() - parse_start
     return ret_config
 
 
+def invalidate_config_cache(config_file_name: Optional[str] = None) -> None:
+    """Drops the cached config of `config_file_name`, or all cached configs."""
+    with _CONFIG_CACHE_LOCK:
+        for key in list(_CONFIG_CACHE):
+            if config_file_name is None or os.path.basename(key[1]) == config_file_name:
+                del _CONFIG_CACHE[key]
+
+
+def get_config_cache_stats() -> Dict[str, int]:
+    """Returns the hit/miss counters of the config cache."""
+    with _CONFIG_CACHE_LOCK:
+        return {**_CONFIG_CACHE_STATS, "entries": len(_CONFIG_CACHE)}
+
+
+def get_config_parse_seconds() -> float:
+    """Returns the total time spent importing pyhocon and parsing configs in this process."""
+    with _CONFIG_CACHE_LOCK:
+        return _CONFIG_PARSE_SECONDS
+
+
+def get_user_cache_dir() -> Path:
+    """Returns the commit-bot cache directory, honouring `$XDG_CACHE_HOME`."""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or (Path.home() / ".cache").as_posix()
+    return Path(cache_home) / "commit-bot"
+
+
 def get_conf_regen_commit_msg() -> tuple[str, dict[str, Any]]:
+    """Returns the instruction and the generation configs of a randomized regeneration, the system prompt is unchanged."""
     new_model_gen_conf = {"temperature": random.uniform(0.3, 0.7)}
-    new_sys_ppt = random.choice([deriv_sys_ppt_1, deriv_sys_ppt_2, deriv_sys_ppt_3])
+    new_instruction = random.choice(regen_instructions)
 
-    return new_sys_ppt, new_model_gen_conf
+    return new_instruction, new_model_gen_conf
 
 
 def post_process_commit_message(message: str) -> str:
@@ -0,0 +1,229 @@
+"""
+Offline benchmarks of commit-bot, against a local stub LLM server (no model or GPU needed).
+
+    python -m tests.benchmark.run_benchmarks            # full run, appended to tests/benchmark/results.jsonl
+    python -m tests.benchmark.run_benchmarks --quick    # smaller sizes and fewer repeats
+
+Each run is stored with the package version and git commit, and compared with the latest run of another commit.
+All metrics are times, lower is better.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from src.commit_bot import main as commit_bot_main
+from src.commit_bot.ai_models import AIModels, ChunkWrapper, ModelExecutor
+from src.commit_bot.diff_compaction import compact_diff
+from src.commit_bot.git_diff import read_staged_diff
+from src.commit_bot.http_pool import close_http_clients
+from src.commit_bot.stream_filter import CommitMessageStreamFilter
+from src.commit_bot.utils import post_process_commit_message
+
+from .stub_server import StubLLMServer
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_OUTPUT = Path(__file__).resolve().parent / "results.jsonl"
+MESSAGES = [{"role": "system", "content": "Write a commit message."}, {"role": "user", "content": "diff"}]
+
+
+def measure(fn: Callable[[], Any], repeats: int, warmup: int = 1) -> float:
+    """Median duration of `fn` in seconds, after `warmup` untimed calls (imports, connections, caches)."""
+    for _ in range(warmup):
+        fn()
+    durations = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+def make_diff(n_bytes: int) -> str:
+    """Synthetic staged diff of about `n_bytes`, spread over files of 200 changed lines."""
+    files, size, i = [], 0, 0
+    while size < n_bytes:
+        lines = [f"+    value_{j} = compute_{i}({j}, options)  # keep the values of file {i} in sync" for j in range(200)]
+        file_diff = f"diff --git a/src/module_{i}.py b/src/module_{i}.py\n--- a/src/module_{i}.py\n+++ b/src/module_{i}.py\n@@ -1,0 +1,200 @@\n" + "\n".join(lines) + "\n"
+        files.append(file_diff)
+        size += len(file_diff)
+        i += 1
+    return "".join(files)[:n_bytes]
+
+
+def bench_generate_commit_message(quick: bool) -> Dict[str, float]:
+    """End-to-end `generate_commit_message` latency, and its overhead over the time the stub server takes to stream."""
+    results = {}
+    server = StubLLMServer(n_tokens=16 if quick else 64, ttft_sec=0.01 if quick else 0.05, tokens_per_sec=1000 if quick else 200)
+    backends = {
+        "ollama": ModelExecutor("ollama/bench", {"max_tokens": 64}, server.base_url, "ollama"),
+        "openai": ModelExecutor("openai/bench", {"max_tokens": 64, "api_key": "stub"}, server.base_url + "/v1", "openai"),
+    }
+    staged_changes = make_diff(4 * 1024)
+    try:
+        for backend, model in backends.items():
+            model_spec = f"bench-{backend}"
+            AIModels()._models[model_spec] = model
+            commit_bot_main.MODEL_SPEC = model_spec
+
+            def generate() -> None:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    commit_bot_main.generate_commit_message(staged_changes, use_cache=False)
+
+            seconds = measure(generate, repeats=3 if quick else 10)
+            results[f"generate_commit_message[{backend}].seconds"] = seconds
+            results[f"generate_commit_message[{backend}].overhead_ms"] = (seconds - server.expected_seconds) * 1000
+    finally:
+        commit_bot_main.MODEL_SPEC = None
+        server.close()
+    return results
+
+
+def bench_stream_chunk_loop(quick: bool) -> Dict[str, float]:
+    """Client-side cost of each streamed chunk (litellm parsing, `ChunkWrapper`, the background loop hop), with no server delay."""
+    results = {}
+    n_tokens = 200 if quick else 2000
+    server = StubLLMServer(n_tokens=n_tokens)
+    backends = {
+        "vllm": ModelExecutor("openai/bench", {"max_tokens": n_tokens}, server.base_url + "/v1", "vllm"),
+        "ollama": ModelExecutor("ollama/bench", {"max_tokens": n_tokens}, server.base_url, "ollama"),
+    }
+    try:
+        for backend, model in backends.items():
+            seconds = measure(lambda: sum(1 for _ in model.stream_completion(MESSAGES)), repeats=2 if quick else 5)
+            results[f"stream_chunk_loop[{backend}].us_per_chunk"] = seconds / n_tokens * 1e6
+    finally:
+        server.close()
+    n_chunks = 10_000 if quick else 100_000
+    seconds = measure(lambda: [ChunkWrapper("token", "") for _ in range(n_chunks)], repeats=3)
+    results["chunk_wrapper.us_per_chunk"] = seconds / n_chunks * 1e6
+    return results
+
+
+def filter_stream(message: str, chunk_size: int = 4) -> str:
+    stream_filter = CommitMessageStreamFilter(early_stop=False)
+    for i in range(0, len(message), chunk_size):
+        stream_filter.feed(message[i : i + chunk_size])
+    stream_filter.flush()
+    return stream_filter.message
+
+
+def bench_post_process(quick: bool) -> Dict[str, float]:
+    """
+    `post_process_commit_message` on large outputs (reasoning blocks, code fences and body tags),
+    and its incremental counterpart fed token-sized chunks.
+    """
+    results = {}
+    block = "<think>\nThe diff adds pagination.\n</think>\n```text\nBody: feat(api): add pagination\n<Body>The endpoint returned everything.</Body>\n```\n"
+    for label, n_bytes in ([("10KB", 10 * 1024)] if quick else [("10KB", 10 * 1024), ("1MB", 1024 * 1024)]):
+        message = block * (n_bytes // len(block))
+        results[f"post_process[{label}].ms"] = measure(lambda: post_process_commit_message(message), repeats=3) * 1000
+        results[f"stream_filter[{label}].ms"] = measure(lambda: filter_stream(message), repeats=3) * 1000
+    return results
+
+
+def bench_diff_handling(quick: bool) -> Dict[str, float]:
+    """Reading the staged diff (within the size limits of job.conf) and compacting it into the prompt budget."""
+    results = {}
+    sizes = [("1KB", 1024), ("1MB", 1024**2)] if quick else [("1KB", 1024), ("1MB", 1024**2), ("10MB", 10 * 1024**2), ("50MB", 50 * 1024**2)]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for label, n_bytes in sizes:
+            path = os.path.join(tmp_dir, f"{label}.diff")
+            Path(path).write_text(make_diff(n_bytes))
+            with contextlib.redirect_stdout(io.StringIO()):
+                results[f"read_staged_diff[{label}].ms"] = measure(lambda: read_staged_diff(["cat", path]), repeats=3) * 1000
+                text = read_staged_diff(["cat", path]).text
+            results[f"compact_diff[{label}].ms"] = measure(lambda: compact_diff(text, 6000), repeats=3) * 1000
+    return results
+
+
+BENCHMARKS: Dict[str, Callable[[bool], Dict[str, float]]] = {
+    "generate_commit_message": bench_generate_commit_message,
+    "stream_chunk_loop": bench_stream_chunk_loop,
+    "post_process": bench_post_process,
+    "diff_handling": bench_diff_handling,
+}
+
+
+def get_version_info() -> Dict[str, Any]:
+    """Package version and git commit of the benchmarked tree, so that runs can be compared between versions."""
+    match = re.search(r'^version = "(.+)"', (REPO_ROOT / "pyproject.toml").read_text(), re.MULTILINE)
+
+    def git(*args: str) -> str:
+        return subprocess.run(["git", "-C", str(REPO_ROOT), *args], capture_output=True, text=True).stdout.strip()
+
+    return {"version": match.group(1) if match else "unknown", "commit": git("rev-parse", "--short", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def load_runs(path: Path) -> List[Dict[str, Any]]:
+    if not path.exists():
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def find_baseline(runs: List[Dict[str, Any]], run: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Latest stored run of another commit with the same settings, or the latest one when the commit did not change."""
+    same_settings = [previous for previous in runs if previous.get("quick") == run["quick"]]
+    other_commits = [previous for previous in same_settings if previous.get("commit") != run["commit"]]
+    return (other_commits or same_settings or [None])[-1]
+
+
+def format_comparison(run: Dict[str, Any], baseline: Optional[Dict[str, Any]], threshold_pct: float) -> str:
+    """Table of the metrics of the run next to the baseline, regressions beyond `threshold_pct` are flagged."""
+    lines = []
+    width = max(len(name) for name in run["results"])
+    for name, value in run["results"].items():
+        line = f"{name.ljust(width)}  {value:12.3f}"
+        previous = (baseline or {}).get("results", {}).get(name)
+        if previous:
+            change_pct = (value - previous) / abs(previous) * 100
+            flag = "  ⚠️ regression" if change_pct > threshold_pct else ""
+            line += f"  {previous:12.3f}  {change_pct:+7.1f}%{flag}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the offline commit-bot benchmarks against a local stub LLM server.")
+    parser.add_argument("--quick", action="store_true", help="Smaller sizes and fewer repeats.")
+    parser.add_argument("--only", action="append", default=None, choices=list(BENCHMARKS), help="Run only this benchmark, can be repeated.")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT, help="JSONL file the runs are appended to and compared with.")
+    parser.add_argument("--no-save", action="store_true", help="Compare with the stored runs without storing this one.")
+    parser.add_argument("--threshold", type=float, default=20.0, help="Slowdown (in percent) flagged as a regression.")
+    args = parser.parse_args(argv)
+
+    # Keep the telemetry and message cache of the benchmarked runs out of the user's cache directory
+    os.environ["XDG_CACHE_HOME"] = tempfile.mkdtemp(prefix="commit-bot-bench-")
+    run: Dict[str, Any] = {"ts": round(time.time(), 3), **get_version_info(), "python": platform.python_version(), "quick": args.quick, "results": {}}
+    try:
+        for name in args.only or list(BENCHMARKS):
+            print(f"⏱️ {name}...", file=sys.stderr)
+            run["results"].update({metric: round(value, 4) for metric, value in BENCHMARKS[name](args.quick).items()})
+    finally:
+        close_http_clients()
+
+    baseline = find_baseline(load_runs(args.output), run)
+    if baseline:
+        print(f"Compared with {baseline['version']} ({baseline['commit']}{', dirty' if baseline.get('dirty') else ''})\n")
+    print(format_comparison(run, baseline, args.threshold))
+    if not args.no_save:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, "a") as f:
+            f.write(json.dumps(run) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+COMMIT_MESSAGE_WORDS = "feat(api): add pagination to the commit listing endpoint\n\nThe endpoint returned every commit at once, which timed out on large repositories.".split(" ")
+
+
+def make_tokens(n_tokens: int) -> List[str]:
+    """Tokens of a plausible commit message, repeated up to `n_tokens`."""
+    words = [COMMIT_MESSAGE_WORDS[i % len(COMMIT_MESSAGE_WORDS)] for i in range(n_tokens)]
+    return words[:1] + [" " + word for word in words[1:]]
+
+
+class StubLLMServer:
+    """
+    Local stand-in for an LLM server, speaking the streaming protocols of OpenAI-compatible servers (vllm,
+    `/v1/chat/completions`, server-sent events) and of ollama (`/api/generate` and `/api/chat`, JSON lines).
+    The first chunk is sent after `ttft_sec`, then tokens are produced at `tokens_per_sec`, `chunk_tokens` per chunk.
+    """
+
+    def __init__(self, n_tokens: int = 64, ttft_sec: float = 0.0, tokens_per_sec: float = 0.0, chunk_tokens: int = 1) -> None:
+        self.tokens = make_tokens(n_tokens)
+        self.ttft_sec = ttft_sec
+        self.tokens_per_sec = tokens_per_sec
+        self.chunk_tokens = chunk_tokens
+        self.requests: List[Dict[str, Any]] = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self) -> None:
+                if self.path in ("/v1/models", "/api/tags", "/health"):
+                    self._send_json({"data": [], "models": []})
+                else:
+                    self.send_error(404)
+
+            def do_POST(self) -> None:
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])) or b"{}")
+                server.requests.append({"path": self.path, **body})
+                if self.path == "/v1/chat/completions":
+                    make_chunk, make_last_chunk, content_type = server._openai_chunk, server._openai_last_chunk, "text/event-stream"
+                elif self.path in ("/api/generate", "/api/chat"):
+                    make_chunk, make_last_chunk, content_type = server._ollama_chunk, server._ollama_last_chunk, "application/x-ndjson"
+                else:
+                    self.send_error(404)
+                    return
+                if not body.get("stream", False):
+                    self._send_json(server._full_response(self.path, body))
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    for text in server._iter_chunk_texts():
+                        self._write_chunk(make_chunk(self.path, body, text))
+                    self._write_chunk(make_last_chunk(self.path, body))
+                    self.wfile.write(b"0\r\n\r\n")
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # The client cancelled the stream
+
+            def _write_chunk(self, data: bytes) -> None:
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+
+            def _send_json(self, payload: Dict[str, Any]) -> None:
+                data = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    @property
+    def expected_seconds(self) -> float:
+        """Time the stub itself takes to stream a response, the rest of a measured latency is client overhead."""
+        return self.ttft_sec + (len(self.tokens) / self.tokens_per_sec if self.tokens_per_sec else 0.0)
+
+    def _iter_chunk_texts(self) -> Any:
+        start = time.perf_counter()
+        for i in range(0, len(self.tokens), self.chunk_tokens):
+            # Deadlines are absolute, so that sleep overshoots do not add up over a long stream
+            deadline = start + self.ttft_sec + (i / self.tokens_per_sec if self.tokens_per_sec else 0.0)
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            yield "".join(self.tokens[i : i + self.chunk_tokens])
+
+    @staticmethod
+    def _openai_chunk(path: str, body: Dict[str, Any], text: str) -> bytes:
+        choice = {"index": 0, "delta": {"role": "assistant", "content": text}, "finish_reason": None}
+        return b"data: %s\n\n" % json.dumps({"id": "stub", "object": "chat.completion.chunk", "created": 0, "model": body.get("model"), "choices": [choice]}).encode()
+
+    @staticmethod
+    def _openai_last_chunk(path: str, body: Dict[str, Any]) -> bytes:
+        choice = {"index": 0, "delta": {}, "finish_reason": "stop"}
+        chunk = json.dumps({"id": "stub", "object": "chat.completion.chunk", "created": 0, "model": body.get("model"), "choices": [choice]}).encode()
+        return b"data: %s\n\ndata: [DONE]\n\n" % chunk
+
+    @staticmethod
+    def _ollama_chunk(path: str, body: Dict[str, Any], text: str) -> bytes:
+        payload: Dict[str, Any] = {"model": body.get("model"), "created_at": "2025-01-01T00:00:00Z", "done": False}
+        if path == "/api/chat":
+            payload["message"] = {"role": "assistant", "content": text}
+        else:
+            payload["response"] = text
+        return json.dumps(payload).encode() + b"\n"
+
+    def _ollama_last_chunk(self, path: str, body: Dict[str, Any]) -> bytes:
+        payload = self._ollama_chunk(path, body, "")
+        return json.dumps({**json.loads(payload), "done": True, "done_reason": "stop", "prompt_eval_count": 1, "eval_count": len(self.tokens)}).encode() + b"\n"
+
+    def _full_response(self, path: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        text = "".join(self._iter_chunk_texts())
+        if path == "/v1/chat/completions":
+            message = {"role": "assistant", "content": text}
+            usage = {"prompt_tokens": 1, "completion_tokens": len(self.tokens), "total_tokens": len(self.tokens) + 1}
+            return {"id": "stub", "object": "chat.completion", "created": 0, "model": body.get("model"), "choices": [{"index": 0, "message": message, "finish_reason": "stop"}], "usage": usage}
+        payload = json.loads(self._ollama_last_chunk(path, body))
+        if path == "/api/chat":
+            payload["message"]["content"] = text
+        else:
+            payload["response"] = text
+        return payload
+
+    def close(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from src.commit_bot.ai_models import ModelExecutor
+from src.commit_bot.http_pool import close_http_clients
+
+from .run_benchmarks import find_baseline, format_comparison, main, make_diff
+from .stub_server import StubLLMServer
+
+
+@pytest.fixture
+def stub_server():
+    server = StubLLMServer(n_tokens=12, ttft_sec=0.05, tokens_per_sec=100, chunk_tokens=3)
+    yield server
+    close_http_clients()
+    server.close()
+
+
+# fmt:off
+@pytest.mark.parametrize(
+    argnames="model_id, path, server_type",
+    argvalues=[
+        ("openai/stub", "/v1", "vllm"),
+        ("ollama/stub", "", "ollama"),
+    ],
+    ids=["openai protocol", "ollama protocol"]
+)
+# fmt:on
+def test_stub_server_streams_both_protocols(stub_server, model_id, path, server_type):
+    model = ModelExecutor(model_id, {"max_tokens": 12}, stub_server.base_url + path, server_type)
+    contents = [chunk.content for chunk in model.stream_completion([{"role": "user", "content": "diff"}]) if chunk.content]
+    assert "".join(contents) == "".join(stub_server.tokens)
+    assert len(contents) == 4  # 12 tokens, 3 per chunk
+    assert stub_server.expected_seconds == pytest.approx(0.17)
+
+
+def test_make_diff_has_requested_size():
+    diff = make_diff(10_000)
+    assert len(diff) == 10_000
+    assert diff.startswith("diff --git a/src/module_0.py")
+
+
+def test_comparison_flags_regressions():
+    runs = [{"commit": "a1", "quick": True, "results": {"x.ms": 10.0}}, {"commit": "b2", "quick": False, "results": {"x.ms": 1.0}}]
+    run = {"commit": "c3", "quick": True, "results": {"x.ms": 15.0, "y.ms": 1.0}}
+    baseline = find_baseline(runs, run)
+    assert baseline["commit"] == "a1"
+    table = format_comparison(run, baseline, threshold_pct=20)
+    assert "+50.0%" in table and "regression" in table
+    assert "regression" not in format_comparison(run, baseline, threshold_pct=60)
+
+
+def test_runs_are_stored_and_compared(tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    output = tmp_path / "results.jsonl"
+    for _ in range(2):
+        main(["--quick", "--only", "post_process", "--output", str(output)])
+    runs = [json.loads(line) for line in output.read_text().splitlines()]
+    assert len(runs) == 2
+    assert set(runs[0]["results"]) == {"post_process[10KB].ms", "stream_filter[10KB].ms"}
+    assert {"version", "commit", "dirty", "python"} <= set(runs[0])
+    assert "Compared with" in capsys.readouterr().out
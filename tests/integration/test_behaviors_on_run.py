@@ -26,12 +26,17 @@ def run_command_hook(command, extra_args=None):
         return original_run_command(command, extra_args)
 
 
+def get_staged_changes_hook(**kwargs):
+    print("--- Mocking get_staged_changes ---")
+    return "## fake diff from mock"
+
+
 def create_input_hook(inputs):
     """
     Creates a side_effect function for mocking builtins.input that can handle a 'sleep' command.
     """
     input_iterator = iter(inputs)
-    idle_min = load_config("job.conf").get("server_idle_timeout_minutes")
+    idle_grace_sec = load_config("job.conf").get("server_idle_grace_seconds")
 
     def input_hook(*args, **kwargs):
         while True:
@@ -39,7 +44,7 @@ def create_input_hook(inputs):
                 next_input = next(input_iterator)
                 if next_input == "sleep":
                     print("Sleeping for test...")
-                    time.sleep((idle_min + 1) * 60)
+                    time.sleep(idle_grace_sec + 10)
                     # Continue to next input after sleeping
                 else:
                     return next_input
@@ -120,8 +125,10 @@ def test_conditional_patch(capsys, user_inputs, expected_keywords):
     Tests that run_command is only mocked for a specific argument.
     """
     input_hook = create_input_hook(user_inputs)
-    with patch("builtins.input", side_effect=input_hook), patch("src.commit_bot.main.run_command", side_effect=run_command_hook) as mock_run_command:
-        run()
+    with patch("builtins.input", side_effect=input_hook), patch("src.commit_bot.main.run_command", side_effect=run_command_hook) as mock_run_command, patch(
+        "src.commit_bot.main.get_staged_changes", side_effect=get_staged_changes_hook
+    ):
+        run(["--no-cache"])
     captured = capsys.readouterr()
     # DEBUGGING: Print the captured output explicitly
     print("\n--- Captured Output ---")
@@ -0,0 +1,218 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.commit_bot.ai_models import NO_THINK_SWITCH, ModelExecutor
+from src.commit_bot.http_pool import close_http_clients
+
+from ...benchmark.stub_server import StubLLMServer
+
+
+class StubOpenAIServer:
+    """
+    Stub of the OpenAI-compatible streaming endpoint of vllm, sending one word per chunk every `delay_sec`.
+    The `reasoning` words are sent first as `reasoning_content`, unless the request turns thinking off.
+    """
+
+    def __init__(self, words, delay_sec=0.0, reasoning=()):
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                server.requests.append(body)
+                thinking = body.get("chat_template_kwargs", {}).get("enable_thinking", True)
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                chunks = [{"reasoning_content": word} for word in (reasoning if thinking else [])] + [{"content": word} for word in words] + [{}]
+                try:
+                    for delta in chunks:
+                        time.sleep(delay_sec)
+                        choice = {"index": 0, "delta": delta, "finish_reason": None if delta else "stop"}
+                        self._write_event(json.dumps({"id": "1", "object": "chat.completion.chunk", "created": 0, "model": body["model"], "choices": [choice]}))
+                    self._write_event("[DONE]")
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # The client cancelled the stream
+
+            def _write_event(self, data):
+                event = f"data: {data}\n\n".encode()
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(event), event))
+                self.wfile.flush()
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.api_base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}/v1"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def make_model():
+    servers = []
+
+    def factory(words, delay_sec=0.0, reasoning=(), model_id="openai/qwen3:4b", gen_conf=None, **kwargs):
+        server = StubOpenAIServer(words, delay_sec, reasoning)
+        servers.append(server)
+        return ModelExecutor(model_id, {"max_tokens": 16, **(gen_conf or {})}, server.api_base_url, "vllm", **kwargs), server
+
+    yield factory
+    close_http_clients()
+    for server in servers:
+        server.close()
+
+
+MESSAGES = [{"role": "user", "content": "diff"}]
+
+
+def test_astream_completion_runs_concurrent_streams(make_model):
+    model, _ = make_model(["feat: ", "add x"], delay_sec=0.2)
+
+    async def generate():
+        return "".join([chunk.content async for chunk in model.astream_completion(MESSAGES)])
+
+    async def main():
+        await generate()  # Keep the one-off setup of litellm out of the timing
+        start = time.monotonic()
+        results = await asyncio.gather(*(generate() for _ in range(3)))
+        return results, time.monotonic() - start
+
+    results, elapsed = asyncio.run(main())
+    assert results == ["feat: add x"] * 3
+    # Three streams of 3 chunks of 0.2s overlap instead of taking 1.8s in a row
+    assert elapsed < 1.2
+
+
+def test_astream_completion_times_out_between_chunks(make_model):
+    model, _ = make_model(["feat: ", "add x"], delay_sec=1.0)
+
+    async def main():
+        async for _ in model.astream_completion(MESSAGES, chunk_timeout_sec=0.2):
+            pass
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(main())
+
+
+def test_cancelled_astream_completion_stops_reading(make_model):
+    model, _ = make_model([f"word {i} " for i in range(50)], delay_sec=0.05)
+
+    async def consume(chunks):
+        async for chunk in model.astream_completion(MESSAGES):
+            chunks.append(chunk.content)
+
+    async def main():
+        chunks = []
+        task = asyncio.create_task(consume(chunks))
+        await asyncio.sleep(0.5)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return chunks
+
+    chunks = asyncio.run(main())
+    assert 0 < len(chunks) < 50
+
+
+def test_sync_stream_completion_wraps_the_async_stream(make_model):
+    model, _ = make_model(["feat: ", "add x"])
+    assert "".join(chunk.content for chunk in model.stream_completion(MESSAGES)) == "feat: add x"
+
+
+def test_reasoning_budget_cuts_over_to_answering(make_model):
+    model, server = make_model(["feat: ", "add x"], reasoning=[f"step {i} " for i in range(20)], max_reasoning_tokens=5)
+    chunks = list(model.stream_completion(MESSAGES))
+    assert "".join(chunk.content for chunk in chunks) == "feat: add x"
+    assert [chunk.response_metadata.get("reasoning_budget_reached", False) for chunk in chunks].count(True) == 1
+    # 3 chunks of 7 characters are about 6 tokens
+    assert "step 2" in "".join(chunk.reasoning for chunk in chunks) and "step 3" not in "".join(chunk.reasoning for chunk in chunks)
+    # The answer is requested with thinking turned off, from the reasoning cut off so far
+    assert len(server.requests) == 2
+    assert server.requests[1]["chat_template_kwargs"] == {"enable_thinking": False}
+    assert "step 2" in server.requests[1]["messages"][-1]["content"]
+
+
+def test_abandoned_answer_after_the_reasoning_budget_is_closed(make_model, monkeypatch):
+    model, _ = make_model([f"word {i} " for i in range(50)], reasoning=[f"step {i} " for i in range(20)], max_reasoning_tokens=5)
+    closed = []
+
+    async def record_close(response):
+        closed.append(response)
+
+    monkeypatch.setattr("src.commit_bot.ai_models.close_litellm_stream", record_close)
+
+    async def main():
+        stream = model.astream_completion(MESSAGES)
+        async for chunk in stream:
+            if chunk.content:
+                break
+        n_closed = len(closed)
+        await stream.aclose()
+        return n_closed, len(closed)
+
+    # The reasoning stream is closed at the cut-over, the answer stream as soon as the caller stops reading
+    assert asyncio.run(main()) == (1, 2)
+
+
+def test_reasoning_budget_counts_tokens_not_chunks(make_model):
+    model, server = make_model(["feat: ", "add x"], reasoning=["a", "b", "c", "d", "e", "f", "g"], max_reasoning_tokens=5)
+    chunks = list(model.stream_completion(MESSAGES))
+    # 7 one-character chunks are about 2 tokens, within the budget
+    assert "abcdefg" in "".join(chunk.reasoning for chunk in chunks)
+    assert len(server.requests) == 1
+
+
+def test_reasoning_effort_is_sent_to_vllm_in_the_request_body(make_model):
+    model, server = make_model(["feat: ", "add x"], reasoning=[f"step {i} " for i in range(20)], model_id="openai/gpt-oss:20b", gen_conf={"reasoning_effort": "medium"}, max_reasoning_tokens=5)
+    assert "".join(chunk.content for chunk in model.stream_completion(MESSAGES)) == "feat: add x"
+    assert server.requests[0]["reasoning_effort"] == "medium"
+    # The answer after the reasoning budget is requested with the lowest effort
+    assert server.requests[1]["reasoning_effort"] == "low"
+
+
+def test_reasoning_effort_is_sent_to_ollama_as_the_think_level():
+    server = StubLLMServer(n_tokens=4)
+    try:
+        model = ModelExecutor("ollama/gpt-oss:20b", {"max_tokens": 16, "reasoning_effort": "low"}, server.base_url, "ollama")
+        assert "".join(chunk.content for chunk in model.stream_completion(MESSAGES)) == "".join(server.tokens)
+        assert server.requests[0]["think"] == "low"
+    finally:
+        close_http_clients()
+        server.close()
+
+
+def test_reasoning_within_budget_is_a_single_request(make_model):
+    model, server = make_model(["feat: ", "add x"], reasoning=["step 1 ", "step 2 "], max_reasoning_tokens=5)
+    chunks = list(model.stream_completion(MESSAGES))
+    assert "".join(chunk.content for chunk in chunks) == "feat: add x"
+    assert len(server.requests) == 1
+    assert not any(chunk.response_metadata.get("reasoning_budget_reached") for chunk in chunks)
+
+
+def test_thinking_off_skips_reasoning(make_model):
+    model, server = make_model(["feat: ", "add x"], reasoning=["step 1 "], thinking=False)
+    chunks = list(model.stream_completion(MESSAGES))
+    assert "".join(chunk.reasoning for chunk in chunks) == ""
+    assert server.requests[0]["chat_template_kwargs"] == {"enable_thinking": False}
+
+
+def test_thinking_off_for_ollama_uses_the_soft_switch():
+    model = ModelExecutor("ollama/qwen3:4b", {}, "http://ollama:11434", "ollama", thinking=False)
+    messages, params = model._apply_thinking(MESSAGES, {"reasoning_effort": "low", "max_tokens": 16}, thinking=False)
+    assert messages[-1]["content"] == "diff" + NO_THINK_SWITCH
+    assert params == {"max_tokens": 16}
+    assert MESSAGES[-1]["content"] == "diff"
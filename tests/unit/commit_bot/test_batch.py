@@ -0,0 +1,94 @@
+import asyncio
+import json
+import subprocess
+import time
+
+import pytest
+
+from src.commit_bot.batch import generate_batch, list_batch_items, load_done_ids
+
+
+class FakeAsyncModel:
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+        self.n_in_flight = 0
+        self.max_in_flight = 0
+
+    async def aprepare(self):
+        pass
+
+    async def acomplete(self, messages, **gen_overrides):
+        self.n_in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.n_in_flight)
+        await asyncio.sleep(0.05)
+        self.n_in_flight -= 1
+        user_content = messages[-1]["content"]
+        if self.fail_on and self.fail_on in user_content:
+            raise RuntimeError("server error")
+        file_name = user_content.split("+++ b/")[1].split("\n")[0]
+        return f"feat: add {file_name}"
+
+
+def git(repo, *args):
+    return subprocess.run(["git", "-C", str(repo), *args], capture_output=True, text=True, check=True).stdout
+
+
+@pytest.fixture
+def repo(tmp_path):
+    git(tmp_path, "init", "-q")
+    git(tmp_path, "config", "user.email", "dev@example.com")
+    git(tmp_path, "config", "user.name", "dev")
+    for i in range(6):
+        (tmp_path / f"file_{i}.txt").write_text(f"content {i}\n")
+        git(tmp_path, "add", f"file_{i}.txt")
+        git(tmp_path, "commit", "-q", "-m", f"wip {i}")
+    return tmp_path
+
+
+def read_records(output_path):
+    with open(output_path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_list_batch_items_of_a_range_and_of_staged_changes(repo):
+    items = list_batch_items([str(repo)], "HEAD~3..HEAD")
+    assert [item.subject for item in items] == ["wip 3", "wip 4", "wip 5"]
+
+    assert list_batch_items([str(repo)], None) == []
+    (repo / "new.txt").write_text("new\n")
+    git(repo, "add", "new.txt")
+    [staged_item] = list_batch_items([str(repo)], None)
+    assert staged_item.commit.startswith("staged:")
+
+
+def test_generate_batch_bounds_concurrency_and_resumes(repo, tmp_path):
+    output_path = str(tmp_path / "out.jsonl")
+    items = list_batch_items([str(repo)], "HEAD")
+    model = FakeAsyncModel(fail_on="file_2.txt")
+
+    stats = asyncio.run(generate_batch(model, "fake", items, output_path, max_in_flight=2))
+    assert (stats["generated"], stats["failed"]) == (5, 1)
+    assert model.max_in_flight == 2
+    records = {record["subject"]: record for record in read_records(output_path)}
+    assert records["wip 0"]["message"] == "feat: add file_0.txt"
+    assert "server error" in records["wip 2"]["error"]
+
+    # The resumed run only retries the failed item
+    done_ids = load_done_ids(output_path)
+    pending = [item for item in items if item.item_id not in done_ids]
+    assert [item.subject for item in pending] == ["wip 2"]
+    stats = asyncio.run(generate_batch(FakeAsyncModel(), "fake", pending, output_path, max_in_flight=2))
+    assert (stats["generated"], stats["failed"]) == (1, 0)
+    assert len(load_done_ids(output_path)) == 6
+
+
+def test_diff_compaction_does_not_block_the_other_items(repo, tmp_path, monkeypatch):
+    def slow_compaction(diff, model_spec):
+        time.sleep(0.3)  # Like a tokenizer encoding a large diff
+        return diff
+
+    monkeypatch.setattr("src.commit_bot.batch.compact_staged_changes", slow_compaction)
+    items = list_batch_items([str(repo)], "HEAD~4..HEAD")
+    stats = asyncio.run(generate_batch(FakeAsyncModel(), "fake", items, str(tmp_path / "out.jsonl"), max_in_flight=4))
+    assert stats["generated"] == 4
+    assert stats["seconds"] < 0.9  # 1.2 seconds when the items are compacted one after the other
@@ -0,0 +1,58 @@
+import os
+import time
+
+import pytest
+
+from src.commit_bot.cache import CommitMessageCache, make_cache_key
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return CommitMessageCache(tmp_path / "messages", max_entries=3, max_bytes=1024 * 1024, max_age_sec=3600)
+
+
+def test_make_cache_key_ignores_non_semantic_gen_configs():
+    key1 = make_cache_key("diff", "ollama-qwen3:4b", "sys", {"temperature": 0.1, "api_base": "http://a"})
+    key2 = make_cache_key("diff", "ollama-qwen3:4b", "sys", {"temperature": 0.1, "api_base": "http://b", "stream": True})
+    assert key1 == key2
+
+
+# fmt:off
+@pytest.mark.parametrize(
+    argnames="other_args",
+    argvalues=[
+        ("other diff", "ollama-qwen3:4b", "sys", {"temperature": 0.1}),
+        ("diff", "vllm-qwen3:4b", "sys", {"temperature": 0.1}),
+        ("diff", "ollama-qwen3:4b", "other sys", {"temperature": 0.1}),
+        ("diff", "ollama-qwen3:4b", "sys", {"temperature": 0.5}),
+    ],
+    ids=["diff", "model", "prompt", "gen_conf"]
+)
+# fmt:on
+def test_make_cache_key_changes_with_inputs(other_args):
+    assert make_cache_key("diff", "ollama-qwen3:4b", "sys", {"temperature": 0.1}) != make_cache_key(*other_args)
+
+
+def test_cache_roundtrip(cache):
+    assert cache.get("k1") is None
+    cache.put("k1", "feat(api): add endpoint")
+    assert cache.get("k1") == "feat(api): add endpoint"
+
+
+def test_cache_evicts_least_recently_used(cache):
+    for i, key in enumerate(["k1", "k2", "k3"]):
+        cache.put(key, f"message {i}")
+        os.utime(cache.cache_dir / f"{key}.json", (time.time() - 100 + i, time.time() - 100 + i))
+    cache.get("k1")  # k1 becomes the most recently used entry
+    cache.put("k4", "message 3")
+    assert cache.get("k2") is None
+    assert cache.get("k1") == "message 0"
+    assert cache.get("k4") == "message 3"
+
+
+def test_cache_expires_old_entries(cache):
+    cache.put("k1", "message")
+    old = time.time() - cache.max_age_sec - 1
+    os.utime(cache.cache_dir / "k1.json", (old, old))
+    assert cache.get("k1") is None
+    assert not (cache.cache_dir / "k1.json").exists()
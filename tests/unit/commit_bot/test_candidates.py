@@ -0,0 +1,101 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import pytest
+
+from src.commit_bot.ai_models import ChunkWrapper, ModelExecutor
+from src.commit_bot.candidates import collect_candidates, pick_candidate
+from src.commit_bot.http_pool import close_http_clients
+
+
+class FakeModel:
+    def __init__(self, supports_n):
+        self.supports_n = supports_n
+        self.n_requests = 0
+
+    def prepare(self):
+        pass
+
+    def stream_completion(self, messages, **gen_overrides):
+        self.n_requests += 1
+        index = self.n_requests
+        for word in ["fix(api): ", f"candidate {index}"]:
+            yield ChunkWrapper(word, "")
+
+    def stream_choices(self, messages, n, **gen_overrides):
+        self.n_requests += 1
+        for index in range(n):
+            yield index, ChunkWrapper("fix(api): ", "")
+        for index in range(n):
+            yield index, ChunkWrapper(f"candidate {index + 1}", "", response_metadata={"finish_reason": "stop"})
+
+
+@pytest.mark.parametrize(argnames="supports_n, expected_requests", argvalues=[(True, 1), (False, 3)], ids=["n parameter", "concurrent requests"])
+def test_collect_candidates(supports_n, expected_requests):
+    model = FakeModel(supports_n)
+    candidates = collect_candidates(model, [{"role": "user", "content": "diff"}], 3)
+    assert sorted(candidates) == ["fix(api): candidate 1", "fix(api): candidate 2", "fix(api): candidate 3"]
+    assert model.n_requests == expected_requests
+
+
+class MultiChoiceHandler(BaseHTTPRequestHandler):
+    """OpenAI-compatible stream of `n` choices, choice i sending i + 2 words: the first choice finishes first."""
+
+    protocol_version = "HTTP/1.1"
+    requests = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.requests.append(body)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        n = body.get("n", 1)
+        for step in range(n + 2):
+            for index in range(n):
+                if step < index + 2:
+                    delta, finish_reason = {"content": f"c{index}t{step} "}, None
+                elif step == index + 2:
+                    delta, finish_reason = {}, "stop"
+                else:
+                    continue
+                choice = {"index": index, "delta": delta, "finish_reason": finish_reason}
+                self._write_event(json.dumps({"id": "1", "object": "chat.completion.chunk", "created": 0, "model": body["model"], "choices": [choice]}))
+            time.sleep(0.01)
+        self._write_event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_event(self, data):
+        event = f"data: {data}\n\n".encode()
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(event), event))
+        self.wfile.flush()
+
+    def log_message(self, *args):
+        pass
+
+
+def test_collect_candidates_reads_every_choice_of_the_n_stream(monkeypatch):
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), MultiChoiceHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    monkeypatch.setattr(ModelExecutor, "prepare", lambda self: None)  # No server to start
+    try:
+        model = ModelExecutor("openai/qwen3:4b", {"max_tokens": 16, "top_k": 40}, f"http://127.0.0.1:{httpd.server_address[1]}/v1", "vllm")
+        candidates = collect_candidates(model, [{"role": "user", "content": "diff"}], 3)
+        # The stream goes on after the first choice finishes
+        assert candidates == ["c0t0 c0t1", "c1t0 c1t1 c1t2", "c2t0 c2t1 c2t2 c2t3"]
+        [request] = MultiChoiceHandler.requests
+        assert (request["n"], request["model"], request["top_k"]) == (3, "qwen3:4b", 40)
+    finally:
+        close_http_clients()
+        httpd.shutdown()
+        httpd.server_close()
+
+
+@pytest.mark.parametrize(argnames="answers, expected", argvalues=[([""], "a"), (["2"], "b"), (["9", "x", "3"], "c")], ids=["default", "pick", "retry invalid"])
+def test_pick_candidate(answers, expected):
+    with patch("builtins.input", side_effect=answers):
+        assert pick_candidate(["a", "b", "c"]) == expected
@@ -0,0 +1,62 @@
+import os
+import tempfile
+import threading
+
+import pytest
+
+from src.commit_bot.ai_models import ChunkWrapper
+from src.commit_bot.client import RemoteModelExecutor, connect_daemon
+from src.commit_bot.daemon import DaemonServer
+
+
+class FakeModel:
+    gen_conf = {"temperature": 0.1}
+    server_type = "ollama"
+
+    def __init__(self):
+        self.n_prepared = 0
+
+    def prepare(self):
+        self.n_prepared += 1
+
+    def complete(self, messages, **gen_overrides):
+        return f"summary of {messages[-1]['content']}"
+
+    def stream_completion(self, messages, **gen_overrides):
+        for word in ["feat(api): ", "add ", f"t={gen_overrides.get('temperature')}"]:
+            yield ChunkWrapper(word, "")
+
+
+@pytest.fixture
+def daemon():
+    model = FakeModel()
+    socket_path = os.path.join(tempfile.mkdtemp(prefix="cb-"), "daemon.sock")
+    server = DaemonServer(socket_path, get_model=lambda model_spec: model if model_spec == "fake" else None)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield socket_path, model
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def test_connect_daemon_returns_none_without_daemon(tmp_path):
+    assert connect_daemon(str(tmp_path / "missing.sock")) is None
+
+
+def test_remote_model_streams_through_daemon(daemon):
+    socket_path, model = daemon
+    remote_model = RemoteModelExecutor("fake", connect_daemon(socket_path))
+    chunks = list(remote_model.stream([{"role": "user", "content": "diff"}], temperature=0.5))
+    assert "".join(c.content for c in chunks) == "feat(api): add t=0.5"
+    assert model.n_prepared == 1
+    assert remote_model.gen_conf == {"temperature": 0.1}
+    assert remote_model.server_type == "ollama"
+    assert remote_model.complete([{"role": "user", "content": "diff"}]) == "summary of diff"
+
+
+def test_remote_model_raises_daemon_errors(daemon):
+    socket_path, _ = daemon
+    remote_model = RemoteModelExecutor("unknown", connect_daemon(socket_path))
+    with pytest.raises(RuntimeError, match="not available"):
+        list(remote_model.stream([{"role": "user", "content": "diff"}]))
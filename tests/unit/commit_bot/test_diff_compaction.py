@@ -0,0 +1,58 @@
+import pytest
+
+from src.commit_bot.diff_compaction import LOCKFILE_PRIORITY, SOURCE_PRIORITY, TEST_PRIORITY, classify_path, compact_diff, parse_diff
+
+
+def make_file_diff(path, added_lines, removed_lines=0, hunks=1):
+    lines = [f"diff --git a/{path} b/{path}", f"--- a/{path}", f"+++ b/{path}"]
+    for _ in range(hunks):
+        lines.append(f"@@ -1,{removed_lines} +1,{added_lines} @@")
+        lines.extend(f"-old line {i} of {path}" for i in range(removed_lines))
+        lines.extend(f"+new line {i} of {path}" for i in range(added_lines))
+    return "\n".join(lines)
+
+
+# fmt:off
+@pytest.mark.parametrize(
+    argnames="path, expected",
+    argvalues=[
+        ("src/commit_bot/main.py", SOURCE_PRIORITY),
+        ("tests/unit/test_main.py", TEST_PRIORITY),
+        ("README.md", TEST_PRIORITY),
+        ("poetry.lock", LOCKFILE_PRIORITY),
+        ("web/package-lock.json", LOCKFILE_PRIORITY),
+        ("static/app.min.js", LOCKFILE_PRIORITY),
+    ],
+    ids=["source", "test", "docs", "lockfile", "npm lockfile", "minified"]
+)
+# fmt:on
+def test_classify_path(path, expected):
+    assert classify_path(path) == expected
+
+
+def test_parse_diff_counts_changes():
+    files = parse_diff(make_file_diff("a.py", added_lines=3, removed_lines=2, hunks=2))
+    assert len(files) == 1
+    assert files[0].path == "a.py"
+    assert len(files[0].hunks) == 2
+    assert (files[0].additions, files[0].deletions) == (6, 4)
+
+
+def test_compact_diff_keeps_small_diff_untouched():
+    diff = make_file_diff("a.py", added_lines=3)
+    assert compact_diff(diff, token_budget=10_000) is diff
+
+
+def test_compact_diff_prefers_source_over_lockfiles():
+    diff = "\n".join([make_file_diff("poetry.lock", added_lines=200), make_file_diff("tests/test_a.py", added_lines=20), make_file_diff("src/a.py", added_lines=20)])
+    compacted = compact_diff(diff, token_budget=400)
+    assert "+new line 0 of src/a.py" in compacted
+    assert "+new line 0 of poetry.lock" not in compacted
+    assert " poetry.lock | +200 -0 (omitted)" in compacted
+
+
+def test_compact_diff_prefers_additions_over_pure_deletions():
+    diff = "\n".join([make_file_diff("src/removed.py", added_lines=0, removed_lines=20), make_file_diff("src/added.py", added_lines=20)])
+    compacted = compact_diff(diff, token_budget=250)
+    assert "+new line 0 of src/added.py" in compacted
+    assert " src/removed.py | +0 -20 (omitted)" in compacted
@@ -0,0 +1,75 @@
+import subprocess
+
+import pytest
+
+from src.commit_bot.diff_compaction import compact_diff
+from src.commit_bot.diff_filter import load_exclude_patterns, read_filtered_diff, to_pathspec
+
+
+def git(repo, *args):
+    return subprocess.run(["git", "-C", str(repo), *args], capture_output=True, text=True, check=True).stdout
+
+
+@pytest.fixture
+def repo(tmp_path):
+    git(tmp_path, "init", "-q")
+    git(tmp_path, "config", "user.email", "bot@example.com")
+    git(tmp_path, "config", "user.name", "bot")
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src/app.py").write_text("".join(f"value_{i} = {i}\n" for i in range(20)))
+    git(tmp_path, "add", "-A")
+    git(tmp_path, "commit", "-q", "-m", "init")
+    return tmp_path
+
+
+# fmt:off
+@pytest.mark.parametrize(
+    argnames="pattern, expected",
+    argvalues=[
+        ("*.lock", ":(top,exclude,glob)**/*.lock"),
+        ("vendor/", ":(top,exclude,glob)**/vendor/**"),
+        ("/build/out.js", ":(top,exclude,glob)build/out.js"),
+        ("gen/*_pb2.py", ":(top,exclude,glob)gen/*_pb2.py"),
+    ],
+    ids=["file name", "directory", "anchored", "path"]
+)
+# fmt:on
+def test_to_pathspec(pattern, expected):
+    assert to_pathspec(pattern) == expected
+
+
+def test_ignore_file_adds_and_turns_off_patterns(repo):
+    (repo / ".commitbotignore").write_text("# Generated code\ngenerated/\n!*.lock\n")
+    patterns = load_exclude_patterns(str(repo))
+    assert "generated/" in patterns
+    assert "*.lock" not in patterns
+    assert "package-lock.json" in patterns
+
+
+def test_excluded_files_are_listed_instead_of_diffed(repo, monkeypatch):
+    (repo / "src/app.py").write_text("".join(f"value_{i} = {i * 2 if i == 10 else i}\n" for i in range(20)))
+    (repo / "package-lock.json").write_text('{"lockfileVersion": 3}\n' * 100)
+    (repo / "vendor/lib").mkdir(parents=True)
+    (repo / "vendor/lib/util.js").write_text("module.exports = {};\n")
+    (repo / "generated").mkdir()
+    (repo / "generated/api.py").write_text("API = 1\n")
+    (repo / ".commitbotignore").write_text("generated/\n")
+    git(repo, "add", "-A")
+    monkeypatch.chdir(repo / "src")  # Pathspecs are relative to the top of the repository
+
+    diff = read_filtered_diff(["git", "diff", "--cached"]).text
+    assert "lockfileVersion" not in diff and "module.exports" not in diff and "API = 1" not in diff
+    assert "# 3 file(s) were excluded" in diff
+    assert " package-lock.json | added (excluded)" in diff
+    assert " vendor/lib/util.js | added (excluded)" in diff
+    # One line of context around the change
+    assert "+value_10 = 20" in diff and "\n value_9 = 9\n" in diff and "\n value_8 = 8\n" not in diff
+    # The list of excluded files survives compaction
+    assert compact_diff(diff, 60).startswith("# 3 file(s) were excluded")
+
+
+def test_whitespace_only_changes_fall_back_to_the_plain_diff(repo, monkeypatch):
+    (repo / "src/app.py").write_text("".join(f"value_{i}  =  {i}\n" for i in range(20)))
+    git(repo, "add", "-A")
+    monkeypatch.chdir(repo)
+    assert "+value_0  =  0" in read_filtered_diff(["git", "diff", "--cached"]).text
@@ -0,0 +1,40 @@
+import subprocess
+import sys
+
+import pytest
+
+from src.commit_bot.git_diff import read_bounded_output
+
+
+def print_lines_command(n_lines):
+    return [sys.executable, "-c", f"for i in range({n_lines}): print(f'line {{i:06d}}')"]
+
+
+def test_read_bounded_output_reads_everything_within_limits():
+    res = read_bounded_output(print_lines_command(1000), max_bytes=1024 * 1024, max_lines=10_000)
+    assert res.truncated is False
+    assert res.lines_read == 1000
+    assert res.text.splitlines()[-1] == "line 000999"
+
+
+# fmt:off
+@pytest.mark.parametrize(
+    argnames="max_bytes, max_lines, expected_lines",
+    argvalues=[
+        (1024 * 1024, 100, 100),
+        (12 * 50, 10_000, 50),
+    ],
+    ids=["line limit", "byte limit"]
+)
+# fmt:on
+def test_read_bounded_output_cuts_off_early(max_bytes, max_lines, expected_lines):
+    res = read_bounded_output(print_lines_command(1_000_000), max_bytes=max_bytes, max_lines=max_lines)
+    assert res.truncated is True
+    assert res.lines_read == expected_lines
+    assert res.text.splitlines() == [f"line {i:06d}" for i in range(expected_lines)]
+
+
+def test_read_bounded_output_raises_on_failure():
+    with pytest.raises(subprocess.CalledProcessError) as exc_info:
+        read_bounded_output(["git", "invalid-command"], max_bytes=1024, max_lines=10)
+    assert "invalid-command" in exc_info.value.stderr
@@ -0,0 +1,99 @@
+import time
+
+import pytest
+
+from src.commit_bot.ai_models import AIModels, ModelExecutor
+from src.commit_bot.hedging import FALLBACK, PRIMARY, HedgeOutcome, stream_hedged
+from src.commit_bot.http_pool import close_http_clients
+from src.commit_bot.telemetry import format_stats_table, summarize_records
+
+from ...benchmark.stub_server import StubLLMServer
+
+MESSAGES = [{"role": "user", "content": "diff"}]
+
+
+@pytest.fixture
+def make_server():
+    servers = []
+
+    def factory(ttft_sec):
+        server = StubLLMServer(n_tokens=8, ttft_sec=ttft_sec, chunk_tokens=2)
+        servers.append(server)
+        return server
+
+    yield factory
+    close_http_clients()
+    for server in servers:
+        server.close()
+
+
+def make_model(base_url, name):
+    # The openai server type has no server lifecycle, `prepare()` returns right away
+    return ModelExecutor(f"openai/{name}", {"max_tokens": 8, "api_key": "stub"}, base_url + "/v1", "openai")
+
+
+def run_hedged(primary, fallback, deadline_sec):
+    outcome = HedgeOutcome()
+    start = time.perf_counter()
+    text = "".join(chunk.content for chunk in stream_hedged(primary, fallback, MESSAGES, deadline_sec, outcome))
+    return text, outcome, time.perf_counter() - start
+
+
+def test_fast_primary_is_not_hedged(make_server):
+    primary_server, fallback_server = make_server(0.0), make_server(0.0)
+    text, outcome, _ = run_hedged(make_model(primary_server.base_url, "primary"), make_model(fallback_server.base_url, "fallback"), 1.0)
+    assert text == "".join(primary_server.tokens)
+    assert (outcome.hedged, outcome.winner, outcome.winner_model) == (False, PRIMARY, "openai/primary")
+    assert fallback_server.requests == []
+
+
+def test_slow_primary_loses_to_the_fallback(make_server):
+    primary_server, fallback_server = make_server(3.0), make_server(0.0)
+    text, outcome, elapsed = run_hedged(make_model(primary_server.base_url, "primary"), make_model(fallback_server.base_url, "fallback"), 0.2)
+    assert text == "".join(fallback_server.tokens)
+    assert (outcome.hedged, outcome.winner, outcome.winner_model) == (True, FALLBACK, "openai/fallback")
+    assert len(primary_server.requests) == 1 and len(fallback_server.requests) == 1
+    # The primary request is cancelled instead of being waited for
+    assert elapsed < 2.0
+
+
+def test_primary_can_still_win_after_hedging(make_server):
+    primary_server, fallback_server = make_server(0.4), make_server(3.0)
+    text, outcome, elapsed = run_hedged(make_model(primary_server.base_url, "primary"), make_model(fallback_server.base_url, "fallback"), 0.1)
+    assert text == "".join(primary_server.tokens)
+    assert (outcome.hedged, outcome.winner) == (True, PRIMARY)
+    assert len(fallback_server.requests) == 1
+    assert elapsed < 2.0
+
+
+def test_failing_primary_falls_back_before_the_deadline(make_server):
+    primary_server, fallback_server = make_server(0.0), make_server(0.0)
+    primary_server.close()  # Connections are refused
+    text, outcome, elapsed = run_hedged(make_model(primary_server.base_url, "primary"), make_model(fallback_server.base_url, "fallback"), 5.0)
+    assert text == "".join(fallback_server.tokens)
+    assert (outcome.hedged, outcome.winner) == (True, FALLBACK)
+    assert PRIMARY in outcome.errors
+    assert elapsed < 4.0
+
+
+def test_ai_models_hedges_only_when_enabled(monkeypatch):
+    models = AIModels()
+    monkeypatch.setattr(models, "_hedging_conf", {"enabled": False, "fallback_model": "ollama-qwen3:4b"})
+    assert models.get_hedging("vllm-qwen3:4b") is None
+    monkeypatch.setattr(models, "_hedging_conf", {"enabled": True, "fallback_model": "ollama-qwen3:4b", "first_token_deadline_seconds": 3})
+    assert models.get_hedging("vllm-qwen3:4b") == ("ollama-qwen3:4b", 3.0)
+    # A model is never hedged by itself, nor by an unknown model
+    assert models.get_hedging("ollama-qwen3:4b") is None
+    monkeypatch.setattr(models, "_hedging_conf", {"enabled": True, "fallback_model": "unknown"})
+    assert models.get_hedging("vllm-qwen3:4b") is None
+
+
+def test_stats_count_hedged_runs_and_fallback_wins():
+    records = [{"model": "vllm-qwen3:4b", "backend": "vllm", "ttft_seconds": 0.1}]
+    records += [{"model": "vllm-qwen3:4b", "backend": "vllm", "ttft_seconds": 5.5, "hedged": True, "hedge_winner": winner} for winner in [FALLBACK, FALLBACK]]
+    records += [{"model": "vllm-qwen3:4b", "backend": "vllm", "ttft_seconds": 5.2, "hedged": True, "hedge_winner": PRIMARY}]
+    rows = summarize_records(records)
+    assert (rows[0]["runs"], rows[0]["hedged"], rows[0]["fallback_won"]) == (4, 3, 2)
+    # The runs answered by the fallback model are left out of the latency of the model
+    assert max(rows[0]["ttft_seconds"]) <= 5.2
+    assert "fallback won" in format_stats_table(rows).splitlines()[0]
@@ -0,0 +1,149 @@
+import threading
+import time
+
+import pytest
+
+from src.commit_bot.hf_local import BatchTextStreamer, HFLocalExecutor, HFModelCache, load_hf_model
+
+MESSAGES = [{"role": "user", "content": "diff --git a/app.py b/app.py"}]
+
+
+class FakeTensor:
+    def __init__(self, values):
+        self.values = values
+
+    def reshape(self, *shape):
+        return self
+
+    def tolist(self):
+        return self.values
+
+
+class FakeTokenizer:
+    """Decodes token ids 0-25 to letters, and 99 to half of a multi-byte character when it ends the sequence."""
+
+    def decode(self, token_ids, skip_special_tokens=True):
+        text = "".join("é" if token_id == 99 else chr(ord("a") + token_id) for token_id in token_ids)
+        return text[:-1] + "�" if token_ids and token_ids[-1] == 99 else text
+
+
+def make_loader(name, loads):
+    def loader():
+        loads.append(name)
+        return f"model-{name}", f"tokenizer-{name}"
+
+    return loader
+
+
+def test_model_cache_loads_each_model_once():
+    loads = []
+    cache = HFModelCache(memory_budget_bytes=10, measure=lambda model: 4)
+    assert cache.get("a", make_loader("a", loads)) == ("model-a", "tokenizer-a")
+    assert cache.get("a", make_loader("a", loads)) == ("model-a", "tokenizer-a")
+    assert loads == ["a"]
+    assert cache.stats == {"hits": 1, "loads": 1, "evictions": 0}
+
+
+def test_model_cache_evicts_least_recently_used_model():
+    loads = []
+    cache = HFModelCache(memory_budget_bytes=10, measure=lambda model: 4)
+    cache.get("a", make_loader("a", loads))
+    cache.get("b", make_loader("b", loads))
+    cache.get("a", make_loader("a", loads))
+    cache.get("c", make_loader("c", loads))
+    assert cache.keys() == ["a", "c"]
+    assert cache.used_bytes == 8
+    assert cache.stats["evictions"] == 1
+
+
+def test_model_cache_loads_once_under_concurrent_gets():
+    loads = []
+
+    def slow_loader():
+        time.sleep(0.2)
+        return make_loader("a", loads)()
+
+    cache = HFModelCache(memory_budget_bytes=10, measure=lambda model: 4)
+    threads = [threading.Thread(target=cache.get, args=("a", slow_loader)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert loads == ["a"]
+    assert cache.stats["hits"] == 3
+
+
+def test_batch_text_streamer_yields_deltas_per_sequence():
+    deltas, ended = [], []
+    streamer = BatchTextStreamer(FakeTokenizer(), 2, on_text=lambda index, text: deltas.append((index, text)), on_end=lambda: ended.append(True))
+    streamer.put(FakeTensor([7, 7, 7]))  # Prompt, skipped
+    streamer.put(FakeTensor([0, 1]))
+    streamer.put(FakeTensor([99, 2]))
+    streamer.put(FakeTensor([3, 3]))
+    streamer.end()
+    # The incomplete character of the first sequence is held back until the next token completes it
+    assert deltas == [(0, "a"), (1, "b"), (1, "c"), (0, "éd"), (1, "d")]
+    assert ended == [True]
+
+
+def test_generate_kwargs_map_gen_conf_to_transformers():
+    executor = HFLocalExecutor("hf-local/tiny", {"max_tokens": 32, "temperature": 0, "top_p": 0.9, "api_key": "x"}, "tiny")
+    assert executor._generate_kwargs(executor.gen_conf, 1) == {"max_new_tokens": 32, "do_sample": False, "num_return_sequences": 1}
+    assert executor._generate_kwargs(executor.gen_conf, 3)["do_sample"] is True
+
+
+@pytest.fixture(scope="module")
+def tiny_checkpoint(tmp_path_factory):
+    """A tiny random GPT-2 checkpoint with a character-level tokenizer and a minimal chat template, built offline."""
+    torch = pytest.importorskip("torch")
+    transformers = pytest.importorskip("transformers")
+    from tokenizers import Regex, Tokenizer, decoders, models, pre_tokenizers
+
+    vocab = {"<|endoftext|>": 0, "\n": 1, **{chr(code): code - 30 for code in range(32, 127)}}
+    tokenizer = Tokenizer(models.WordLevel(vocab, unk_token="<|endoftext|>"))
+    tokenizer.pre_tokenizer = pre_tokenizers.Split(Regex("."), behavior="isolated")
+    tokenizer.decoder = decoders.Fuse()
+    tokenizer = transformers.PreTrainedTokenizerFast(tokenizer_object=tokenizer, eos_token="<|endoftext|>")
+    tokenizer.chat_template = "{% for message in messages %}{{ message['content'] }}\n{% endfor %}"
+    torch.manual_seed(0)
+    model = transformers.GPT2LMHeadModel(transformers.GPT2Config(vocab_size=len(vocab), n_positions=512, n_embd=32, n_layer=2, n_head=2))
+    path = tmp_path_factory.mktemp("tiny-random-gpt2")
+    model.save_pretrained(path)
+    tokenizer.save_pretrained(path)
+    return str(path)
+
+
+def test_tiny_checkpoint_streams_the_greedy_generation(tiny_checkpoint):
+    executor = HFLocalExecutor("hf-local/tiny", {"max_tokens": 8, "temperature": 0}, tiny_checkpoint, torch_dtype="float32", cache=HFModelCache(1024**3))
+    streamed = "".join(chunk.content for chunk in executor.stream_completion(MESSAGES))
+
+    model, tokenizer = load_hf_model(tiny_checkpoint, torch_dtype="float32")
+    inputs = tokenizer.apply_chat_template(MESSAGES, add_generation_prompt=True, return_tensors="pt", return_dict=True)
+    output_ids = model.generate(**inputs, max_new_tokens=8, do_sample=False, pad_token_id=tokenizer.eos_token_id)
+    expected = tokenizer.decode(output_ids[0][inputs["input_ids"].shape[-1] :], skip_special_tokens=True)
+    # A trailing incomplete character is held back by the streamer
+    assert streamed and expected.startswith(streamed)
+
+
+def test_closing_the_tiny_checkpoint_stream_stops_the_generation_thread(tiny_checkpoint):
+    cache = HFModelCache(1024**3)
+    executor = HFLocalExecutor("hf-local/tiny", {"max_tokens": 400, "temperature": 0}, tiny_checkpoint, torch_dtype="float32", cache=cache)
+    model, _ = executor._load()
+    generate, finished = model.generate, threading.Event()
+    n_generated = []
+
+    def spy_generate(*args, **kwargs):
+        try:
+            output_ids = generate(*args, **kwargs)
+            n_generated.append(output_ids.shape[-1] - kwargs["input_ids"].shape[-1])
+            return output_ids
+        finally:
+            finished.set()
+
+    model.generate = spy_generate
+    chunks = executor.stream_completion(MESSAGES)
+    assert next(chunks).content
+    chunks.close()
+    # Closing waits for the generation thread, which stops at the next token instead of generating 400 of them
+    assert finished.is_set()
+    assert n_generated and n_generated[0] < 400
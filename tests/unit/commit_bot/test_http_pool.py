@@ -0,0 +1,103 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.commit_bot.http_pool import close_http_clients, get_http_client, get_http_pool_stats, get_origin
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b"ok"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    close_http_clients()
+    httpd.shutdown()
+    httpd.server_close()
+
+
+# fmt:off
+@pytest.mark.parametrize(
+    argnames="url, expected",
+    argvalues=[
+        ("http://localhost:8000/v1", "http://localhost:8000"),
+        ("http://ollama:11434", "http://ollama:11434"),
+        ("http://localhost:8000/v1/models", "http://localhost:8000"),
+    ],
+)
+# fmt:on
+def test_get_origin(url, expected):
+    assert get_origin(url) == expected
+
+
+def test_one_pool_per_origin_reuses_connections(server_url):
+    client = get_http_client(server_url + "/v1")
+    assert get_http_client(server_url) is client
+    for _ in range(3):
+        assert client.get("/health").status_code == 200
+    assert client.stats == {"requests": 3, "connections": 1, "reused": 2}
+    assert get_http_pool_stats() == {server_url: client.stats}
+
+
+class SSEHandler(KeepAliveHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for event in [b'data: {"text": "feat: add x"}\n\n', b"data: [DONE]\n\n"]:
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(event), event))
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def test_stream_closed_at_done_goes_back_to_the_pool():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), SSEHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    try:
+        client = get_http_client(f"http://127.0.0.1:{httpd.server_address[1]}")
+        for _ in range(3):
+            # Like the openai client: stop reading at `[DONE]`, then close the response
+            with client.client.stream("POST", client.origin + "/v1/chat/completions", json={}) as response:
+                for line in response.iter_lines():
+                    if line == "data: [DONE]":
+                        break
+        assert client.stats == {"requests": 3, "connections": 1, "reused": 2}
+    finally:
+        close_http_clients()
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def test_async_litellm_client_uses_the_pool_without_creating_a_client(server_url, monkeypatch):
+    from litellm.llms.custom_httpx.http_handler import AsyncHTTPHandler
+
+    def create_client(*args, **kwargs):
+        raise AssertionError("An httpx client was created outside of the pool")
+
+    monkeypatch.setattr(AsyncHTTPHandler, "create_client", create_client)
+    pool = get_http_client(server_url)
+
+    async def main():
+        handler = pool.async_litellm_client("ollama", server_url)
+        assert handler is pool.async_litellm_client("ollama", server_url)
+        assert handler.client is pool.async_client
+        return (await handler.get(server_url + "/health")).status_code
+
+    assert asyncio.run(main()) == 200
@@ -0,0 +1,47 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parents[3]
+HEAVY_MODULES = ["litellm", "requests", "pyhocon", "openai", "httpx"]
+MAX_IMPORT_SECONDS = 1.0
+
+FAST_EXIT_SCRIPT = """
+import json
+import sys
+import time
+
+start = time.perf_counter()
+from src.commit_bot.main import run
+
+import_seconds = time.perf_counter() - start
+try:
+    run([])
+except SystemExit:
+    pass
+print(json.dumps({"import_seconds": import_seconds, "modules": sorted(sys.modules)}))
+"""
+
+
+def run_fast_exit(cwd):
+    env = {**os.environ, "PYTHONPATH": str(REPO_ROOT)}
+    res = subprocess.run([sys.executable, "-c", FAST_EXIT_SCRIPT], cwd=cwd, env=env, capture_output=True, text=True, check=True)
+    return res.stdout, json.loads(res.stdout.strip().splitlines()[-1])
+
+
+@pytest.fixture
+def empty_git_repo(tmp_path):
+    subprocess.run(["git", "init", "-q", str(tmp_path)], check=True)
+    return tmp_path
+
+
+@pytest.mark.parametrize(argnames="repo_fixture, expected_output", argvalues=[("tmp_path", "not a git repository"), ("empty_git_repo", "No staged changes found")], ids=["not a repo", "no staged changes"])
+def test_fast_exit_paths_skip_heavy_imports(request, repo_fixture, expected_output):
+    stdout, report = run_fast_exit(request.getfixturevalue(repo_fixture))
+    assert expected_output in stdout
+    assert [m for m in HEAVY_MODULES if m in report["modules"]] == []
+    assert report["import_seconds"] < MAX_IMPORT_SECONDS
@@ -2,6 +2,8 @@ import subprocess
 
 import pytest
 
+from src.commit_bot import main
+from src.commit_bot.ai_models import ChunkWrapper
 from src.commit_bot.main import generate_commit_message, run_command
 
 
@@ -42,3 +44,35 @@ def test_generate_commit_message():
     print(f"-----Generated commit message:-----\n{message}")
 
     assert message.isspace() is False, "Generated commit message should not be empty or whitespace only."
+
+
+class InterruptedModel:
+    """Model whose stream is interrupted by Ctrl-C after the first chunks."""
+
+    server_type = "ollama"
+    gen_conf = {}
+
+    def __init__(self):
+        self.closed = False
+
+    def prepare(self):
+        pass
+
+    def stream_completion(self, messages, **gen_overrides):
+        try:
+            yield ChunkWrapper("feat(api): add ", "")
+            yield ChunkWrapper("pagination", "")
+            raise KeyboardInterrupt
+        finally:
+            self.closed = True
+
+
+def test_ctrl_c_cancels_commit_message_generation(monkeypatch, tmp_path, capsys):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    model = InterruptedModel()
+    monkeypatch.setattr(main, "MODEL_SPEC", "ollama-qwen3:4b")
+    monkeypatch.setattr(main, "get_model", lambda model_spec: model)
+    message = generate_commit_message("diff --git a/x b/x\n+x\n", use_cache=False)
+    assert message == "feat(api): add pagination"
+    assert model.closed
+    assert "cancelled" in capsys.readouterr().out
@@ -0,0 +1,59 @@
+from src.commit_bot.diff_compaction import approx_token_count, get_diff_token_budget
+from src.commit_bot.map_reduce import fit_summaries, split_diff_into_groups, summarize_staged_changes
+
+
+def make_file_diff(path, added_lines):
+    lines = [f"diff --git a/{path} b/{path}", f"--- a/{path}", f"+++ b/{path}", f"@@ -0,0 +1,{added_lines} @@"]
+    lines.extend(f"+line {i} of {path}" for i in range(added_lines))
+    return "\n".join(lines)
+
+
+class FakeModel:
+    def __init__(self, summary_words=0):
+        self.prepared = 0
+        self.n_requests = 0
+        self.summary_words = summary_words
+
+    def prepare(self):
+        self.prepared += 1
+
+    def complete(self, messages, **gen_overrides):
+        self.n_requests += 1
+        path = messages[-1]["content"].split("diff --git a/")[1].split(" ")[0]
+        details = "".join(f"\n- detail {i} of the change" for i in range(self.summary_words))
+        return f"<think>thinking</think>- {path}: changed{details}"
+
+
+def test_split_diff_into_groups_packs_small_files():
+    diff = "\n".join(make_file_diff(f"src/f{i}.py", added_lines=5) for i in range(6))
+    groups = split_diff_into_groups(diff, max_group_tokens=150, count_tokens=approx_token_count)
+    assert 1 < len(groups) < 6
+    assert "\n".join(groups) == diff
+
+
+def test_summarize_staged_changes_runs_map_stage():
+    diff = "\n".join(make_file_diff(f"src/f{i}.py", added_lines=1000) for i in range(3))
+    model = FakeModel()
+    summaries, timings = summarize_staged_changes(model, "ollama-qwen3:4b", diff)
+    assert model.prepared == 1
+    assert "## Part 1\n- src/f0.py: changed" in summaries
+    assert "## Part 3\n- src/f2.py: changed" in summaries
+    assert "<think>" not in summaries
+    assert set(timings) == {"split", "prepare", "map"}
+
+
+def test_many_groups_are_capped_and_the_reduce_input_fits_the_budget():
+    diff = "\n".join(make_file_diff(f"src/f{i}.py", added_lines=300) for i in range(100))
+    assert len(split_diff_into_groups(diff, get_diff_token_budget("ollama-qwen3:4b"), approx_token_count)) > 16
+    model = FakeModel(summary_words=200)
+    summaries, _ = summarize_staged_changes(model, "ollama-qwen3:4b", diff)
+    assert model.n_requests <= 16  # `map_reduce_max_groups`
+    assert approx_token_count(summaries) <= get_diff_token_budget("ollama-qwen3:4b")
+    # Every part keeps its first lines
+    assert f"## Part {model.n_requests}\n- src/f" in summaries and "- detail 0 of the change" in summaries
+
+
+def test_fit_summaries_keeps_summaries_that_fit_as_is():
+    assert fit_summaries(["- a\n", "- b"], 100, approx_token_count) == "## Part 1\n- a\n\n## Part 2\n- b"
+    fitted = fit_summaries(["- " + "x" * 400], 20, approx_token_count)
+    assert fitted.startswith("## Part 1\n- xxx") and approx_token_count(fitted) <= 20
@@ -0,0 +1,113 @@
+import pytest
+
+from src.commit_bot.ai_models import AIModels
+from src.commit_bot.routing import LARGE, SMALL, choose_model, estimate_latency, get_diff_tier
+
+NOW = 1_800_000_000.0
+ROUTING_CONF = {
+    "small_diff_max_tokens": 1500,
+    "small_diff_max_files": 3,
+    "fast_models": ["ollama-qwen3:1.7b", "vllm-qwen3:4b"],
+    "large_models": ["vllm-gpt-oss:20b", "ollama-gpt-oss:20b"],
+    "expected_output_tokens": 100,
+    "history_days": 14,
+    "min_history_runs": 3,
+    "max_expected_seconds": 30,
+}
+AVAILABLE = ROUTING_CONF["fast_models"] + ROUTING_CONF["large_models"]
+BACKENDS = {model: model.split("-", 1)[0] for model in AVAILABLE}
+
+
+def make_diff(n_files, lines_per_file=5):
+    return "\n".join(f"diff --git a/f{i}.py b/f{i}.py\n" + "\n".join(f"+line {j} of a changed file" for j in range(lines_per_file)) for i in range(n_files))
+
+
+def make_records(model, ttft_seconds, tokens_per_sec, n=5, age_days=1.0, **fields):
+    """Synthetic telemetry records of `n` generations of the model."""
+    return [
+        {"ts": NOW - age_days * 24 * 3600, "model": model, "backend": BACKENDS[model], "ttft_seconds": ttft_seconds, "tokens_per_sec": tokens_per_sec, **fields}
+        for _ in range(n)
+    ]
+
+
+SMALL_DIFF = make_diff(1)
+LARGE_DIFF = make_diff(10, lines_per_file=100)
+
+
+# fmt:off
+@pytest.mark.parametrize(
+    argnames="diff, expected",
+    argvalues=[
+        (SMALL_DIFF, SMALL),
+        (make_diff(5), LARGE),
+        (LARGE_DIFF, LARGE),
+    ],
+    ids=["one small file", "many small files", "many large files"]
+)
+# fmt:on
+def test_get_diff_tier(diff, expected):
+    assert get_diff_tier(diff, ROUTING_CONF) == expected
+
+
+def test_estimate_latency_skips_cached_failed_and_other_backend_runs():
+    records = make_records("vllm-qwen3:4b", 0.2, 50.0, n=3)
+    records += make_records("vllm-qwen3:4b", 9.0, 1.0, n=5, cached=True) + make_records("vllm-qwen3:4b", 9.0, 1.0, n=5, error="TimeoutError")
+    estimate = estimate_latency(records, "vllm-qwen3:4b", "vllm", expected_output_tokens=100, min_runs=3)
+    assert (estimate.runs, estimate.expected_seconds) == (3, pytest.approx(2.2))
+    assert estimate_latency(records, "vllm-qwen3:4b", "ollama", expected_output_tokens=100, min_runs=3) is None
+
+
+def test_routes_by_diff_size_without_history():
+    small = choose_model(SMALL_DIFF, ROUTING_CONF, [], AVAILABLE, BACKENDS, now=NOW)
+    large = choose_model(LARGE_DIFF, ROUTING_CONF, [], AVAILABLE, BACKENDS, now=NOW)
+    assert (small.model_spec, small.tier) == ("ollama-qwen3:1.7b", SMALL)
+    assert (large.model_spec, large.tier) == ("vllm-gpt-oss:20b", LARGE)
+    assert "no latency history" in small.reason
+
+
+def test_routes_to_the_fastest_measured_model_of_the_tier():
+    records = make_records("ollama-qwen3:1.7b", 1.5, 20.0) + make_records("vllm-qwen3:4b", 0.1, 80.0)
+    decision = choose_model(SMALL_DIFF, ROUTING_CONF, records, AVAILABLE, BACKENDS, now=NOW)
+    assert decision.model_spec == "vllm-qwen3:4b"
+    assert "80 tok/s over 5 runs" in decision.reason
+
+
+def test_old_or_too_few_runs_are_not_trusted():
+    records = make_records("vllm-qwen3:4b", 0.1, 80.0, age_days=30) + make_records("vllm-qwen3:4b", 0.1, 80.0, n=2) + make_records("ollama-qwen3:1.7b", 1.5, 20.0)
+    # vllm-qwen3:4b is not measured yet, so it is tried again instead of being compared
+    decision = choose_model(SMALL_DIFF, ROUTING_CONF, records, AVAILABLE, BACKENDS, now=NOW)
+    assert (decision.model_spec, decision.estimate) == ("vllm-qwen3:4b", None)
+
+
+def test_unmeasured_model_of_the_tier_is_tried_first():
+    records = make_records("ollama-qwen3:1.7b", 0.1, 80.0)
+    decision = choose_model(SMALL_DIFF, ROUTING_CONF, records, AVAILABLE, BACKENDS, now=NOW)
+    assert (decision.model_spec, decision.tier) == ("vllm-qwen3:4b", SMALL)
+    assert "no latency history yet for this model" in decision.reason
+    # A model whose runs keep failing is not tried over and over
+    records += make_records("vllm-qwen3:4b", None, None, n=3, error="TimeoutError")
+    assert choose_model(SMALL_DIFF, ROUTING_CONF, records, AVAILABLE, BACKENDS, now=NOW).model_spec == "ollama-qwen3:1.7b"
+
+
+def test_slow_large_models_fall_back_to_a_fast_model():
+    records = make_records("vllm-gpt-oss:20b", 10.0, 4.0) + make_records("ollama-gpt-oss:20b", 12.0, 4.0) + make_records("vllm-qwen3:4b", 1.0, 50.0)
+    decision = choose_model(LARGE_DIFF, ROUTING_CONF, records, AVAILABLE, BACKENDS, now=NOW)
+    assert (decision.model_spec, decision.tier) == ("vllm-qwen3:4b", SMALL)
+    assert "vllm-gpt-oss:20b is expected to take 35.0s" in decision.reason
+    # Within the limit, the large model is kept
+    assert choose_model(LARGE_DIFF, {**ROUTING_CONF, "max_expected_seconds": 60}, records, AVAILABLE, BACKENDS, now=NOW).model_spec == "vllm-gpt-oss:20b"
+
+
+def test_unavailable_models_are_skipped():
+    decision = choose_model(SMALL_DIFF, ROUTING_CONF, [], ["vllm-gpt-oss:20b"], BACKENDS, now=NOW)
+    assert decision.model_spec == "vllm-gpt-oss:20b"
+    assert choose_model(SMALL_DIFF, ROUTING_CONF, [], ["claude"], BACKENDS, now=NOW) is None
+
+
+def test_ai_models_routes_only_when_enabled(monkeypatch):
+    models = AIModels()
+    monkeypatch.setattr(models, "_routing_conf", {**ROUTING_CONF, "enabled": False})
+    assert models.route_model(SMALL_DIFF, records=[]) is None
+    monkeypatch.setattr(models, "_routing_conf", {**ROUTING_CONF, "enabled": True})
+    records = make_records("ollama-qwen3:1.7b", 1.5, 20.0, age_days=0) + make_records("vllm-qwen3:4b", 0.1, 80.0, age_days=0)
+    assert models.route_model(SMALL_DIFF, records=records).model_spec == "vllm-qwen3:4b"
@@ -0,0 +1,196 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from src.commit_bot.server_manager import READY, STARTING, STOPPED, ServerLease, ServerManager, get_vllm_server_args, is_pid_alive, vllm_launch_command
+from src.commit_bot.server_probe import read_metric
+
+# Fake OpenAI-compatible server, started in its own process like a real vllm server
+FAKE_SERVER = """
+import json, sys
+from http.server import BaseHTTPRequestHandler, HTTPServer
+port, model_name = int(sys.argv[1]), sys.argv[2]
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/v1/models":
+            body = json.dumps({"data": [{"id": model_name}]}).encode()
+        elif self.path == "/metrics":
+            body = b'# HELP vllm:num_requests_running\\nvllm:num_requests_running{model_name="x"} 0.0\\n'
+        else:
+            body = b""
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(body)
+    def log_message(self, *args):
+        pass
+HTTPServer(("127.0.0.1", port), Handler).serve_forever()
+"""
+
+
+def fake_launch_command(model_name, model_path, port, gpu_memory_utilization):
+    return [sys.executable, "-c", FAKE_SERVER, str(port), model_name]
+
+
+@pytest.fixture
+def manager(tmp_path, unused_ports):
+    manager = ServerManager(
+        run_dir=str(tmp_path / "run"),
+        log_dir=str(tmp_path / "logs"),
+        memory_budget=0.8,
+        host="127.0.0.1",
+        ports=unused_ports,
+        launch_command=fake_launch_command,
+        startup_timeout_sec=10,
+        spawn_monitor=False,
+    )
+    yield manager
+    manager.stop_all()
+
+
+@pytest.fixture
+def unused_ports():
+    import socket
+
+    ports = []
+    sockets = []
+    for _ in range(3):
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        sockets.append(sock)
+        ports.append(sock.getsockname()[1])
+    for sock in sockets:
+        sock.close()
+    return ports
+
+
+def test_ensure_server_starts_once_and_reuses_the_resident_server(manager):
+    record = manager.ensure_server("qwen3:4b", "/weights/qwen3:4b", 0.4)
+    assert record.state == READY
+    assert is_pid_alive(record.pid)
+    assert read_metric(record.api_base_url, "vllm:num_requests_running") == 0
+
+    again = manager.ensure_server("qwen3:4b", "/weights/qwen3:4b", 0.4)
+    assert again.pid == record.pid
+    assert [r.model_name for r in manager.list_servers()] == ["qwen3:4b"]
+
+
+def test_server_started_outside_of_commit_bot_is_reused(manager):
+    external = subprocess.Popen([sys.executable, "-c", FAKE_SERVER, str(manager.ports[1]), "qwen3:4b"])
+    try:
+        api_base_url = f"http://127.0.0.1:{manager.ports[1]}/v1"
+        deadline = time.monotonic() + 10
+        while manager.find_unmanaged_server("qwen3:4b") is None and time.monotonic() < deadline:
+            time.sleep(0.1)
+        assert manager.find_unmanaged_server("qwen3:4b") == api_base_url
+        assert manager.find_unmanaged_server("gpt-oss:20b") is None
+        # The external server is not managed: no record, and its port is skipped by new servers
+        assert manager.list_servers() == []
+        assert manager.ensure_server("gpt-oss:20b", "/weights/gpt-oss:20b", 0.4).port != manager.ports[1]
+    finally:
+        external.kill()
+        external.wait()
+
+
+def test_servers_within_budget_stay_resident_and_lru_is_evicted(manager):
+    first = manager.ensure_server("model-a", "/weights/a", 0.4)
+    time.sleep(0.01)
+    manager.ensure_server("model-b", "/weights/b", 0.4)
+    assert sorted(r.model_name for r in manager.list_servers()) == ["model-a", "model-b"]
+
+    manager.touch("model-a")
+    manager.ensure_server("model-c", "/weights/c", 0.4)
+    assert sorted(r.model_name for r in manager.list_servers()) == ["model-a", "model-c"]
+    assert manager.get_state("model-b") == STOPPED
+    assert manager.get_record("model-a").pid == first.pid
+
+
+def test_stop_server_terminates_the_process_and_removes_the_record(manager):
+    record = manager.ensure_server("qwen3:4b", "/weights/qwen3:4b", 0.4)
+    assert manager.stop_server("qwen3:4b")
+    assert not is_pid_alive(record.pid)
+    assert manager.get_state("qwen3:4b") == STOPPED
+    assert not manager.stop_server("qwen3:4b")
+
+
+def test_stale_record_of_a_dead_server_is_dropped(manager):
+    record = manager.ensure_server("qwen3:4b", "/weights/qwen3:4b", 0.4)
+    os.killpg(record.pid, 9)
+    time.sleep(0.2)
+    assert manager.list_servers() == []
+
+
+def test_server_that_never_gets_ready_raises(tmp_path, unused_ports):
+    manager = ServerManager(
+        run_dir=str(tmp_path / "run"),
+        log_dir=str(tmp_path / "logs"),
+        memory_budget=0.8,
+        host="127.0.0.1",
+        ports=unused_ports,
+        launch_command=lambda *args: [sys.executable, "-c", "import sys; sys.exit(1)"],
+        startup_timeout_sec=5,
+        spawn_monitor=False,
+    )
+    with pytest.raises(RuntimeError, match="not ready"):
+        manager.ensure_server("broken", "/weights/broken", 0.4)
+    assert manager.list_servers() == []
+
+
+def test_lease_keeps_the_server_up_and_grace_period_stops_it(manager):
+    manager.idle_grace_sec = 1
+    record = manager.ensure_server("qwen3:4b", "/weights/qwen3:4b", 0.4)
+    lease = ServerLease(manager, "qwen3:4b", ttl_sec=0.6).start()
+    monitor = threading.Thread(target=manager.monitor_idle, args=("qwen3:4b", 0.1), daemon=True)
+    monitor.start()
+
+    time.sleep(2)  # Longer than the grace period and the lease ttl, the renewals keep it alive
+    assert manager.count_live_leases("qwen3:4b") == 1
+    assert manager.get_state("qwen3:4b") == READY
+
+    lease.release()
+    assert manager.count_live_leases("qwen3:4b") == 0
+    monitor.join(timeout=5)
+    assert not monitor.is_alive()
+    assert manager.get_state("qwen3:4b") == STOPPED
+    assert not is_pid_alive(record.pid)
+
+
+def test_server_stuck_starting_without_lease_is_stopped(manager):
+    # The client crashed while the server was starting: the record stays STARTING and nobody renews a lease
+    record = manager._launch("qwen3:4b", "/weights/qwen3:4b", 0.4)
+    assert record.state == STARTING
+    manager.startup_timeout_sec = 0.5
+    manager.renew_lease("qwen3:4b", "starting-session", ttl_sec=0.5)
+    monitor = threading.Thread(target=manager.monitor_idle, args=("qwen3:4b", 0.1), daemon=True)
+    monitor.start()
+
+    time.sleep(0.3)  # Within the startup timeout and the lease
+    assert manager.get_state("qwen3:4b") == STARTING
+    monitor.join(timeout=5)
+    assert not monitor.is_alive()
+    assert manager.get_state("qwen3:4b") == STOPPED
+    assert not is_pid_alive(record.pid)
+
+
+def test_expired_lease_is_not_live(manager):
+    manager.renew_lease("qwen3:4b", "crashed-session", ttl_sec=-1)
+    assert manager.count_live_leases("qwen3:4b") == 0
+
+
+def test_leased_server_is_evicted_last(manager):
+    manager.ensure_server("model-a", "/weights/a", 0.4)
+    time.sleep(0.01)
+    manager.ensure_server("model-b", "/weights/b", 0.4)
+    manager.renew_lease("model-a", "session", ttl_sec=60)
+    manager.ensure_server("model-c", "/weights/c", 0.4)
+    assert sorted(r.model_name for r in manager.list_servers()) == ["model-a", "model-c"]
+
+
+def test_vllm_launch_command_has_the_server_args_of_job_conf():
+    job_conf = {"vllm_max_model_len": 16384, "vllm_extra_args": ["--enforce-eager"]}
+    command = vllm_launch_command("qwen3:4b", "/weights/qwen3:4b", 8000, 0.4, server_args=get_vllm_server_args(job_conf))
+    assert command[-4:] == ["--enable-prefix-caching", "--max-model-len", "16384", "--enforce-eager"]
+    assert "--no-enable-prefix-caching" in get_vllm_server_args({"vllm_enable_prefix_caching": False})
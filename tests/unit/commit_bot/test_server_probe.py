@@ -0,0 +1,140 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.commit_bot.server_probe import (
+    get_prefix_cache_hit_rate,
+    get_server_root_url,
+    is_serving_model,
+    preload_ollama_model,
+    probe_server,
+    read_prefix_cache_counters,
+    wait_until_ready,
+)
+
+
+class StubServer:
+    """Stub of the OpenAI-compatible server that becomes healthy after `ready_after_sec`."""
+
+    def __init__(self, ready_after_sec, model_name="qwen3:4b"):
+        self.ready_at = time.monotonic() + ready_after_sec
+        self.n_requests = 0
+        self.posted = []
+        self.metrics = ""
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.n_requests += 1
+                if time.monotonic() < stub.ready_at:
+                    self.send_response(503)
+                    self.end_headers()
+                    return
+                body = json.dumps({"data": [{"id": model_name}]}).encode() if self.path == "/v1/models" else b""
+                if self.path == "/metrics":
+                    body = stub.metrics.encode()
+                self.send_response(200)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                stub.posted.append((self.path, json.loads(self.rfile.read(int(self.headers["Content-Length"])))))
+                self.send_response(200)
+                self.end_headers()
+                self.wfile.write(json.dumps({"done": True}).encode())
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.api_base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}/v1"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def stub_server(request):
+    server = StubServer(ready_after_sec=request.param)
+    yield server
+    server.close()
+
+
+def test_get_server_root_url():
+    assert get_server_root_url("http://localhost:8000/v1/") == "http://localhost:8000"
+    assert get_server_root_url("http://ollama:11434") == "http://ollama:11434"
+
+
+@pytest.mark.parametrize("stub_server", [0.0], indirect=True)
+def test_probe_ready_server(stub_server):
+    assert probe_server(stub_server.api_base_url)
+    assert is_serving_model(stub_server.api_base_url, "qwen3:4b")
+    assert not is_serving_model(stub_server.api_base_url, "gpt-oss:20b")
+
+
+@pytest.mark.parametrize("stub_server", [0.8], indirect=True)
+def test_wait_until_ready_returns_as_soon_as_ready(stub_server):
+    start = time.monotonic()
+    assert wait_until_ready(stub_server.api_base_url, deadline_sec=10, max_interval_sec=0.2, show_progress=False)
+    assert time.monotonic() - start < 3
+    assert stub_server.n_requests > 1
+
+
+@pytest.mark.parametrize("stub_server", [60.0], indirect=True)
+def test_wait_until_ready_gives_up_at_deadline(stub_server):
+    start = time.monotonic()
+    assert not wait_until_ready(stub_server.api_base_url, deadline_sec=0.5, max_interval_sec=0.1, show_progress=False)
+    assert time.monotonic() - start < 3
+
+
+@pytest.mark.parametrize("stub_server", [60.0], indirect=True)
+def test_wait_until_ready_stops_when_process_dies(stub_server):
+    start = time.monotonic()
+    assert not wait_until_ready(stub_server.api_base_url, deadline_sec=30, is_alive=lambda: False, show_progress=False)
+    assert time.monotonic() - start < 3
+
+
+@pytest.mark.parametrize("stub_server", [0.0], indirect=True)
+def test_preload_ollama_model_sends_an_empty_generate_with_keep_alive(stub_server):
+    ollama_base_url = get_server_root_url(stub_server.api_base_url)
+    assert preload_ollama_model(ollama_base_url, "qwen3:1.7b", "10m")
+    assert stub_server.posted == [("/api/generate", {"model": "qwen3:1.7b", "keep_alive": "10m"})]
+    assert not preload_ollama_model("http://127.0.0.1:9", "qwen3:1.7b", "10m", timeout=1)
+
+
+# fmt:off
+@pytest.mark.parametrize(
+    argnames="metric_prefix",
+    argvalues=["vllm:prefix_cache", "vllm:gpu_prefix_cache"],
+    ids=["vllm >= 0.10", "older vllm"]
+)
+# fmt:on
+@pytest.mark.parametrize("stub_server", [0.0], indirect=True)
+def test_read_prefix_cache_counters(stub_server, metric_prefix):
+    def set_counters(queries, hits):
+        stub_server.metrics = (
+            f"# HELP {metric_prefix}_queries_total Prefix cache queries, in terms of number of queried tokens.\n"
+            f'{metric_prefix}_queries_total{{engine="0",model_name="qwen3:4b"}} {queries}\n'
+            f'{metric_prefix}_hits_total{{engine="0",model_name="qwen3:4b"}} {hits}\n'
+            f'{metric_prefix}_hits_created{{engine="0",model_name="qwen3:4b"}} 1.7e+09\n'
+        )
+
+    set_counters(1000.0, 200.0)
+    before = read_prefix_cache_counters(stub_server.api_base_url)
+    assert before == (1000.0, 200.0)
+    set_counters(1500.0, 600.0)
+    assert get_prefix_cache_hit_rate(before, read_prefix_cache_counters(stub_server.api_base_url)) == 0.8
+    assert get_prefix_cache_hit_rate(before, before) is None
+
+
+@pytest.mark.parametrize("stub_server", [0.0], indirect=True)
+def test_read_prefix_cache_counters_not_exported(stub_server):
+    stub_server.metrics = "vllm:num_requests_running 0.0\n"
+    assert read_prefix_cache_counters(stub_server.api_base_url) is None
+    assert read_prefix_cache_counters("http://127.0.0.1:9/v1") is None
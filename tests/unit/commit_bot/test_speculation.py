@@ -0,0 +1,48 @@
+import threading
+
+from src.commit_bot.speculation import SpeculativeRegenerator
+
+
+def make_generator():
+    counter = iter(range(1000))
+    lock = threading.Lock()
+
+    def generate_candidate(cancel_event):
+        with lock:
+            return f"candidate {next(counter)}"
+
+    return generate_candidate
+
+
+def test_pop_returns_candidates_and_refills():
+    speculator = SpeculativeRegenerator(make_generator(), n_candidates=2)
+    speculator.start()
+    first = speculator.pop()
+    second = speculator.pop()
+    assert first.startswith("candidate ")
+    assert second.startswith("candidate ")
+    assert first != second
+    speculator.cancel(wait=True)
+
+
+def test_pop_returns_none_when_all_candidates_fail():
+    speculator = SpeculativeRegenerator(lambda cancel_event: None, n_candidates=2)
+    speculator.start()
+    assert speculator.pop() is None
+    speculator.cancel(wait=True)
+
+
+def test_cancel_stops_in_flight_generation():
+    started = threading.Event()
+
+    def generate_candidate(cancel_event):
+        started.set()
+        cancel_event.wait(timeout=10)
+        return None if cancel_event.is_set() else "late candidate"
+
+    speculator = SpeculativeRegenerator(generate_candidate, n_candidates=1)
+    speculator.start()
+    started.wait(timeout=10)
+    speculator.cancel(wait=True)
+    assert speculator.n_ready == 0
+    assert speculator.pop() is None
@@ -0,0 +1,92 @@
+import io
+import random
+
+import pytest
+
+from src.commit_bot.stream_filter import CommitMessageStreamFilter, ThrottledPrinter
+from src.commit_bot.utils import post_process_commit_message
+
+MESSAGE = "feat(api): add pagination\n\nThe endpoint returned every commit at once.\n\nRefs: #12"
+
+
+def run_filter(text, chunk_sizes, early_stop=True):
+    stream_filter = CommitMessageStreamFilter(early_stop=early_stop)
+    shown, position = [], 0
+    for size in chunk_sizes:
+        shown.append(stream_filter.feed(text[position : position + size]))
+        position += size
+        if stream_filter.complete or position >= len(text):
+            break
+    shown.append(stream_filter.flush())
+    return stream_filter, "".join(shown)
+
+
+def random_chunk_sizes(seed):
+    rng = random.Random(seed)
+    return [rng.randint(1, 8) for _ in range(1000)]
+
+
+# fmt:off
+@pytest.mark.parametrize(
+    argnames="text",
+    argvalues=[
+        MESSAGE,
+        "<think>\nThe diff adds pagination.\n</think>\n\n" + MESSAGE,
+        "```text\nfeat(api): add pagination\n\nBody: The endpoint returned every commit at once.\n```",
+        "fix(parser): handle spaces\n\n<Body>Multiple spaces broke parsing.</Body>",
+        "Here is a message: feat(x): y\n\nbody text",
+        "chore(deps): bump\n\nBump `httpx` to 0.28 for the `Body:\nmarker` test.",
+    ],
+    ids=["plain", "think block", "fences and body marker", "body tags", "not conventional", "inline backticks"]
+)
+# fmt:on
+def test_filter_matches_post_processing_for_any_chunking(text):
+    expected = post_process_commit_message(text)
+    for seed in range(20):
+        stream_filter, shown = run_filter(text, random_chunk_sizes(seed), early_stop=False)
+        assert stream_filter.message == expected
+        assert shown.strip() == expected
+
+
+# fmt:off
+@pytest.mark.parametrize(
+    argnames="trailer",
+    argvalues=[
+        "\n\nfeat(api): paginate the commit listing\n\nAn alternative message.",
+        "\n```\nThis message follows the conventional commits format.",
+        "\n\n---\nExplanation: the diff adds pagination.",
+    ],
+    ids=["second header", "closing fence", "separator"]
+)
+# fmt:on
+def test_filter_stops_after_complete_message(trailer):
+    text = "```\n" + MESSAGE + trailer if trailer.startswith("\n```") else MESSAGE + trailer
+    for seed in range(20):
+        stream_filter, shown = run_filter(text, random_chunk_sizes(seed))
+        assert stream_filter.complete
+        assert stream_filter.message == MESSAGE
+        assert shown.strip() == MESSAGE
+
+
+def test_filter_does_not_stop_before_the_body():
+    stream_filter, _ = run_filter("feat(api): add pagination\n\nfeat(api): add paging\n\nThe body.", [5] * 100)
+    assert not stream_filter.complete
+
+
+def test_filter_holds_back_only_possible_markers():
+    stream_filter = CommitMessageStreamFilter()
+    assert stream_filter.feed("feat(api): add B") == "feat(api): add "
+    assert stream_filter.feed("ump") == "Bump"
+    assert stream_filter.feed("\n\nBody") == "\n\n"
+    assert stream_filter.feed(": x") == "x"
+
+
+def test_throttled_printer_batches_writes():
+    output = io.StringIO()
+    printer = ThrottledPrinter(interval_sec=60, stream=output)
+    printer.write("a")  # The first write is flushed right away
+    printer.write("b")
+    printer.write("c")
+    assert output.getvalue() == "a"
+    printer.flush()
+    assert output.getvalue() == "abc"
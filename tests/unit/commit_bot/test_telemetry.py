@@ -0,0 +1,81 @@
+import json
+import time
+
+import pytest
+
+from src.commit_bot.telemetry import RunTelemetry, append_record, format_stats_table, load_records, percentile, record_session_phase, summarize_records
+
+
+class Chunk:
+    def __init__(self, content, reasoning=""):
+        self.content = content
+        self.reasoning = reasoning
+
+
+def slow_stream(contents, delay_sec):
+    for content in contents:
+        time.sleep(delay_sec)
+        yield Chunk(content)
+
+
+# fmt:off
+@pytest.mark.parametrize(
+    argnames="values, q, expected",
+    argvalues=[
+        ([], 50, None),
+        ([3.0], 95, 3.0),
+        ([4.0, 1.0, 3.0, 2.0], 50, 2.5),
+        ([float(i) for i in range(1, 101)], 95, 95.05),
+    ],
+    ids=["empty", "single", "median", "p95"]
+)
+# fmt:on
+def test_percentile(values, q, expected):
+    assert percentile(values, q) == (pytest.approx(expected) if expected is not None else None)
+
+
+def test_run_telemetry_times_the_stream():
+    record_session_phase("git", 0.5)
+    telemetry = RunTelemetry("vllm-qwen3:4b", "vllm", "generate")
+    with telemetry.phase("server"):
+        time.sleep(0.01)
+    chunks = [chunk.content for chunk in telemetry.observe_stream(slow_stream(["", "feat", ":", " add", " x"], 0.05))]
+    summary = telemetry.summary()
+    assert chunks == ["", "feat", ":", " add", " x"]
+    assert summary["tokens"] == 4
+    # The empty first chunk (role only) does not count as the first token
+    assert 0.09 < summary["ttft_seconds"] < 0.3
+    assert 10 < summary["tokens_per_sec"] < 30
+    assert summary["phases"]["git"] == 0.5
+    assert summary["phases"]["server"] >= 0.01
+    # Session phases are reported with the first run only
+    assert "git" not in RunTelemetry("vllm-qwen3:4b", "vllm", "regenerate").phases
+
+
+def test_append_record_rotates_full_file(tmp_path):
+    path = tmp_path / "telemetry.jsonl"
+    for i in range(3):
+        append_record({"ts": i, "model": "m"}, path, max_bytes=30)
+    assert path.with_name("telemetry.jsonl.1").exists()
+    path.open("a").write("{corrupted\n")
+    assert [record["ts"] for record in load_records(path)] == [0, 1, 2]
+    assert [record["ts"] for record in load_records(path, since_ts=1)] == [1, 2]
+
+
+def test_summarize_records_groups_by_model_and_backend():
+    records = [
+        {"model": "vllm-qwen3:4b", "backend": "vllm", "ttft_seconds": ttft, "total_seconds": 1.0, "phases": {"server": 0.1}} for ttft in [0.1, 0.2, 0.3]
+    ]
+    records += [
+        {"model": "ollama-qwen3:4b", "backend": "ollama", "ttft_seconds": 0.5, "total_seconds": 2.0},
+        {"model": "ollama-qwen3:4b", "backend": "ollama", "cached": True, "total_seconds": 0.01},
+    ]
+    rows = summarize_records(json.loads(json.dumps(records)))
+    assert [(row["model"], row["runs"], row["cached"]) for row in rows] == [("vllm-qwen3:4b", 3, 0), ("ollama-qwen3:4b", 2, 1)]
+    assert rows[0]["ttft_seconds"][0] == pytest.approx(0.2)
+    assert rows[0]["server"] == (0.1, 0.1)
+    # Cache hits are left out of the latency percentiles
+    assert rows[1]["total_seconds"] == (2.0, 2.0)
+    table = format_stats_table(rows)
+    assert "ttft p50/p95" in table.splitlines()[0]
+    assert "0.20/0.29" in table
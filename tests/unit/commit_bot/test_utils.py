@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+from src.commit_bot.prompts import build_prompt_messages, deriv_sys_ppt_1, format_staged_changes
+from src.commit_bot.utils import get_conf_regen_commit_msg, get_config_cache_stats, invalidate_config_cache, load_config
+
+
+@pytest.fixture
+def user_conf_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    conf_dir = tmp_path / ".config/commit-bot"
+    conf_dir.mkdir(parents=True)
+    yield conf_dir
+    invalidate_config_cache()
+
+
+def test_load_config_is_cached(user_conf_dir):
+    invalidate_config_cache()
+    stats_before = get_config_cache_stats()
+    config1 = load_config("job.conf")
+    config2 = load_config("job.conf")
+    stats_after = get_config_cache_stats()
+    assert config1 is config2
+    assert stats_after["misses"] - stats_before["misses"] == 1
+    assert stats_after["hits"] - stats_before["hits"] == 1
+
+
+def test_load_config_reloads_changed_user_config(user_conf_dir):
+    (user_conf_dir / "job.conf").write_text("server_startup_timeout_seconds=10\n")
+    assert load_config("job.conf").get("server_startup_timeout_seconds") == 10
+    (user_conf_dir / "job.conf").write_text("server_startup_timeout_seconds=200\n")
+    os.utime(user_conf_dir / "job.conf", ns=(1, 1))  # Make sure the mtime changes even on coarse clocks
+    config = load_config("job.conf")
+    assert config.get("server_startup_timeout_seconds") == 200
+    assert config.get("used_model")  # Module defaults are still merged in
+
+
+def test_load_config_returns_read_only_config(user_conf_dir):
+    config = load_config("model.conf")
+    with pytest.raises(TypeError):
+        config.put("ollama_base_url", "http://elsewhere")
+    with pytest.raises(TypeError):
+        config.get_config("default_gen_configs")["temperature"] = 1.0
+    assert config.get_config("default_gen_configs").as_plain_ordered_dict()["temperature"] == 0.1
+
+
+def test_invalidate_config_cache(user_conf_dir):
+    config1 = load_config("job.conf")
+    invalidate_config_cache("job.conf")
+    assert load_config("job.conf") is not config1
+
+
+def test_regeneration_prompt_extends_the_generation_prompt():
+    user_content = format_staged_changes("diff --git a/x b/x\n+x")
+    generation = build_prompt_messages(deriv_sys_ppt_1, user_content)
+    for _ in range(10):
+        instruction, gen_overrides = get_conf_regen_commit_msg()
+        regeneration = build_prompt_messages(deriv_sys_ppt_1, user_content, instruction)
+        # Same system prompt and staged changes, so that the server's prefix cache is reused
+        assert regeneration[0] == generation[0]
+        assert regeneration[1]["content"].startswith(generation[1]["content"])
+        assert regeneration[1]["content"].endswith(instruction)
+        assert 0.3 <= gen_overrides["temperature"] <= 0.7